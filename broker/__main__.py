@@ -0,0 +1,29 @@
+"""Production entrypoint: `python -m broker`.
+
+Runs uvicorn with one worker per CPU (override with WEB_CONCURRENCY), the uvloop
+event loop and httptools parser (both from uvicorn[standard]; "auto" falls back
+to asyncio/h11 where they are unavailable, e.g. on Windows) and no access log,
+since RequestIdMiddleware already logs every request.
+"""
+
+from __future__ import annotations
+
+import os
+
+import uvicorn
+
+
+def main() -> None:
+    uvicorn.run(
+        "broker.api.main:app",
+        host=os.getenv("HOST", "127.0.0.1"),
+        port=int(os.getenv("PORT", "8000")),
+        workers=int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 2))),
+        loop="auto",
+        http="auto",
+        access_log=False,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import hashlib
+import mimetypes
+from pathlib import Path
+
+from fastapi import HTTPException, Request, Response
+
+# Asset URLs carry a content hash (?v=...), so responses can be cached forever
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+class StaticAssets:
+    """In-memory static file server for the small, fixed dashboard asset set.
+
+    Every file under `directory` is read once with its sha1 ETag and media type;
+    requests are answered from memory without touching the filesystem.
+    """
+
+    def __init__(self, directory: Path, prefix: str = "/static") -> None:
+        self.prefix = prefix
+        self.files: dict[str, tuple[bytes, str, str]] = {}
+        for p in sorted(directory.rglob("*")):
+            if not p.is_file():
+                continue
+            rel = p.relative_to(directory).as_posix()
+            data = p.read_bytes()
+            media_type = mimetypes.guess_type(rel)[0] or "application/octet-stream"
+            self.files[rel] = (data, hashlib.sha1(data).hexdigest(), media_type)  # noqa: S324
+
+    def url(self, path: str) -> str:
+        """Versioned URL for templates; changes whenever the file content changes."""
+        entry = self.files.get(path)
+        if entry is None:
+            return f"{self.prefix}/{path}"
+        return f"{self.prefix}/{path}?v={entry[1][:12]}"
+
+    async def serve(self, request: Request, path: str) -> Response:
+        entry = self.files.get(path)
+        if entry is None:
+            raise HTTPException(status_code=404, detail="Not Found")
+        data, digest, media_type = entry
+        etag = f'"{digest}"'
+        headers = {"ETag": etag, "Cache-Control": IMMUTABLE}
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers=headers)
+        return Response(content=data, media_type=media_type, headers=headers)
+
+
+assets = StaticAssets(Path(__file__).resolve().parent / "static")
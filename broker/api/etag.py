@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+import hashlib
+
+from fastapi import Request, Response
+
+
+def etag_for(*parts: object) -> str:
+    """Weak ETag derived from the given parts (blake2b, 8-byte digest)."""
+    h = hashlib.blake2b(digest_size=8)
+    for part in parts:
+        h.update(str(part).encode())
+        h.update(b"\0")
+    return f'W/"{h.hexdigest()}"'
+
+
+def conditional(request: Request, response: Response, etag: str, max_age: int) -> Response | None:
+    """Apply ETag/Cache-Control; return a 304 response if the client copy is current.
+
+    When None is returned the headers have been set on `response` and the route
+    should build its body as usual.
+    """
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={max_age}"}
+    inm = request.headers.get("if-none-match")
+    if inm and (inm.strip() == "*" or etag in (t.strip() for t in inm.split(","))):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
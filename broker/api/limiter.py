@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import secrets
+import time
+from types import TracebackType
+
+from fastapi import HTTPException
+from redis.asyncio import Redis
+
+from ..config import settings
+from ..db.cache import get_redis
+from ..logging import get_logger
+
+_log = get_logger()
+
+# Atomically drop slots older than the window, then take one if under the cap.
+# KEYS[1]=zset, ARGV: now, window, limit, slot id. Returns 1 if acquired, else 0.
+_ACQUIRE_LUA = """
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - window)
+if redis.call('ZCARD', KEYS[1]) < tonumber(ARGV[3]) then
+  redis.call('ZADD', KEYS[1], now, ARGV[4])
+  redis.call('EXPIRE', KEYS[1], math.ceil(window))
+  return 1
+end
+return 0
+"""
+
+
+class ConcurrencyLimiter:
+    """Cluster-wide cap on in-flight requests, tracked in a Redis ZSET.
+
+    Each holder adds a slot scored by arrival time and removes it on exit; slots
+    older than `window` seconds are treated as leaked (crashed worker) and dropped.
+    Fails open if Redis is unavailable.
+    """
+
+    def __init__(self, r: Redis, key: str, limit: int, window: float = 60.0) -> None:
+        self.r = r
+        self._acquire = r.register_script(_ACQUIRE_LUA)
+        self.key = key
+        self.limit = limit
+        self.window = window
+        self.slot = secrets.token_hex(4)
+        self.acquired = False
+
+    async def __aenter__(self) -> ConcurrencyLimiter:
+        try:
+            ok = await self._acquire(
+                keys=[self.key], args=[time.time(), self.window, self.limit, self.slot]
+            )
+        except Exception:
+            _log.warning("concurrency_acquire_failed", key=self.key, exc_info=True)
+            return self
+        if not ok:
+            _log.info("concurrency_limited", key=self.key, limit=self.limit)
+            raise HTTPException(
+                status_code=429,
+                detail="too many concurrent requests",
+                headers={"Retry-After": "1"},
+            )
+        self.acquired = True
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        if self.acquired:
+            try:
+                await self.r.zrem(self.key, self.slot)
+            except Exception:
+                # The slot still ages out after `window`; just leave a trace
+                _log.warning("concurrency_release_failed", key=self.key, exc_info=True)
+
+
+def advice_slot() -> ConcurrencyLimiter:
+    """One slot of the cluster-wide /advice cap (429 when saturated).
+
+    Taken around the advice computation itself, so the dashboard overview and the
+    Excel export, which call it directly, count against the same cap.
+    """
+    return ConcurrencyLimiter(get_redis(), key="cc:advice", limit=settings.ADVICE_MAX_CONCURRENT)
@@ -1,66 +1,103 @@
 from __future__ import annotations
 
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from pathlib import Path
+import asyncio
+import os
 from contextlib import asynccontextmanager
 
+import orjson
+from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+
 from .. import __version__
-from ..logging import configure_logging, request_id_middleware
+from ..clients import universalis, xivapi
+from ..clients.universalis import IDS_LEX_KEY, cached_marketable_ids, index_ids_lex
+from ..config import settings
+from ..db.cache import get_redis
+from ..logging import RequestIdMiddleware, configure_logging
+from .assets import assets
+from .middleware import OriginGatedCORSMiddleware
 from .routes import advice, catalog, craft, health, market
 from .routes import export
 from .routes.dashboard import router as dashboard_router
 
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):  # pragma: no cover - integration lifecycle
-    # Startup task: bootstrap local catalog file into Redis if empty
+BOOTSTRAP_BATCH = 1000
+
+
+def _load_catalog_file(path: str) -> dict[str, str]:
+    with open(path, "rb") as f:
+        data = orjson.loads(f.read())
+    if not isinstance(data, dict):
+        return {}
+    return {str(k): str(v) for k, v in data.items()}
+
+
+async def _bootstrap_catalog() -> None:  # pragma: no cover - integration lifecycle
+    """Load the local catalog file into Redis if empty, then index marketable IDs.
+
+    Runs as a background task so the app accepts traffic immediately; catalog
+    routes serve whatever is in Redis meanwhile.
+    """
     try:
-        from ..config import settings as _settings
-        from ..db.cache import get_redis
-        import json, os
-
-        path = _settings.CATALOG_BOOTSTRAP_PATH
-        if path and os.path.exists(path):
-            r = get_redis()
-            count = await r.hlen("x:names")
-            if not count or int(count) <= 0:
-                with open(path, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                if isinstance(data, dict) and data:
-                    await r.hset(
-                        "x:names",
-                        mapping={str(k): str(v) for k, v in data.items()},  # type: ignore[arg-type]
-                    )
+        r = get_redis()
+        path = settings.CATALOG_BOOTSTRAP_PATH
+        if path and os.path.exists(path) and not await r.hlen("x:names"):
+            # Parse off the event loop, then write in pipelined batches
+            data = await asyncio.to_thread(_load_catalog_file, path)
+            items = list(data.items())
+            for i in range(0, len(items), BOOTSTRAP_BATCH):
+                async with r.pipeline(transaction=False) as pipe:
+                    pipe.hset("x:names", mapping=dict(items[i : i + BOOTSTRAP_BATCH]))
+                    await pipe.execute()
+        # Build the ID prefix index if the marketable list is cached but unindexed
+        if not await r.zcard(IDS_LEX_KEY):
+            ids = await cached_marketable_ids()
+            if ids:
+                await index_ids_lex(ids)
+        await r.set(catalog.BOOTSTRAP_FLAG_KEY, "1")
     except Exception:
-        # Best-effort: ignore bootstrap errors to not block the app
+        # Best-effort: ignore bootstrap errors to not affect the app
         pass
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):  # pragma: no cover - integration lifecycle
+    task = asyncio.create_task(_bootstrap_catalog())
     try:
         yield
     finally:
-        # No shutdown hooks at the moment
-        pass
+        if not task.done():
+            task.cancel()
+        await universalis.aclose_client()
+        await xivapi.aclose_client()
 
 
 def create_app() -> FastAPI:
     configure_logging()
-    app = FastAPI(title="FFXIV Broker", version=__version__, lifespan=lifespan)
+    app = FastAPI(
+        title="FFXIV Broker",
+        version=__version__,
+        lifespan=lifespan,
+        default_response_class=ORJSONResponse,
+    )
 
     app.add_middleware(
-        CORSMiddleware,
-        allow_origins=["*"],
+        OriginGatedCORSMiddleware,
+        allow_origins=settings.cors_origins(),
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
     )
-    app.middleware("http")(request_id_middleware)
+    app.add_middleware(RequestIdMiddleware)
 
-    # Static files and templates (use absolute path within package)
-    base_dir = Path(__file__).resolve().parent
-    static_dir = base_dir / "static"
-    # Starlette requires the directory to exist at mount time
-    app.mount("/static", StaticFiles(directory=str(static_dir)), name="static")
+    # Static assets are preloaded in memory and served with long-lived cache headers
+    app.add_api_route(
+        "/static/{path:path}",
+        assets.serve,
+        methods=["GET", "HEAD"],
+        name="static",
+        include_in_schema=False,
+    )
 
     app.include_router(health.router)
     app.include_router(market.router)
@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+from starlette.middleware.cors import CORSMiddleware
+from starlette.types import Receive, Scope, Send
+
+
+class OriginGatedCORSMiddleware(CORSMiddleware):
+    """CORSMiddleware that is bypassed entirely for requests without an Origin header.
+
+    Server-to-server and same-origin GETs carry no Origin, so they skip header
+    parsing and response-header mutation. Preflight (OPTIONS) always goes through CORS.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if scope["method"] != "OPTIONS":
+            for key, _ in scope["headers"]:
+                if key == b"origin":
+                    break
+            else:
+                await self.app(scope, receive, send)
+                return
+        await super().__call__(scope, receive, send)
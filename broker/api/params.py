@@ -0,0 +1,10 @@
+from __future__ import annotations
+
+
+def parse_ids(raw: str) -> list[int]:
+    """Parse a comma-separated ID list ("1, 2,,3" -> [1, 2, 3]); ValueError on junk.
+
+    Blanks are stripped once up front and empty segments dropped by filter(None, ...),
+    so the conversion itself is a single C-level map(int, ...) pass.
+    """
+    return list(map(int, filter(None, raw.replace(" ", "").split(","))))
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import hashlib
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+import orjson
+from fastapi import Response
+
+from ..config import settings
+from ..db.cache import get_bytes, get_redis_raw, ns
+from ..logging import get_logger
+
+_log = get_logger()
+
+
+def _key(name: str, parts: tuple[object, ...]) -> str:
+    h = hashlib.blake2b(digest_size=8)
+    for part in parts:
+        h.update(str(part).encode())
+        h.update(b"\0")
+    return ns("rc", f"{name}:{h.hexdigest()}")
+
+
+def _json(body: bytes, state: str) -> Response:
+    return Response(body, media_type="application/json", headers={"X-Cache": state})
+
+
+async def cached_json(
+    name: str,
+    parts: tuple[object, ...],
+    ttl: int,
+    build: Callable[[], Awaitable[Any]],
+) -> Response:
+    """Serve a JSON payload from a short-TTL Redis cache keyed on `name` + `parts`.
+
+    On a miss the payload is built and stored twice: under the fresh key (`ttl`
+    seconds) and under a stale copy kept for CACHE_TTL_LONG, which is served if a
+    later rebuild raises (e.g. Universalis is down). Redis errors fall through to
+    building the payload uncached.
+    """
+    key = _key(name, parts)
+    try:
+        hit = await get_bytes(key)
+    except Exception:
+        hit = None
+    if hit is not None:
+        return _json(hit, "hit")
+
+    try:
+        payload = await build()
+    except Exception:
+        try:
+            stale = await get_bytes(f"{key}:stale")
+        except Exception:
+            stale = None
+        if stale is None:
+            raise
+        _log.warning("response_cache_stale", cache=name)
+        return _json(stale, "stale")
+
+    body = orjson.dumps(payload)
+    try:
+        async with get_redis_raw().pipeline(transaction=False) as pipe:
+            pipe.set(key, body, ex=ttl)
+            pipe.set(f"{key}:stale", body, ex=settings.CACHE_TTL_LONG or None)
+            await pipe.execute()
+    except Exception:
+        pass
+    return _json(body, "miss")
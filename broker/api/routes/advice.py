@@ -1,35 +1,71 @@
 from __future__ import annotations
 
-from typing import Any
+import time
+from typing import Any, cast
 
-import asyncio
-from fastapi import APIRouter, Query
+import orjson
+from fastapi import APIRouter, Query, Request, Response
 
 from ...clients.universalis import (
     get_item_world,  # kept for potential reuse
     get_marketable_items,
     get_items_world,
 )
-from ...clients.xivapi import get_item_name
+from ...clients.xivapi import get_item_names
 from ...config import settings
 from ...services.advisor import rank_items
 from ...services.metrics import (
-    avg_price,
     flip_flag,
-    median_price,
-    quantile_price,
     roi as roi_fn,
     net_profit_unit as profit_unit_fn,
-    trimmed_mean_price,
-    sales_per_day,
     saturation_flag,
-    units_sold,
+    scan_listings,
+    summarize_history,
 )
-from ...db.cache import get_redis, ns
+from ...db.cache import get_json, get_redis, get_redis_raw, ns
+from ..etag import conditional, etag_for
+from ..limiter import advice_slot
+from ..params import parse_ids
 
 
 router = APIRouter(prefix="/advice", tags=["advice"])
 
+# Browser cache lifetime for /advice/top (payload changes only when the scan job runs)
+TOP_MAX_AGE = 30
+
+
+def _cached_bundle(raw: bytes | None, upload_ts: object, now: int) -> list[Any] | None:
+    """Cached metric bundle if it matches `upload_ts` and is at most CACHE_TTL_SHORT old.
+
+    Corrupt or malformed entries count as misses, so the bundle is recomputed.
+    """
+    if not raw:
+        return None
+    try:
+        entry = orjson.loads(raw)
+    except orjson.JSONDecodeError:
+        return None
+    # [upload_ts, computed_at, lowest, spd, sold, tgt, cv, comp]
+    if not isinstance(entry, list) or len(entry) != 8 or entry[0] != upload_ts:
+        return None
+    computed_at = entry[1]
+    if not isinstance(computed_at, int) or now - computed_at > settings.CACHE_TTL_SHORT:
+        return None
+    return cast(list[Any], entry[2:])
+
+
+def _metrics_bundle(
+    listings: list[dict[str, Any]],
+    history: list[dict[str, Any]],
+    target: str,
+    q: float | None,
+) -> list[Any]:
+    """[lowest, spd, sold, tgt, cv, comp] for one item (one pass over each list)."""
+    summary = summarize_history(history, days=7, target=target, q=q, trim=0.2)
+    tgt = summary.target
+    lowest, comp = scan_listings(listings, tgt) if tgt is not None else (None, 0)
+    return [lowest, summary.sales_per_day, summary.units_sold, tgt, summary.cv, comp]
+
 
 @router.get("")
 async def advice(
@@ -56,11 +92,40 @@ async def advice(
       - Estimate flip ROI: sell at avg7 (net after fees), buy at lowest
       - Rank via advisor.compute_score and return top `limit`
     """
+    async with advice_slot():
+        return await _advice(
+            world,
+            roi_min,
+            limit,
+            max_candidates,
+            offset,
+            ids,
+            min_spd,
+            min_price,
+            min_history,
+            target,
+            q,
+        )
+
+
+async def _advice(
+    world: str,
+    roi_min: float,
+    limit: int,
+    max_candidates: int,
+    offset: int,
+    ids: str | None,
+    min_spd: float,
+    min_price: int,
+    min_history: int,
+    target: str,
+    q: float | None,
+) -> dict[str, Any]:
     # 1) Resolve candidate IDs
     candidate_ids: list[int]
     if ids:
         try:
-            candidate_ids = [int(x) for x in ids.split(",") if x.strip()]
+            candidate_ids = parse_ids(ids)
         except ValueError:
             candidate_ids = []
     else:
@@ -69,7 +134,7 @@ async def advice(
             offset = 0
         start = min(offset, max(0, len(all_ids) - 1))
         end = min(len(all_ids), start + max_candidates)
-        candidate_ids = all_ids[start:end]
+        candidate_ids = list(all_ids[start:end])
 
     # 2) Fetch market data in batches (multi-ID) then compute metrics
     candidates: list[dict[str, Any]] = []
@@ -84,38 +149,46 @@ async def advice(
             except Exception:
                 data_list.append({"listings": [], "recentHistory": []})
 
-    # Concurrency for name resolutions
-    sem_name = asyncio.Semaphore(max(1, min(settings.REQUESTS_RPS // 2 or 1, 10)))
-
-    async def _name(iid: int) -> str | None:
-        async with sem_name:
-            try:
-                return await get_item_name(iid)
-            except Exception:
-                return None
+    # Names: one HMGET on the catalog, bounded parallel lookups for the misses
+    try:
+        names = await get_item_names(
+            candidate_ids, concurrency=min(settings.REQUESTS_RPS // 2 or 1, 10)
+        )
+    except Exception:
+        names = [None] * len(candidate_ids)
 
-    names = await asyncio.gather(*[_name(i) for i in candidate_ids])
+    # Metric bundles are cached per item/target variant and reused while the
+    # item's Universalis lastUploadTime is unchanged and the bundle is younger than
+    # CACHE_TTL_SHORT (entry: [upload_ts, computed_at, *bundle]): sales age out of
+    # the window even when no new upload arrives, and the hash TTL is refreshed by
+    # every write so it cannot bound a single entry's age.
+    # Bundles are orjson blobs: read/write them as bytes, no str decode in between
+    now = int(time.time())
+    r_cache = get_redis_raw()
+    metrics_key = ns("adv", f"metrics:{world}")
+    fields = [f"{iid}:{target}:{q}" for iid in candidate_ids]
+    try:
+        cached_bundles: list[bytes | None] = await r_cache.hmget(metrics_key, fields)
+    except Exception:
+        cached_bundles = [None] * len(candidate_ids)
+    fresh_bundles: dict[str, bytes] = {}
 
-    for iid, data, name in zip(candidate_ids, data_list, names):
+    for iid, data, name, field, raw in zip(
+        candidate_ids, data_list, names, fields, cached_bundles
+    ):
         try:
             listings = data.get("listings", [])
             history = data.get("recentHistory", [])
             if not (listings or history):
                 continue
-            lowest = min((l["pricePerUnit"] for l in listings), default=None)
-            spd = sales_per_day(history, days=7)
-            sold = units_sold(history, days=7)
-            # Select target price according to requested baseline
-            tgt: float | None
-            if q is not None:
-                tgt = quantile_price(history, q=q, days=7)
-            elif target == "median":
-                tgt = median_price(history, days=7)
-            else:
-                # Robust average to avoid outliers skewing ROI
-                tgt = trimmed_mean_price(history, days=7, trim=0.2) or avg_price(history, days=7)
-
-            if lowest is None or tgt is None:
+            upload_ts = data.get("lastUploadTime")
+            bundle = _cached_bundle(raw, upload_ts, now) if upload_ts is not None else None
+            if bundle is None:
+                bundle = _metrics_bundle(listings, history, target, q)
+                if upload_ts is not None:
+                    fresh_bundles[field] = orjson.dumps([upload_ts, now, *bundle])
+            lowest, spd, sold, tgt, cv, comp = bundle
+            if tgt is None or lowest is None:
                 continue
             if spd < min_spd:
                 continue
@@ -132,8 +205,6 @@ async def advice(
             p_unit = profit_unit_fn(target_price=float(tgt), lowest_cost=float(lowest))
             ppd = float(spd) * p_unit
             # Anti-scam: filter unrealistic opportunities (huge ROI/profit with poor evidence)
-            from ...services.metrics import price_cv
-            cv = price_cv(history, days=7)
             if (
                 r > settings.ADVICE_SUSPECT_ROI
                 and (sold < settings.ADVICE_MIN_SALES_SAFE or (cv is not None and cv > settings.ADVICE_SUSPECT_CV))
@@ -142,8 +213,6 @@ async def advice(
             ):
                 # Skip suspicious item entirely
                 continue
-            # Approx competition: number of listings at/below target
-            comp = sum(1 for l in listings if float(l.get("pricePerUnit", 0)) <= float(tgt))
             candidates.append(
                 {
                     "item_id": iid,
@@ -161,51 +230,88 @@ async def advice(
         except Exception:
             continue
 
-    ranked = rank_items(candidates, min_roi=roi_min, min_spd=0.0)[:limit]
+    if fresh_bundles:
+        try:
+            async with r_cache.pipeline(transaction=False) as pipe:
+                pipe.hset(metrics_key, mapping=fresh_bundles)  # type: ignore[arg-type]
+                pipe.expire(metrics_key, settings.CACHE_TTL_SHORT)
+                await pipe.execute()
+        except Exception:
+            pass
+
+    ranked = rank_items(candidates, min_roi=roi_min, min_spd=0.0, top_k=limit)
     return {
         "world": world,
-        "items": [r.__dict__ for r in ranked],
+        "items": ranked,
         "count": len(ranked),
         "scanned": len(candidate_ids),
     }
 
 
-@router.get("/top")
+@router.get("/top", response_model=None)
 async def advice_top(
+    request: Request,
+    response: Response,
     world: str = Query(...),
     limit: int = Query(20, ge=1, le=200),
-) -> dict[str, Any]:
+) -> dict[str, Any] | Response:
     """Return top N precomputed advice items from cache for the given world.
 
     Requires the full-scan job to have populated the cache. If empty, returns
-    an empty list.
+    an empty list. Served from the packed adv:{world}:top payload when present,
+    falling back to the score ZSET + data hash.
     """
+    top = await get_json(ns("adv", f"{world}:top"))
+    if isinstance(top, dict) and isinstance(top.get("items"), list) and top["items"]:
+        not_modified = conditional(
+            request, response, etag_for(world, top.get("ts"), limit), TOP_MAX_AGE
+        )
+        if not_modified is not None:
+            return not_modified
+        top_items = top["items"][:limit]
+        return {
+            "world": world,
+            "items": top_items,
+            "count": len(top_items),
+            "scanned": len(top_items),
+            "source": "cache",
+            "ts": top.get("ts"),
+        }
+
     r = get_redis()
     score_key = ns("adv", f"{world}:score")
     data_key = ns("adv", f"{world}:data")
     ts_key = ns("adv", f"{world}:ts")
-    ids = await r.zrevrange(score_key, 0, max(0, limit - 1))
+    # Ranking and timestamp in one round trip
+    async with r.pipeline(transaction=False) as pipe:
+        pipe.zrevrange(score_key, 0, max(0, limit - 1))
+        pipe.get(ts_key)
+        ids, ts = await pipe.execute()
     if not ids:
         return {"world": world, "items": [], "count": 0, "scanned": 0, "source": "empty"}
-    # Fetch JSONs for those ids
-    vals = await r.hmget(data_key, ids)
+    if ts is not None:
+        not_modified = conditional(request, response, etag_for(world, ts, limit), TOP_MAX_AGE)
+        if not_modified is not None:
+            return not_modified
+    # Fetch JSONs for those ids (bytes pool: handed to orjson undecoded)
+    vals = await get_redis_raw().hmget(data_key, ids)
     items: list[dict[str, Any]] = []
     for raw in vals:
         try:
-            obj = raw and __import__("json").loads(raw)  # type: ignore[arg-type]
+            obj = raw and orjson.loads(raw)
             if isinstance(obj, dict):
                 items.append(obj)
         except Exception:
             continue
-    # Fill missing names lazily
-    for it in items:
-        if not it.get("name"):
-            try:
-                nm = await get_item_name(int(it.get("item_id", 0)))
+    # Fill missing names in one batch
+    unnamed = [it for it in items if not it.get("name")]
+    if unnamed:
+        try:
+            nms = await get_item_names([int(it.get("item_id", 0)) for it in unnamed])
+            for it, nm in zip(unnamed, nms):
                 it["name"] = nm
-            except Exception:
-                pass
-    ts = await r.get(ts_key)
+        except Exception:
+            pass
     return {
         "world": world,
         "items": items[:limit],
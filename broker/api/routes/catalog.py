@@ -2,19 +2,59 @@ from __future__ import annotations
 
 from typing import Any
 
-from fastapi import APIRouter, HTTPException, Path, Query
+from fastapi import APIRouter, HTTPException, Path, Query, Request, Response
 
+from ...clients.universalis import IDS_LEX_KEY, cached_marketable_ids
 from ...clients.xivapi import get_item_name
-from ...db.cache import get_redis, get_json, ns
+from ...db.cache import get_redis
+from ..etag import conditional, etag_for
 
 
 router = APIRouter(prefix="/catalog", tags=["catalog"])
 
-
-@router.get("/item/{item_id}")
+# Set once the startup catalog bootstrap has finished (or found nothing to do)
+BOOTSTRAP_FLAG_KEY = "x:names:bootstrapped"
+
+# Names are near-immutable; let browsers reuse them for an hour
+NAME_MAX_AGE = 3600
+
+# Server-side substring search over the id->name hash. ARGV[1] is the casefolded
+# needle (empty matches all), ARGV[2] the max number of matches. Returns a flat
+# [id, name, id, name, ...] list so only matching pairs cross the wire.
+_SEARCH_LUA = """
+local needle = ARGV[1]
+local limit = tonumber(ARGV[2])
+local out = {}
+local n = 0
+local cursor = "0"
+repeat
+  local res = redis.call('HSCAN', KEYS[1], cursor, 'COUNT', 2000)
+  cursor = res[1]
+  local kv = res[2]
+  for i = 1, #kv, 2 do
+    local k, v = kv[i], kv[i + 1]
+    if needle == '' or string.find(string.lower(v), needle, 1, true)
+        or string.find(k, needle, 1, true) then
+      out[#out + 1] = k
+      out[#out + 1] = v
+      n = n + 1
+      if n >= limit then
+        return out
+      end
+    end
+  end
+until cursor == "0"
+return out
+"""
+_search_names = get_redis().register_script(_SEARCH_LUA)
+
+
+@router.get("/item/{item_id}", response_model=None)
 async def item_name(
+    request: Request,
+    response: Response,
     item_id: int = Path(..., ge=1),
-) -> dict[str, Any]:
+) -> dict[str, Any] | Response:
     """Return item name by ID, reading from Redis hash and lazily populating if missing.
 
     If the name cannot be resolved, returns name = null and found = false.
@@ -26,6 +66,10 @@ async def item_name(
         name = await get_item_name(item_id)
         if name:
             await r.hset("x:names", str(item_id), name)
+    if name is not None:
+        not_modified = conditional(request, response, etag_for(item_id, name), NAME_MAX_AGE)
+        if not_modified is not None:
+            return not_modified
     return {"item_id": item_id, "name": name, "found": name is not None}
 
 
@@ -36,33 +80,27 @@ async def search(
 ) -> dict[str, Any]:
     """Case-insensitive substring search over the id->name catalog.
 
-    Implemented via HSCAN on Redis hash `x:names`, client-side filter.
+    Implemented via a Lua script that HSCANs Redis hash `x:names` server-side.
     """
     q_raw = q.strip()
     q_norm = q_raw.casefold()
-    r = get_redis()
-    cursor: int = 0
-    results: list[dict[str, Any]] = []
-    # Iterate until we collect `limit` or we've scanned all
-    while True:
-        cursor, chunk = await r.hscan("x:names", cursor=cursor, count=1000)
-        for k, v in chunk.items():
-            if not q_norm or q_norm in v.casefold() or q_norm in k:
-                results.append({"item_id": int(k), "name": v})
-                if len(results) >= limit:
-                    return {"count": len(results), "items": results}
-        if cursor == 0:
-            break
+    flat = await _search_names(keys=["x:names"], args=[q_norm, limit])
+    results: list[dict[str, Any]] = [
+        {"item_id": int(k), "name": v} for k, v in zip(flat[::2], flat[1::2])
+    ]
+    if len(results) >= limit:
+        return {"count": len(results), "items": results}
 
     # Numeric fallback: allow searching by ID even if name is missing
     digits = q_raw.lstrip("#")
     if digits.isdigit():
-        ids_any = await get_json(ns("u", "marketable"))
-        ids = [int(x) for x in (ids_any or [])]
-        existing = {int(r["item_id"]) for r in results}
-        for iid in ids:
-            s = str(iid)
-            if s.startswith(digits) and iid not in existing:
+        # Prefix lookup on the lexicographic ID index (see index_ids_lex)
+        r = get_redis()
+        existing = {int(it["item_id"]) for it in results}
+        matches = await r.zrangebylex(IDS_LEX_KEY, f"[{digits}", f"[{digits}\xff", 0, limit)
+        for k in matches:
+            iid = int(k)
+            if iid not in existing:
                 results.append({"item_id": iid, "name": None})
                 if len(results) >= limit:
                     break
@@ -78,16 +116,18 @@ async def stats(sample_missing: int = Query(0, ge=0, le=200)) -> dict[str, Any]:
     - marketable_count: number of IDs in Universalis marketable list (if cached)
     - missing_count: marketable_count - names_count (approx)
     - missing_sample: up to N missing IDs
+    - bootstrapped: whether the startup catalog bootstrap has completed
     """
     r = get_redis()
     names_count = int(await r.hlen("x:names"))
-    ids_any = await get_json(ns("u", "marketable"))
-    ids = [int(x) for x in (ids_any or [])]
+    bootstrapped = bool(await r.exists(BOOTSTRAP_FLAG_KEY))
+    ids = await cached_marketable_ids() or ()
     marketable_count = len(ids)
     result: dict[str, Any] = {
         "names_count": names_count,
         "marketable_count": marketable_count,
         "missing_count": max(0, marketable_count - names_count),
+        "bootstrapped": bootstrapped,
     }
     if sample_missing and marketable_count:
         named = {int(k) for k in await r.hkeys("x:names")}
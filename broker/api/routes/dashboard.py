@@ -1,26 +1,27 @@
 from __future__ import annotations
 
-import asyncio
+import sys
+from collections.abc import Mapping
+from itertools import chain
+from types import MappingProxyType
 from typing import Any
 
-from fastapi import APIRouter, Request
-from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
-from pathlib import Path
+from fastapi import APIRouter, Request, Response
+from fastapi.responses import HTMLResponse, ORJSONResponse
 
 from ...config import settings
 from ...clients.universalis import get_item_world, get_items_world
-from ...clients.xivapi import get_item_name
+from ...clients.xivapi import get_item_names
 from ...services.metrics import (
-    avg_price, sales_per_day, saturation_flag, flip_flag
+    saturation_flag, flip_flag, lowest_price, window_stats_batch
 )
+from ..etag import conditional, etag_for
+from ..respcache import cached_json
+from ..templating import templates
 from .advice import advice as advice_endpoint
 
 
 router = APIRouter()
-# Resolve templates folder relative to this file
-_base_dir = Path(__file__).resolve().parent.parent  # broker/api
-templates = Jinja2Templates(directory=str(_base_dir / "templates"))
 
 
 @router.get("/", response_class=HTMLResponse)
@@ -41,7 +42,7 @@ async def dashboard_home_no_slash(request: Request):
 
 
 # FFXIV Data Centers and Worlds mapping
-FFXIV_DATA_CENTERS = {
+_DATA_CENTERS_RAW = {
     "Light": ["Phoenix", "Shiva", "Zodiark", "Twintania", "Alpha", "Raiden"],
     "Chaos": ["Cerberus", "Louisoix", "Moogle", "Omega", "Ragnarok",
               "Sagittarius"],
@@ -62,38 +63,72 @@ FFXIV_DATA_CENTERS = {
                "Lamia", "Leviathan", "Ultros"],
     "Materia": ["Bismarck", "Ravana", "Sephirot", "Sophia", "Zurvan"]
 }
+# Read-only view with tuple values; names are interned so membership checks
+# against request strings mostly hit the identity fast path.
+FFXIV_DATA_CENTERS: Mapping[str, tuple[str, ...]] = MappingProxyType(
+    {sys.intern(dc): tuple(sys.intern(w) for w in ws) for dc, ws in _DATA_CENTERS_RAW.items()}
+)
+
+# Static lookups derived once from the mapping above
+_DC_LIST = tuple(FFXIV_DATA_CENTERS)
+_ALL_WORLDS = frozenset(chain.from_iterable(FFXIV_DATA_CENTERS.values()))
+_ALL_WORLDS_SORTED = tuple(sorted(_ALL_WORLDS))
+_DC_ETAG = etag_for(*_DC_LIST)
+_WORLDS_ETAG = etag_for(*(f"{dc}={','.join(ws)}" for dc, ws in FFXIV_DATA_CENTERS.items()))
+STATIC_MAX_AGE = 86400
+
 
-@router.get("/data/data-centers")
-async def data_centers() -> dict[str, Any]:
+@router.get("/data/data-centers", response_model=None)
+async def data_centers(request: Request, response: Response) -> dict[str, Any] | Response:
     """Restituisce la lista dei Data Centers disponibili"""
-    return {"data_centers": list(FFXIV_DATA_CENTERS.keys())}
+    not_modified = conditional(request, response, _DC_ETAG, STATIC_MAX_AGE)
+    if not_modified is not None:
+        return not_modified
+    return {"data_centers": _DC_LIST}
 
 
-@router.get("/data/worlds")
-async def worlds(data_center: str | None = None) -> dict[str, Any]:
+@router.get("/data/worlds", response_model=None)
+async def worlds(
+    request: Request, response: Response, data_center: str | None = None
+) -> dict[str, Any] | Response:
     """Restituisce la lista dei Worlds, opzionalmente filtrati per Data Center"""
+    allowed = settings.allowed_worlds()
+    # The raw setting identifies the whitelist; no need to sort the parsed set
+    etag = etag_for(_WORLDS_ETAG, data_center, settings.ALLOWED_WORLDS if allowed else None)
+    not_modified = conditional(request, response, etag, STATIC_MAX_AGE)
+    if not_modified is not None:
+        return not_modified
+
     if data_center and data_center in FFXIV_DATA_CENTERS:
         return {"worlds": FFXIV_DATA_CENTERS[data_center]}
 
-    # Se non specificato, restituisce tutti i worlds
-    all_worlds = []
-    for world_list in FFXIV_DATA_CENTERS.values():
-        all_worlds.extend(world_list)
+    # Se non specificato, restituisce tutti i worlds (limitati dalle impostazioni)
+    if allowed:
+        return {"worlds": [w for w in _ALL_WORLDS_SORTED if w in allowed]}
+    return {"worlds": _ALL_WORLDS_SORTED}
 
-    # Controlla se ci sono mondi limitati nelle impostazioni
-    allowed = settings.allowed_worlds()
-    if allowed is not None and len(allowed) > 0:
-        all_worlds = [w for w in all_worlds if w in allowed]
 
-    return {"worlds": sorted(set(all_worlds))}
+OVERVIEW_TTL = 20
 
 
-@router.get("/data/overview")
+@router.get("/data/overview", response_class=ORJSONResponse)
 async def overview(
     world: str,
     limit: int = 8,
     source: str = "advice",
     roi_min: float = 0.0,
+) -> Response:
+    # Dashboards poll this: serve repeats from a short-lived response cache
+    return await cached_json(
+        "overview",
+        (world, limit, source, roi_min),
+        OVERVIEW_TTL,
+        lambda: _overview_payload(world, limit, source, roi_min),
+    )
+
+
+async def _overview_payload(
+    world: str, limit: int, source: str, roi_min: float
 ) -> dict[str, Any]:
     # 1) Ottieni lista ID item: da advice o fallback seed
     ids: list[int] = []
@@ -137,20 +172,24 @@ async def overview(
             except Exception:
                 data_list.append({"listings": [], "recentHistory": []})
 
-    async def _name(iid: int) -> str:
-        if iid in names_hint:
-            return str(names_hint[iid])
-        return await get_item_name(iid) or f"Item {iid}"
+    missing = [i for i in ids if i not in names_hint]
+    if missing:
+        try:
+            resolved = await get_item_names(missing)
+        except Exception:
+            resolved = [None] * len(missing)
+        for iid, name in zip(missing, resolved):
+            if name:
+                names_hint[iid] = name
+    names = [names_hint.get(i) or f"Item {i}" for i in ids]
 
-    names = await asyncio.gather(*[_name(i) for i in ids])
+    # 7-day avg price and sales/day for all items in one vectorized pass
+    stats = window_stats_batch([data.get("recentHistory", []) for data in data_list], days=7)
 
     items: list[dict[str, Any]] = []
-    for iid, data, name in zip(ids, data_list, names):
+    for iid, data, name, (a7, spd) in zip(ids, data_list, names, stats):
         listings = data.get("listings", [])
-        history = data.get("recentHistory", [])
-        lowest = min((listing["pricePerUnit"] for listing in listings), default=None)
-        a7 = avg_price(history, days=7)
-        spd = sales_per_day(history, days=7)
+        lowest = lowest_price(listings)
         flags: list[str] = []
         if lowest is not None and saturation_flag(stock_count=len(listings), spd=spd):
             flags.append("saturo")
@@ -1,17 +1,28 @@
 from __future__ import annotations
 
+import asyncio
 from io import BytesIO
 from typing import Any
 
-from fastapi import APIRouter, Query
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Query, Response
 
+from ...config import settings
+from ...db.cache import get_bytes, ns, set_bytes
 from ...exporters.excel import build_workbook
 from .advice import advice as advice_endpoint
 
 
 router = APIRouter(prefix="/export", tags=["export"])
 
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def _render_xlsx(advice_items: list[dict[str, Any]], world: str) -> bytes:
+    wb = build_workbook(items=[], recipes=[], advice=advice_items, world=world)
+    buf = BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
 
 @router.get("/excel/advice")
 async def export_advice_excel(
@@ -24,12 +35,27 @@ async def export_advice_excel(
     min_history: int = Query(0, ge=0),
     target: str = Query("avg"),
     q: float | None = Query(None, ge=0.0, le=1.0),
-) -> StreamingResponse:
+) -> Response:
     """Generate an Excel workbook with current advice list.
 
     Uses the advice endpoint's output to populate the Advisor sheet. Items/Recipes
-    sheets are left minimal for now and can be enriched later.
+    sheets are left minimal for now and can be enriched later. The built file is
+    cached per parameter set for CACHE_TTL_SHORT, so re-exports skip both the
+    advice pipeline and the workbook build.
     """
+    filename = f"ffxiv_advice_{world}.xlsx"
+    headers = {"Content-Disposition": f"attachment; filename={filename}"}
+    key = ns(
+        "xlsx",
+        f"{world}:{roi_min}:{limit}:{max_candidates}:{min_spd}:{min_price}:{min_history}:{target}:{q}",
+    )
+    try:
+        cached = await get_bytes(key)
+    except Exception:
+        cached = None
+    if cached is not None:
+        return Response(cached, media_type=XLSX_MEDIA_TYPE, headers=headers)
+
     data = await advice_endpoint(
         world=world,
         roi_min=roi_min,
@@ -54,16 +80,10 @@ async def export_advice_excel(
         for i in data.get("items", [])
     ]
 
-    wb = build_workbook(items=[], recipes=[], advice=advice_items, world=world)
-    buf = BytesIO()
-    wb.save(buf)
-    buf.seek(0)
-    filename = f"ffxiv_advice_{world}.xlsx"
-    headers = {"Content-Disposition": f"attachment; filename={filename}"}
-    return StreamingResponse(
-        buf,
-        media_type=(
-            "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        ),
-        headers=headers,
-    )
+    # openpyxl is CPU-bound: build off the event loop
+    body = await asyncio.to_thread(_render_xlsx, advice_items, world)
+    try:
+        await set_bytes(key, body, ttl=settings.CACHE_TTL_SHORT)
+    except Exception:
+        pass
+    return Response(body, media_type=XLSX_MEDIA_TYPE, headers=headers)
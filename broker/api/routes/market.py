@@ -1,20 +1,36 @@
 from __future__ import annotations
 
 import asyncio
-from fastapi import APIRouter, HTTPException, Query
+import statistics
+from fastapi import APIRouter, HTTPException, Query, Response
+from fastapi.responses import ORJSONResponse
 
 from ...clients.universalis import get_item_world, get_items_world
 from .dashboard import FFXIV_DATA_CENTERS  # reuse DC mapping
 from ...config import settings
 from ...models.market import ItemStats
-from ...services.metrics import avg_price, flip_flag, sales_per_day, saturation_flag
+from ...services.metrics import (
+    flip_flag,
+    lowest_price,
+    saturation_flag,
+    summarize_history,
+)
+from ..params import parse_ids
+from ..respcache import cached_json
 
 router = APIRouter(prefix="/market", tags=["market"])
 
+_NO_PRICE = 1 << 62
+# Short response-cache TTLs (seconds): dashboards poll these repeatedly
+ITEMS_RAW_TTL = 30
+ARBITRAGE_TTL = 15
+# Max ids per /market/items call (five upstream multi-item chunks)
+ITEMS_MAX_BATCH = 500
+
 
 def _validate_world(world: str) -> None:
     allowed = settings.allowed_worlds()
-    if allowed is not None and world not in allowed:
+    if allowed and world not in allowed:
         raise HTTPException(status_code=400, detail="world not allowed")
 
 
@@ -27,9 +43,9 @@ async def item_stats(
     data = await get_item_world(item_id, world)
     listings = data.get("listings", [])
     history = data.get("recentHistory", [])
-    lowest = min((listing["pricePerUnit"] for listing in listings), default=None)
-    a7 = avg_price(history, days=7)
-    spd = sales_per_day(history, days=7)
+    lowest = lowest_price(listings)
+    stats = summarize_history(history, days=7)
+    a7, spd = stats.avg, stats.sales_per_day
     flags: list[str] = []
     if lowest is not None and saturation_flag(stock_count=len(listings), spd=spd):
         flags.append("saturo")
@@ -45,27 +61,29 @@ async def item_stats(
     )
 
 
-@router.get("/item/{item_id}/raw")
+@router.get("/item/{item_id}/raw", response_class=ORJSONResponse)
 async def item_raw(
     item_id: int,
     world: str = Query(..., description="World name e.g. Phoenix"),
-) -> dict[str, object]:
+) -> ORJSONResponse:
     """Return raw Universalis data (listings + recentHistory) for charting/frontend."""
     _validate_world(world)
     data = await get_item_world(item_id, world)
-    return {
-        "item_id": item_id,
-        "world": world,
-        "listings": data.get("listings", []),
-        "recentHistory": data.get("recentHistory", []),
-    }
+    return ORJSONResponse(
+        {
+            "item_id": item_id,
+            "world": world,
+            "listings": data.get("listings", []),
+            "recentHistory": data.get("recentHistory", []),
+        }
+    )
 
 
-@router.get("/items")
+@router.get("/items", response_class=ORJSONResponse)
 async def items_raw(
     ids: str = Query(..., description="Comma-separated item IDs"),
     world: str = Query(..., description="World name e.g. Phoenix"),
-) -> dict[str, object]:
+) -> Response:
     """Return raw Universalis data for multiple items in one call.
 
     Response shape aligns with single-item raw endpoint but for many items:
@@ -77,30 +95,37 @@ async def items_raw(
     """
     _validate_world(world)
     try:
-        item_ids = [int(x) for x in ids.split(",") if x.strip()]
+        item_ids = parse_ids(ids)
     except ValueError:
         raise HTTPException(status_code=400, detail="invalid ids parameter")
     if not item_ids:
         raise HTTPException(status_code=400, detail="ids required")
+    if len(item_ids) > ITEMS_MAX_BATCH:
+        raise HTTPException(status_code=400, detail=f"at most {ITEMS_MAX_BATCH} ids")
+
+    return await cached_json(
+        "items", (world, *item_ids), ITEMS_RAW_TTL, lambda: _items_payload(item_ids, world)
+    )
 
-    data_list = await get_items_world(item_ids, world)
-    items = []
-    for iid, data in zip(item_ids, data_list):
-        items.append(
-            {
-                "item_id": iid,
-                "listings": data.get("listings", []),
-                "recentHistory": data.get("recentHistory", []),
-            }
-        )
+
+async def _items_payload(item_ids: list[int], world: str) -> dict[str, object]:
+    # Keep the documented per-item shape (get_items_world also carries lastUploadTime)
+    items = [
+        {
+            "item_id": data["item_id"],
+            "listings": data.get("listings", []),
+            "recentHistory": data.get("recentHistory", []),
+        }
+        for data in await get_items_world(item_ids, world)
+    ]
     return {"world": world, "count": len(items), "items": items}
 
 
-@router.get("/arbitrage/{item_id}")
+@router.get("/arbitrage/{item_id}", response_class=ORJSONResponse)
 async def arbitrage_dc(
     item_id: int,
     dc: str = Query(..., description="Data Center name e.g. Light"),
-) -> dict[str, object]:
+) -> Response:
     """Compare lowest prices for an item across all Worlds in a Data Center.
 
     Returns median of the lowest prices and a per-world list with optional lows.
@@ -108,29 +133,37 @@ async def arbitrage_dc(
     if dc not in FFXIV_DATA_CENTERS:
         raise HTTPException(status_code=400, detail="unknown data center")
 
-    worlds = list(FFXIV_DATA_CENTERS[dc])
+    return await cached_json(
+        "arbitrage", (item_id, dc), ARBITRAGE_TTL, lambda: _arbitrage_payload(item_id, dc)
+    )
+
+
+async def _arbitrage_payload(item_id: int, dc: str) -> dict[str, object]:
     # Apply optional whitelist
     allowed = settings.allowed_worlds()
-    if allowed is not None and len(allowed) > 0:
-        worlds = [w for w in worlds if w in allowed]
+    dc_worlds = FFXIV_DATA_CENTERS[dc]
+    worlds = [w for w in dc_worlds if w in allowed] if allowed else list(dc_worlds)
     if not worlds:
         return {"item_id": item_id, "data_center": dc, "median": None, "results": []}
 
+    # Worlds are fetched concurrently, capped so a large DC cannot drain the shared pool
+    sem = asyncio.Semaphore(settings.ARBITRAGE_CONCURRENCY)
+
     async def _one(w: str) -> tuple[str, int | None]:
         try:
-            data = await get_item_world(item_id, w)
+            async with sem:
+                data = await get_item_world(item_id, w)
             listings = data.get("listings", [])
-            low = min((l["pricePerUnit"] for l in listings), default=None)
+            low = lowest_price(listings)
             return w, (int(low) if low is not None else None)
         except Exception:
             return w, None
 
     pairs = await asyncio.gather(*[_one(w) for w in worlds])
+    vals = [v for _, v in pairs if v is not None]
+    # Upper median (vals[n // 2] of the sorted prices)
+    median = statistics.median_high(vals) if vals else None
+    # Sort by price asc, Nones at end (scalar key: missing prices map past any real one)
+    pairs.sort(key=lambda p: p[1] if p[1] is not None else _NO_PRICE)
     results = [{"world": w, "lowest": v} for w, v in pairs]
-    vals = sorted([v for _, v in pairs if v is not None])
-    median = None
-    if vals:
-        median = vals[len(vals) // 2]
-    # Sort by price asc, Nones at end
-    results.sort(key=lambda r: (r["lowest"] is None, r["lowest"] if r["lowest"] is not None else 10**18))
     return {"item_id": item_id, "data_center": dc, "median": median, "results": results}
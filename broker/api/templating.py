@@ -0,0 +1,21 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from fastapi.templating import Jinja2Templates
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+from ..config import settings
+from .assets import assets
+
+# Single process-wide Jinja environment: compiled templates are reused across
+# requests, and bytecode is persisted so restarts skip the parse/compile pass.
+env = Environment(
+    loader=FileSystemLoader(Path(__file__).resolve().parent / "templates"),
+    autoescape=True,
+    auto_reload=settings.DEBUG,
+    bytecode_cache=FileSystemBytecodeCache(),
+)
+templates = Jinja2Templates(env=env)
+# Content-versioned asset URLs: {{ static_url('css/main.css') }}
+env.globals["static_url"] = assets.url
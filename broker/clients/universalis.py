@@ -1,27 +1,85 @@
 from __future__ import annotations
 
 import asyncio
+import struct
+import sys
+import time
+from array import array
 from typing import Any, cast, Iterable
 
 import httpx
-from tenacity import AsyncRetrying, retry_if_exception_type, stop_after_attempt, wait_exponential
+import orjson
 
 from ..config import settings
-from ..db.cache import get_json, ns, set_json
+from ..db.cache import (
+    get_bytes,
+    get_json,
+    get_json_many,
+    get_redis,
+    ns,
+    set_bytes,
+    set_json,
+    set_json_many,
+)
 from ..logging import get_logger
 
 _log = get_logger()
 
+# ZSET of marketable IDs (all score 0) as plain decimal strings, for ZRANGEBYLEX prefix lookups
+IDS_LEX_KEY = ns("x", "ids:lex")
+
+
+_CLIENT: httpx.AsyncClient | None = None
+
+
+class _RateLimiter:
+    """Process-wide request pacing (GCRA): up to `rate` calls back-to-back, then
+    one every 1/rate seconds. Reservations happen without awaiting, so no lock is
+    needed, and nothing is bound to an event loop.
+    """
+
+    def __init__(self, rate: int) -> None:
+        self.interval = 1.0 / max(1, rate)
+        self.allowance = (max(1, rate) - 1) * self.interval
+        self._tat = 0.0  # theoretical arrival time of the next request
+
+    async def wait(self) -> None:
+        now = time.monotonic()
+        tat = max(self._tat, now)
+        self._tat = tat + self.interval
+        delay = tat - now - self.allowance
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+_limiter = _RateLimiter(settings.REQUESTS_RPS)
 
-def _retryer() -> AsyncRetrying:
-    return AsyncRetrying(
-        reraise=True,
-        stop=stop_after_attempt(settings.RETRY_MAX),
-        wait=wait_exponential(multiplier=0.2, min=0.2, max=3),
-        retry=retry_if_exception_type(
-            (httpx.ReadTimeout, httpx.ConnectTimeout, httpx.HTTPStatusError)
-        ),
-    )
+
+async def _limited_get(client: httpx.AsyncClient, url: str) -> httpx.Response:
+    """GET through the shared limiter so concurrent fan-outs respect REQUESTS_RPS."""
+    await _limiter.wait()
+    return await client.get(url)
+
+
+_RETRY_ON = (httpx.ReadTimeout, httpx.ConnectTimeout, httpx.HTTPStatusError)
+
+
+async def _get_with_retry(client: httpx.AsyncClient, url: str) -> httpx.Response:
+    """Paced GET + raise_for_status, retried with exponential backoff (0.2s doubling,
+    capped at 3s) on timeouts and HTTP errors, up to RETRY_MAX attempts.
+    Inline loop: nothing is allocated on the success path.
+    """
+    for attempt in range(max(1, settings.RETRY_MAX) - 1):
+        try:
+            resp = await _limited_get(client, url)
+            resp.raise_for_status()
+            return resp
+        except _RETRY_ON:
+            await asyncio.sleep(min(3.0, 0.2 * (2**attempt)))
+    # Last attempt: errors propagate to the caller
+    resp = await _limited_get(client, url)
+    resp.raise_for_status()
+    return resp
 
 
 def _client() -> httpx.AsyncClient:
@@ -29,45 +87,72 @@ def _client() -> httpx.AsyncClient:
         base_url=str(settings.UNIVERSALIS_BASE),
         timeout=httpx.Timeout(10.0, read=10.0),
         headers={"User-Agent": settings.USER_AGENT},
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=50, keepalive_expiry=30),
         http2=True,
     )
 
 
+async def _get_client() -> httpx.AsyncClient:
+    """Shared client: keeps TLS/HTTP2 connections alive across calls."""
+    global _CLIENT
+    if _CLIENT is None:
+        _CLIENT = _client()
+    return _CLIENT
+
+
+async def aclose_client() -> None:
+    global _CLIENT
+    if _CLIENT is not None:
+        client, _CLIENT = _CLIENT, None
+        await client.aclose()
+
+
 async def get_item_world(item_id: int, world: str) -> dict[str, Any]:
     """Fetch item market data (listings + recentHistory) for a world, with caching.
 
     Cache keys:
       - u:{world}:{item_id}:listings
       - u:{world}:{item_id}:history
+      - u:{world}:{item_id}:upload (Universalis lastUploadTime, stored next to listings)
     """
     listings_key = ns("u", f"{world}:{item_id}:listings")
     history_key = ns("u", f"{world}:{item_id}:history")
+    upload_key = ns("u", f"{world}:{item_id}:upload")
 
-    cached_listings = await get_json(listings_key)
-    cached_history = await get_json(history_key)
+    cached_listings, cached_history, cached_upload = await get_json_many(
+        [listings_key, history_key, upload_key]
+    )
     if cached_listings is not None and cached_history is not None:
-        return {"listings": cached_listings, "recentHistory": cached_history}
-
-    async with _client() as client:
-        async for attempt in _retryer():
-            with attempt:
-                resp = await client.get(f"/v2/{world}/{item_id}")
-                resp.raise_for_status()
-                data = resp.json()
-                listings = data.get("listings", [])
-                history = data.get("recentHistory", [])
-                await set_json(listings_key, listings, ttl=settings.CACHE_TTL_SHORT)
-                await set_json(history_key, history, ttl=settings.CACHE_TTL_LONG)
-                _log.info(
-                    "universalis_item_fetched",
-                    world=world,
-                    item_id=item_id,
-                    listings=len(listings),
-                    history=len(history),
-                )
-                return {"listings": listings, "recentHistory": history}
-    # Fallback to avoid mypy complaints; in practice, above paths return or raise
-    return {"listings": [], "recentHistory": []}
+        return {
+            "listings": cached_listings,
+            "recentHistory": cached_history,
+            "lastUploadTime": cached_upload,
+        }
+
+    client = await _get_client()
+    resp = await _get_with_retry(client, f"/v2/{world}/{item_id}")
+    data = orjson.loads(resp.content)
+    listings = data.get("listings", [])
+    history = data.get("recentHistory", [])
+    await set_json_many(
+        [
+            (listings_key, listings, settings.CACHE_TTL_SHORT),
+            (history_key, history, settings.CACHE_TTL_LONG),
+            (upload_key, data.get("lastUploadTime"), settings.CACHE_TTL_SHORT),
+        ]
+    )
+    _log.info(
+        "universalis_item_fetched",
+        world=world,
+        item_id=item_id,
+        listings=len(listings),
+        history=len(history),
+    )
+    return {
+        "listings": listings,
+        "recentHistory": history,
+        "lastUploadTime": data.get("lastUploadTime"),
+    }
 
 
 def _chunks(seq: Iterable[int], size: int) -> Iterable[list[int]]:
@@ -81,123 +166,216 @@ def _chunks(seq: Iterable[int], size: int) -> Iterable[list[int]]:
         yield buf
 
 
+def _parse_multi(data: Any) -> list[tuple[int, dict[str, Any]]]:
+    """(item id, item payload) pairs from a Universalis multi-item response.
+
+    The endpoint can return:
+      - { items: { "123": {...}, "456": {...} }, itemIDs: [...] }
+      - or legacy { items: [ {...}, ... ] } / a single item object
+    """
+    parsed: list[tuple[int, dict[str, Any]]] = []
+    items_val = data.get("items") if isinstance(data, dict) else None
+    if isinstance(items_val, dict):
+        # Keyed by ID already: no need to dig it out of each item
+        for k, v in items_val.items():
+            try:
+                iid = int(k)
+            except ValueError:
+                continue
+            if isinstance(v, dict):
+                parsed.append((iid, cast(dict[str, Any], v)))
+        return parsed
+    if isinstance(items_val, list):
+        items_list = cast(list[dict[str, Any]], items_val)
+    elif isinstance(data, dict):
+        # Single item object fallback
+        items_list = [cast(dict[str, Any], data)]
+    else:
+        items_list = []
+    for item in items_list:
+        iid_i = _item_id(item)
+        if iid_i is not None:
+            parsed.append((iid_i, item))
+    return parsed
+
+
+def _item_id(item: dict[str, Any]) -> int | None:
+    # Be defensive on key names in list-shaped responses
+    iid_any = item.get("itemID") or item.get("itemId") or item.get("item_id") or item.get("item")
+    try:
+        return int(iid_any) if iid_any is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
 async def get_items_world(item_ids: list[int], world: str) -> list[dict[str, Any]]:
     """Batch fetch items for a world using Universalis multi-ID endpoint.
 
-    - Calls /v2/{world}/{ids_csv} in chunks (max ~100 per request for safety)
-    - Stores per-item listings/history in cache with the same keys as get_item_world
-    - Returns a list aligned to the input order; each element has keys 'listings' and 'recentHistory'
+    - Serves items whose listings+history are both cached (one MGET for all keys)
+    - Calls /v2/{world}/{ids_csv} in chunks of UNIVERSALIS_CHUNK ids (API max 100) for the rest
+    - Stores per-item listings/history/upload in cache with the same keys as get_item_world
+    - Returns a list aligned to the input order; each element has keys 'item_id', 'listings',
+      'recentHistory' and 'lastUploadTime' (None when the cached entry predates it)
     """
     if not item_ids:
         return []
 
-    # Prepare result slots aligned to input order
-    order = {iid: idx for idx, iid in enumerate(item_ids)}
-    out: list[dict[str, Any]] = [
-        {"listings": [], "recentHistory": []} for _ in range(len(item_ids))
-    ]
-
-    # Limit per-request item count conservatively
-    max_per_req = 100
-
-    async with _client() as client:
-        # Process in chunks to respect endpoint limits
-        for group in _chunks(item_ids, max_per_req):
-            ids_csv = ",".join(str(i) for i in group)
-            async for attempt in _retryer():
-                with attempt:
-                    resp = await client.get(f"/v2/{world}/{ids_csv}")
-                    resp.raise_for_status()
-                    data = resp.json()
-
-                    # Universalis multi endpoint can return:
-                    #  - { items: { "123": {...}, "456": {...} }, itemIDs: [...] }
-                    #  - or legacy { items: [ {...}, ... ] }
-                    items_list: list[dict[str, Any]] = []
-                    if isinstance(data, dict):
-                        items_val = data.get("items")
-                        if isinstance(items_val, dict):
-                            for k, v in items_val.items():
-                                try:
-                                    iid_k = int(k)
-                                except Exception:
-                                    iid_k = None
-                                if isinstance(v, dict):
-                                    # Ensure itemID present for downstream logic
-                                    if iid_k is not None and "itemID" not in v:
-                                        v = {**v, "itemID": iid_k}
-                                    items_list.append(cast(dict[str, Any], v))
-                        elif isinstance(items_val, list):
-                            items_list = cast(list[dict[str, Any]], items_val)  # type: ignore[assignment]
-                        else:
-                            # Single item object fallback
-                            items_list = [cast(dict[str, Any], data)]
-
-                    for item in items_list:
-                        # Be defensive on key names
-                        iid_any = (
-                            item.get("itemID")
-                            or item.get("itemId")
-                            or item.get("item_id")
-                            or item.get("item")
-                        )
-                        try:
-                            iid = int(iid_any) if iid_any is not None else None
-                        except Exception:
-                            iid = None
-                        if iid is None or iid not in order:
-                            continue
-
-                        listings = item.get("listings", [])
-                        history = item.get("recentHistory", [])
-
-                        # Update cache for each item, matching single fetch behavior
-                        try:
-                            listings_key = ns("u", f"{world}:{iid}:listings")
-                            history_key = ns("u", f"{world}:{iid}:history")
-                            await set_json(listings_key, listings, ttl=settings.CACHE_TTL_SHORT)
-                            await set_json(history_key, history, ttl=settings.CACHE_TTL_LONG)
-                        except Exception:
-                            # Cache failures should not break data return
-                            pass
-
-                        out_idx = order[iid]
-                        out[out_idx] = {"listings": listings, "recentHistory": history}
-
-                    _log.info(
-                        "universalis_items_fetched",
-                        world=world,
-                        count=len(items_list),
-                        requested=len(group),
-                    )
+    # Result slots aligned to input order; every slot is filled below
+    out: list[dict[str, Any]] = [{}] * len(item_ids)
+
+    # Warm cache: resolve every item in a single MGET, fetch only the misses
+    # Hot path: one prefix per call, a single f-string per key (no ns() double build)
+    prefix = ns("u", f"{world}:")
+    keys: list[str] = []
+    for iid in item_ids:
+        keys.append(f"{prefix}{iid}:listings")
+        keys.append(f"{prefix}{iid}:history")
+        keys.append(f"{prefix}{iid}:upload")
+    try:
+        cached = await get_json_many(keys)
+    except Exception:
+        cached = [None] * len(keys)
+    misses: list[int] = []
+    miss_idx: list[int] = []
+    for idx, iid in enumerate(item_ids):
+        listings_c, history_c, upload_c = cached[3 * idx : 3 * idx + 3]
+        if listings_c is not None and history_c is not None:
+            out[idx] = {
+                "item_id": iid,
+                "listings": listings_c,
+                "recentHistory": history_c,
+                "lastUploadTime": upload_c,
+            }
+        else:
+            misses.append(iid)
+            miss_idx.append(idx)
+    if not misses:
+        return out
+
+    client = await _get_client()
+
+    async def _fetch_chunk(group: list[int]) -> list[tuple[int, dict[str, Any]]]:
+        ids_csv = ",".join(str(i) for i in group)
+        resp = await _get_with_retry(client, f"/v2/{world}/{ids_csv}")
+        parsed = _parse_multi(orjson.loads(resp.content))
+        _log.info(
+            "universalis_items_fetched",
+            world=world,
+            count=len(parsed),
+            requested=len(group),
+        )
+        return parsed
+
+    # Chunks are independent: fetch them concurrently (paced by the shared limiter)
+    chunk_results = await asyncio.gather(
+        *[_fetch_chunk(g) for g in _chunks(dict.fromkeys(misses), settings.UNIVERSALIS_CHUNK)]
+    )
+
+    # One id -> entry table over every chunk, then a single aligned pass over the
+    # misses (duplicated ids in the request all get their slot)
+    wanted = set(misses)
+    by_id: dict[int, dict[str, Any]] = {}
+    writes: list[tuple[str, Any, int | None]] = []
+    for parsed in chunk_results:
+        for iid, item in parsed:
+            if iid not in wanted:
+                continue
+
+            listings = item.get("listings", [])
+            history = item.get("recentHistory", [])
+
+            # Queue cache writes (same keys/TTLs as single fetch), flushed once below
+            writes.append((f"{prefix}{iid}:listings", listings, settings.CACHE_TTL_SHORT))
+            writes.append((f"{prefix}{iid}:history", history, settings.CACHE_TTL_LONG))
+            # Data version: lets callers reuse metrics derived from it, cache hits included
+            upload = item.get("lastUploadTime")
+            writes.append((f"{prefix}{iid}:upload", upload, settings.CACHE_TTL_SHORT))
+
+            by_id[iid] = {
+                "item_id": iid,
+                "listings": listings,
+                "recentHistory": history,
+                "lastUploadTime": upload,
+            }
+
+    for idx, iid in zip(miss_idx, misses):
+        entry = by_id.get(iid)
+        if entry is None:
+            # Fresh empty entry per slot: callers own (and may mutate) the lists
+            entry = {"item_id": iid, "listings": [], "recentHistory": [], "lastUploadTime": None}
+        out[idx] = entry
+
+    try:
+        await set_json_many(writes)
+    except Exception:
+        # Cache failures should not break data return
+        pass
 
     return out
 
 
-async def get_marketable_items() -> list[int]:
+def _pack_ids(ids: list[int]) -> bytes:
+    return struct.pack(f"<{len(ids)}I", *ids)
+
+
+def _unpack_ids(blob: bytes) -> array[int]:
+    arr = array("I")
+    arr.frombytes(blob)
+    if sys.byteorder == "big":
+        arr.byteswap()
+    return arr
+
+
+async def index_ids_lex(ids: Iterable[int]) -> None:
+    """(Re)build the lexicographic ID index used by catalog numeric prefix search."""
+    r = get_redis()
+    members = {str(i): 0 for i in ids}
+    async with r.pipeline(transaction=True) as pipe:
+        pipe.delete(IDS_LEX_KEY)
+        if members:
+            pipe.zadd(IDS_LEX_KEY, members)  # type: ignore[arg-type]
+        await pipe.execute()
+
+
+async def cached_marketable_ids() -> array[int] | None:
+    """Return the cached marketable IDs as a packed uint32 array, without fetching.
+
+    Reads key u:marketable:bin (little-endian uint32 blob), backfilling it from the
+    legacy JSON list at u:marketable when only that is present. None when not cached.
+    """
+    bin_key = ns("u", "marketable:bin")
+    blob = await get_bytes(bin_key)
+    if blob and len(blob) % 4 == 0:
+        return _unpack_ids(blob)
+
+    cached = await get_json(ns("u", "marketable"))
+    if cached is None:
+        return None
+    try:
+        ids = [int(x) for x in cast(list[Any], cached)]
+    except Exception:
+        return None
+    await set_bytes(bin_key, _pack_ids(ids))
+    await index_ids_lex(ids)
+    return array("I", ids)
+
+
+async def get_marketable_items() -> array[int]:
     """Fetch the Universalis global list of marketable (tradable) item IDs.
 
-    Cached under key: u:marketable
+    Cached under keys: u:marketable (JSON) and u:marketable:bin (packed uint32).
     """
-    key = ns("u", "marketable")
-    cached = await get_json(key)
+    cached = await cached_marketable_ids()
     if cached is not None:
-        try:
-            return [int(x) for x in cast(list[Any], cached)]
-        except Exception:
-            # fall through to refetch on malformed cache
-            pass
-
-    async with _client() as client:
-        async for attempt in _retryer():
-            with attempt:
-                resp = await client.get("/marketable")
-                resp.raise_for_status()
-                data = resp.json()
-                ids = [int(x) for x in data] if isinstance(data, list) else []
-                # Store without TTL to make this job-driven and persistent
-                await set_json(key, ids, ttl=None)
-                _log.info("universalis_marketable_loaded", count=len(ids))
-                return ids
-
-    return []
+        return cached
+
+    client = await _get_client()
+    resp = await _get_with_retry(client, "/marketable")
+    data = orjson.loads(resp.content)
+    ids = [int(x) for x in data] if isinstance(data, list) else []
+    # Store without TTL to make this job-driven and persistent
+    await set_json(ns("u", "marketable"), ids, ttl=None)
+    await set_bytes(ns("u", "marketable:bin"), _pack_ids(ids))
+    await index_ids_lex(ids)
+    _log.info("universalis_marketable_loaded", count=len(ids))
+    return array("I", ids)
@@ -1,12 +1,16 @@
 from __future__ import annotations
 
-from typing import Any, cast
+import asyncio
+from collections import OrderedDict
+from collections.abc import Sequence
+from typing import Any, Generic, TypeVar, cast
 
 import httpx
+import orjson
 from tenacity import AsyncRetrying, retry_if_exception_type, stop_after_attempt, wait_exponential
 
 from ..config import settings
-from ..db.cache import get_json, get_redis, ns, set_json
+from ..db.cache import get_json, get_redis, get_redis_raw, mget_names, ns, set_json
 from ..logging import get_logger
 
 _log = get_logger()
@@ -24,47 +28,135 @@ def _retryer() -> AsyncRetrying:
     )
 
 
+_CLIENT: httpx.AsyncClient | None = None
+_GARLAND: httpx.AsyncClient | None = None
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+
+class _LRU(Generic[K, V]):
+    """Small bounded in-process LRU (names and recipes never change once known)."""
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._data: OrderedDict[K, V] = OrderedDict()
+
+    def get(self, key: K) -> V | None:
+        value = self._data.get(key)
+        if value is not None:
+            self._data.move_to_end(key)
+        return value
+
+    def put(self, key: K, value: V) -> None:
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: K) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+
+# Hot-ID memo in front of Redis: only positive results are kept
+_NAMES: _LRU[int, str] = _LRU(50_000)
+_RECIPES: _LRU[int, dict[str, Any]] = _LRU(5_000)
+
+
+def clear_local_caches() -> None:
+    """Drop the in-process name/recipe memo (e.g. after the catalog is rebuilt)."""
+    _NAMES.clear()
+    _RECIPES.clear()
+
+
+def forget_recipe(item_id: int) -> None:
+    """Drop one item's recipe from the in-process memo (the Redis copy is kept)."""
+    _RECIPES.pop(item_id)
+
+
 def _client() -> httpx.AsyncClient:
     return httpx.AsyncClient(
         base_url=str(settings.XIVAPI_BASE),
         timeout=httpx.Timeout(10.0, read=10.0),
         headers={"User-Agent": settings.USER_AGENT},
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=40, keepalive_expiry=30),
         http2=True,
     )
 
 
+async def _get_client() -> httpx.AsyncClient:
+    """Shared client (see universalis._get_client): catalog builds reuse one connection."""
+    global _CLIENT
+    if _CLIENT is None:
+        _CLIENT = _client()
+    return _CLIENT
+
+
+def _garland_client() -> httpx.AsyncClient:
+    """Lazily created pooled client for the GarlandTools name fallback."""
+    global _GARLAND
+    if _GARLAND is None:
+        _GARLAND = httpx.AsyncClient(
+            base_url="https://www.garlandtools.org",
+            timeout=10.0,
+            headers={"User-Agent": settings.USER_AGENT},
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+            http2=True,
+        )
+    return _GARLAND
+
+
+async def aclose_client() -> None:
+    global _CLIENT, _GARLAND
+    if _CLIENT is not None:
+        client, _CLIENT = _CLIENT, None
+        await client.aclose()
+    if _GARLAND is not None:
+        garland, _GARLAND = _GARLAND, None
+        await garland.aclose()
+
+
 async def get_recipe(item_id: int) -> dict[str, Any] | None:
     """Fetch recipe for crafted item. Returns None if no recipe.
 
     Cached at key: x:recipe:{item_id}
     NOTE: This is a minimal implementation; nested ingredient resolution TBD.
     """
+    memo = _RECIPES.get(item_id)
+    if memo is not None:
+        return memo
     key = ns("x", f"recipe:{item_id}")
     cached = await get_json(key)
     if cached is not None:
+        _RECIPES.put(item_id, cast(dict[str, Any], cached))
         return cast(dict[str, Any], cached)
 
     # XIVAPI recipe lookups (simplified): /search?indexes=recipe&filters=ItemResult.ID={item_id}
-    async with _client() as client:
-        async for attempt in _retryer():
-            with attempt:
-                resp = await client.get(
-                    "/search",
-                    params={
-                        "indexes": "recipe",
-                        "filters": f"ItemResult.ID={item_id}",
-                        "columns": "Results.ID,Results.AmountResult,Results.Ingredients",
-                    },
-                )
-                if resp.status_code == HTTP_NOT_FOUND:
-                    return None
-                resp.raise_for_status()
-                data = cast(dict[str, Any], resp.json())
-                results = data.get("Results", [])
-                recipe = cast(dict[str, Any] | None, results[0] if results else None)
-                await set_json(key, recipe, ttl=settings.CACHE_TTL_LONG)
-                _log.info("xivapi_recipe_fetched", item_id=item_id, has_recipe=bool(recipe))
-                return recipe
+    client = await _get_client()
+    async for attempt in _retryer():
+        with attempt:
+            resp = await client.get(
+                "/search",
+                params={
+                    "indexes": "recipe",
+                    "filters": f"ItemResult.ID={item_id}",
+                    "columns": "Results.ID,Results.AmountResult,Results.Ingredients",
+                },
+            )
+            if resp.status_code == HTTP_NOT_FOUND:
+                return None
+            resp.raise_for_status()
+            data = cast(dict[str, Any], orjson.loads(resp.content))
+            results = data.get("Results", [])
+            recipe = cast(dict[str, Any] | None, results[0] if results else None)
+            await set_json(key, recipe, ttl=settings.CACHE_TTL_LONG)
+            if recipe is not None:
+                _RECIPES.put(item_id, recipe)
+            _log.info("xivapi_recipe_fetched", item_id=item_id, has_recipe=bool(recipe))
+            return recipe
 
     # TODO: Garland fallback (static JSON) if XIVAPI incomplete
     return None
@@ -73,80 +165,182 @@ async def get_recipe(item_id: int) -> dict[str, Any] | None:
 async def get_item_name(item_id: int) -> str | None:
     """Fetch item display name from XIVAPI, cached.
 
-    Cache key: x:name:{item_id}
+    Cache key: x:name:{item_id} (plus an in-process memo of resolved names)
     Returns None if not found or on 404.
     """
-    # 1) Check persistent catalog hash first (built by jobs)
+    name = _NAMES.get(item_id)
+    if name is None:
+        name = await _get_item_name(item_id)
+        if name:
+            _NAMES.put(item_id, name)
+    return name
+
+
+async def _store_name(item_id: int, name: str) -> None:
+    """Write a resolved name to the per-item key and the catalog hash in one round trip."""
+    async with get_redis_raw().pipeline(transaction=False) as pipe:
+        pipe.set(ns("x", f"name:{item_id}"), orjson.dumps(name), ex=settings.CACHE_TTL_LONG or None)
+        pipe.hset("x:names", str(item_id), name)
+        await pipe.execute()
+
+
+async def _get_item_name(item_id: int) -> str | None:
+    # 1) Persistent catalog hash (built by jobs), then 2) per-item cached value;
+    # both probes are independent, so issue them concurrently
     r = get_redis()
-    name_hash = await r.hget("x:names", str(item_id))
+    key = ns("x", f"name:{item_id}")
+    name_hash, cached = await asyncio.gather(r.hget("x:names", str(item_id)), get_json(key))
     if name_hash is not None:
         return name_hash
-
-    # 2) Check per-item cached value
-    key = ns("x", f"name:{item_id}")
-    cached = await get_json(key)
     if cached is not None:
         return cast(str | None, cached)
 
     try:
-        async with _client() as client:
-            async for attempt in _retryer():
-                with attempt:
-                    resp = await client.get(
-                        f"/item/{item_id}", params={"columns": "ID,Name", "language": "en"}
+        client = await _get_client()
+        async for attempt in _retryer():
+            with attempt:
+                resp = await client.get(
+                    f"/item/{item_id}", params={"columns": "ID,Name", "language": "en"}
+                )
+                if resp.status_code == HTTP_NOT_FOUND:
+                    # Fallback: try search API for resilience
+                    s = await client.get(
+                        "/search",
+                        params={
+                            "indexes": "item",
+                            "filters": f"ID={item_id}",
+                            "columns": "Results.ID,Results.Name",
+                            "language": "en",
+                        },
                     )
-                    if resp.status_code == HTTP_NOT_FOUND:
-                        # Fallback: try search API for resilience
-                        s = await client.get(
-                            "/search",
-                            params={
-                                "indexes": "item",
-                                "filters": f"ID={item_id}",
-                                "columns": "Results.ID,Results.Name",
-                                "language": "en",
-                            },
-                        )
-                        if s.status_code == HTTP_NOT_FOUND:
-                            return None
-                        s.raise_for_status()
-                        sd = cast(dict[str, Any], s.json())
-                        results = sd.get("Results", []) or []
-                        name = cast(str | None, (results[0] or {}).get("Name") if results else None)
-                        if name:
-                            # Store in both per-item cache and catalog hash
-                            await set_json(key, name, ttl=settings.CACHE_TTL_LONG)
-                            await r.hset("x:names", str(item_id), name)
-                        _log.info("xivapi_item_name", item_id=item_id, name=name)
-                        return name
-                    resp.raise_for_status()
-                    data = cast(dict[str, Any], resp.json())
-                    name = cast(str | None, data.get("Name"))
-                    if name is not None:
-                        await set_json(key, name, ttl=settings.CACHE_TTL_LONG)
-                        await r.hset("x:names", str(item_id), name)
+                    if s.status_code == HTTP_NOT_FOUND:
+                        return None
+                    s.raise_for_status()
+                    sd = cast(dict[str, Any], orjson.loads(s.content))
+                    results = sd.get("Results", []) or []
+                    name = cast(str | None, (results[0] or {}).get("Name") if results else None)
+                    if name:
+                        # Store in both per-item cache and catalog hash
+                        await _store_name(item_id, name)
                     _log.info("xivapi_item_name", item_id=item_id, name=name)
                     return name
+                resp.raise_for_status()
+                data = cast(dict[str, Any], orjson.loads(resp.content))
+                name = cast(str | None, data.get("Name"))
+                if name is not None:
+                    await _store_name(item_id, name)
+                _log.info("xivapi_item_name", item_id=item_id, name=name)
+                return name
     except httpx.HTTPError:
         # Continue to GarlandTools fallback below
         pass
 
     # Final fallback via Garland Tools API
     try:
-        async with httpx.AsyncClient(timeout=10.0) as c:
-            rr = await c.get(
-                "https://www.garlandtools.org/api/get.php",
-                params={"type": "item", "id": str(item_id), "lang": "en"},
-            )
-            if rr.status_code == 200:
-                data = cast(dict[str, Any], rr.json())
-                d = cast(dict[str, Any] | None, data.get("item")) if isinstance(data, dict) else None
-                name2 = cast(str | None, (d or {}).get("name") or (d or {}).get("en"))
-                if name2:
-                    await set_json(key, name2, ttl=settings.CACHE_TTL_LONG)
-                    await r.hset("x:names", str(item_id), name2)
-                    _log.info("garland_item_name", item_id=item_id, name=name2)
-                    return name2
+        c = _garland_client()
+        rr = await c.get(
+            "/api/get.php",
+            params={"type": "item", "id": str(item_id), "lang": "en"},
+        )
+        if rr.status_code == 200:
+            data = cast(dict[str, Any], orjson.loads(rr.content))
+            d = cast(dict[str, Any] | None, data.get("item")) if isinstance(data, dict) else None
+            name2 = cast(str | None, (d or {}).get("name") or (d or {}).get("en"))
+            if name2:
+                await _store_name(item_id, name2)
+                _log.info("garland_item_name", item_id=item_id, name=name2)
+                return name2
     except Exception:
         pass
 
     return None
+
+
+NAMES_BATCH = 100
+
+
+async def _fetch_names_batch(item_ids: Sequence[int]) -> dict[int, str]:
+    """Look up names on XIVAPI in chunks of NAMES_BATCH ids per request (/item?ids=...)."""
+    found: dict[int, str] = {}
+    client = await _get_client()
+    for i in range(0, len(item_ids), NAMES_BATCH):
+        chunk = item_ids[i : i + NAMES_BATCH]
+        async for attempt in _retryer():
+            with attempt:
+                resp = await client.get(
+                    "/item",
+                    params={
+                        "ids": ",".join(str(x) for x in chunk),
+                        "columns": "ID,Name",
+                        "language": "en",
+                        "limit": len(chunk),
+                    },
+                )
+                resp.raise_for_status()
+                data = cast(dict[str, Any], orjson.loads(resp.content))
+                for row in data.get("Results", []) or []:
+                    try:
+                        iid, name = int(row["ID"]), row.get("Name")
+                    except (KeyError, TypeError, ValueError):
+                        continue
+                    if name:
+                        found[iid] = str(name)
+    return found
+
+
+async def get_item_names(item_ids: Sequence[int], concurrency: int = 10) -> list[str | None]:
+    """Resolve many item names at once, aligned to `item_ids`.
+
+    Cached names come from `mget_names` (catalog hash, then per-item cache); the
+    misses are looked up in one batched XIVAPI request (persisted to the catalog),
+    and only what that still misses goes through `get_item_name` with bounded
+    concurrency.
+    """
+    if not item_ids:
+        return []
+    r = get_redis()
+    names: list[str | None] = [_NAMES.get(i) for i in item_ids]
+    unknown = list(dict.fromkeys(i for i, name in zip(item_ids, names) if name is None))
+    if unknown:
+        known = await mget_names(unknown)
+        for idx, iid in enumerate(item_ids):
+            if names[idx] is None:
+                names[idx] = known.get(iid)
+        for iid, name in known.items():
+            if name:
+                _NAMES.put(iid, name)
+    missing = [idx for idx, name in enumerate(names) if name is None]
+    if missing:
+        try:
+            batch = await _fetch_names_batch(list(dict.fromkeys(item_ids[idx] for idx in missing)))
+        except httpx.HTTPError:
+            batch = {}
+        if batch:
+            try:
+                await r.hset("x:names", mapping={str(k): v for k, v in batch.items()})
+            except Exception:
+                # Cache failures should not drop the names just fetched
+                _log.warning("xivapi_item_names_cache_failed", count=len(batch), exc_info=True)
+            for iid, name in batch.items():
+                _NAMES.put(iid, name)
+            _log.info("xivapi_item_names", requested=len(missing), found=len(batch))
+            for idx in missing:
+                names[idx] = batch.get(item_ids[idx])
+            missing = [idx for idx in missing if names[idx] is None]
+
+    if missing:
+        sem = asyncio.Semaphore(max(1, concurrency))
+
+        async def _one(iid: int) -> str | None:
+            async with sem:
+                try:
+                    return await get_item_name(iid)
+                except Exception:
+                    return None
+
+        # One lookup per distinct id, fanned back out to every slot asking for it
+        pending = list(dict.fromkeys(item_ids[idx] for idx in missing))
+        fetched = dict(zip(pending, await asyncio.gather(*[_one(iid) for iid in pending])))
+        for idx in missing:
+            names[idx] = fetched[item_ids[idx]]
+    return names
@@ -1,15 +1,24 @@
 from __future__ import annotations
 
+from functools import lru_cache
 from typing import cast
 
 from pydantic import AnyHttpUrl, Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
+@lru_cache(maxsize=16)
+def _csv_set(raw: str) -> frozenset[str]:
+    # Parsed once per distinct value (a changed setting is simply a new cache key);
+    # callers only do truthiness and membership tests
+    return frozenset(x.strip() for x in raw.split(",") if x.strip())
+
+
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(env_file=(".env",), env_prefix="", case_sensitive=False)
 
     REDIS_URL: str = Field(default="redis://localhost:6379/0")
+    REDIS_MAX_CONNECTIONS: int = Field(default=64, ge=1)
     UNIVERSALIS_BASE: AnyHttpUrl = Field(default=cast(AnyHttpUrl, "https://universalis.app/api"))
     XIVAPI_BASE: AnyHttpUrl = Field(default=cast(AnyHttpUrl, "https://xivapi.com"))
 
@@ -19,8 +28,17 @@ class Settings(BaseSettings):
     USER_AGENT: str = Field(default="FFXIV-Broker/1.0")
     REQUESTS_RPS: int = Field(default=20, ge=1)
     RETRY_MAX: int = Field(default=3, ge=0)
+    # Item ids per Universalis multi-item request (the API accepts at most 100)
+    UNIVERSALIS_CHUNK: int = Field(default=100, ge=1, le=100)
+    # Per-request cap on concurrent world fetches in /market/arbitrage
+    ARBITRAGE_CONCURRENCY: int = Field(default=8, ge=1)
 
     LOG_LEVEL: str = Field(default="INFO")
+    # Dev mode: reload templates from disk when they change
+    DEBUG: bool = Field(default=False)
+
+    # Browser origins allowed by CORS (comma-separated); same-origin dashboard needs none
+    CORS_ORIGINS: str | None = Field(default="http://localhost:8000,http://127.0.0.1:8000")
 
     # Optional bootstrap of local catalog file at startup (id->name JSON)
     CATALOG_BOOTSTRAP_PATH: str | None = Field(default="data/catalog_names_en.json")
@@ -38,6 +56,10 @@ class Settings(BaseSettings):
     ADVICE_RISK_MED: float = Field(default=0.6, ge=0.0, le=1.0)
     ADVICE_SATURATION_MULT: float = Field(default=5.0, gt=0.0)
     FLIP_THRESHOLD: float = Field(default=0.7, gt=0.0, le=1.0)
+    # Max /advice computations in flight across all workers (excess get 429)
+    ADVICE_MAX_CONCURRENT: int = Field(default=8, ge=1)
+    # Expiry of the precomputed per-world /advice/top payload (0 = no expiry)
+    ADVICE_TOP_TTL: int = Field(default=86400, ge=0)
 
     # Suspicious detection (anti-scam)
     ADVICE_SUSPECT_ROI: float = Field(default=10.0, ge=0.0)  # 1000%+
@@ -49,15 +71,20 @@ class Settings(BaseSettings):
     ALLOWED_WORLDS: str | None = None
     ALLOWED_DATA_CENTERS: str | None = None
 
-    def allowed_worlds(self) -> set[str] | None:
+    def allowed_worlds(self) -> frozenset[str] | None:
         if not self.ALLOWED_WORLDS:
             return None
-        return {w.strip() for w in self.ALLOWED_WORLDS.split(",") if w.strip()}
+        return _csv_set(self.ALLOWED_WORLDS) or None
+
+    def cors_origins(self) -> list[str]:
+        if not self.CORS_ORIGINS:
+            return []
+        return [o.strip() for o in self.CORS_ORIGINS.split(",") if o.strip()]
 
-    def allowed_dcs(self) -> set[str] | None:
+    def allowed_dcs(self) -> frozenset[str] | None:
         if not self.ALLOWED_DATA_CENTERS:
             return None
-        return {d.strip() for d in self.ALLOWED_DATA_CENTERS.split(",") if d.strip()}
+        return _csv_set(self.ALLOWED_DATA_CENTERS) or None
 
 
 settings = Settings()
@@ -1,40 +1,120 @@
 from __future__ import annotations
 
-import json
 from functools import lru_cache
 from typing import Any
 
-from redis.asyncio import Redis
+import orjson
+from redis.asyncio import ConnectionPool, Redis
 
 from ..config import settings
 
+# Process-wide pool: every client shares sockets instead of dialing per call
+_POOL = ConnectionPool.from_url(
+    settings.REDIS_URL,
+    max_connections=settings.REDIS_MAX_CONNECTIONS,
+    decode_responses=True,
+    health_check_interval=30,
+)
+# Separate pool for binary payloads (packed arrays) that must not be str-decoded
+_RAW_POOL = ConnectionPool.from_url(
+    settings.REDIS_URL,
+    max_connections=settings.REDIS_MAX_CONNECTIONS,
+    decode_responses=False,
+    health_check_interval=30,
+)
+
 
 @lru_cache(maxsize=1)
 def get_redis() -> Redis[str]:
-    return Redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return Redis(connection_pool=_POOL)
+
+
+@lru_cache(maxsize=1)
+def get_redis_raw() -> Redis[bytes]:
+    return Redis(connection_pool=_RAW_POOL)
+
+
+def _dumps(value: Any) -> bytes:
+    # orjson is much faster than stdlib json on listing/history payloads; keep
+    # stdlib's tolerance for non-str dict keys
+    return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
 
 
 def ns(namespace: str, key: str) -> str:
     return f"{namespace}:{key}"
 
 
+# JSON values go through the bytes pool: orjson reads/writes UTF-8 bytes directly,
+# so skipping redis-py's str decoding saves a copy per payload.
 async def get_json(key: str) -> Any | None:
-    r = get_redis()
+    r = get_redis_raw()
     raw = await r.get(key)
     if raw is None:
         return None
-    return json.loads(raw)
+    return orjson.loads(raw)
+
+
+async def get_json_many(keys: list[str]) -> list[Any | None]:
+    """MGET + JSON decode; one round-trip, result aligned to `keys` (None on miss)."""
+    if not keys:
+        return []
+    raws = await get_redis_raw().mget(keys)
+    return [None if raw is None else orjson.loads(raw) for raw in raws]
 
 
 async def set_json(key: str, value: Any, ttl: int | None = None) -> None:
-    r = get_redis()
-    data = json.dumps(value)
+    r = get_redis_raw()
+    data = _dumps(value)
     if ttl and ttl > 0:
         await r.set(key, data, ex=ttl)
     else:
         await r.set(key, data)
 
 
+async def set_json_many(items: list[tuple[str, Any, int | None]]) -> None:
+    """Write several (key, value, ttl) JSON entries in one pipelined round-trip."""
+    if not items:
+        return
+    async with get_redis_raw().pipeline(transaction=False) as pipe:
+        for key, value, ttl in items:
+            data = _dumps(value)
+            if ttl and ttl > 0:
+                pipe.set(key, data, ex=ttl)
+            else:
+                pipe.set(key, data)
+        await pipe.execute()
+
+
+async def mget_names(ids: list[int]) -> dict[int, str | None]:
+    """Item names from the catalog hash `x:names`, then the per-item `x:name:{id}` cache.
+
+    Two round-trips per batch (HMGET + MGET of the misses) regardless of its size.
+    """
+    if not ids:
+        return {}
+    names: list[str | None] = await get_redis().hmget("x:names", [str(i) for i in ids])
+    out = dict(zip(ids, names))
+    misses = [i for i, name in out.items() if name is None]
+    if misses:
+        cached = await get_json_many([ns("x", f"name:{i}") for i in misses])
+        for iid, name in zip(misses, cached):
+            if isinstance(name, str):
+                out[iid] = name
+    return out
+
+
+async def get_bytes(key: str) -> bytes | None:
+    return await get_redis_raw().get(key)
+
+
+async def set_bytes(key: str, value: bytes, ttl: int | None = None) -> None:
+    r = get_redis_raw()
+    if ttl and ttl > 0:
+        await r.set(key, value, ex=ttl)
+    else:
+        await r.set(key, value)
+
+
 async def ping() -> bool:
     r = get_redis()
     try:
@@ -1,25 +1,64 @@
 from __future__ import annotations
 
-from collections.abc import Iterable
-from datetime import datetime
-from typing import Any, cast
-
-from openpyxl import Workbook
-from openpyxl.styles import Font
-from openpyxl.utils import get_column_letter
-from openpyxl.worksheet.worksheet import Worksheet
-
-
-def _auto_fit(ws: Worksheet) -> None:
-    widths: dict[int, int] = {}
-    for row in ws.rows:
-        for cell in row:
-            value = str(cell.value) if cell.value is not None else ""
-            # Some cells can be MergedCell without col_idx; fallback to column index
-            col_idx = int(getattr(cell, "col_idx", getattr(cell, "column", 0)))
-            widths[col_idx] = max(widths.get(col_idx, 0), len(value) + 2)
-    for col, width in widths.items():
+from collections.abc import Iterable, Sequence
+from datetime import datetime, timezone
+from functools import lru_cache
+from itertools import chain, islice
+from typing import TYPE_CHECKING, Any, cast
+
+# openpyxl is imported on first export only: it is the heaviest import in the app
+# and most workers never build a workbook.
+if TYPE_CHECKING:
+    from openpyxl import Workbook
+    from openpyxl.styles import Font
+    from openpyxl.worksheet.worksheet import Worksheet
+
+# Rows inspected to size the columns (the values never need to be held all at once)
+WIDTH_SAMPLE_ROWS = 500
+
+
+@lru_cache(maxsize=1)
+def _bold() -> Font:
+    from openpyxl.styles import Font
+
+    return Font(bold=True)
+
+
+def _fill_sheet(ws: Worksheet, headers: Sequence[str], rows: Iterable[Sequence[Any]]) -> None:
+    """Stream header + rows into a write-only sheet.
+
+    Write-only sheets need column widths and panes before the first row, so widths
+    are sized from the first WIDTH_SAMPLE_ROWS rows only; those are buffered, the
+    rest are streamed straight through, so memory stays bounded by the sample.
+    """
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.utils import get_column_letter
+
+    it = iter(rows)
+    sample: list[Sequence[Any]] = [list(row) for row in islice(it, WIDTH_SAMPLE_ROWS)]
+    widths = [len(h) + 2 for h in headers]
+    for row in sample:
+        for idx, value in enumerate(row):
+            if value is not None:
+                width = len(str(value)) + 2
+                if width > widths[idx]:
+                    widths[idx] = width
+    for col, width in enumerate(widths, 1):
         ws.column_dimensions[get_column_letter(col)].width = min(60, width)
+    ws.freeze_panes = "A2"
+
+    bold = _bold()
+    header_cells = []
+    for h in headers:
+        cell = WriteOnlyCell(ws, value=h)
+        cell.font = bold
+        header_cells.append(cell)
+    ws.append(header_cells)
+    n = 0
+    for row in chain(sample, it):
+        ws.append(row)
+        n += 1
+    ws.auto_filter.ref = f"A1:{get_column_letter(len(headers))}{n + 1}"
 
 
 def build_workbook(
@@ -28,19 +67,18 @@ def build_workbook(
     advice: Iterable[dict[str, Any]],
     world: str,
 ) -> Workbook:
-    wb = Workbook()
-    ws_items = cast(Worksheet, wb.active)
-    ws_items.title = "Items"
-    ws_recipes = cast(Worksheet, wb.create_sheet("Recipes"))
-    ws_advice = cast(Worksheet, wb.create_sheet("Advisor"))
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws_items = cast("Worksheet", wb.create_sheet("Items"))
+    ws_recipes = cast("Worksheet", wb.create_sheet("Recipes"))
+    ws_advice = cast("Worksheet", wb.create_sheet("Advisor"))
 
     # Items sheet
-    items_headers = ["item_id", "world", "lowest", "avg_price_7d", "sales_per_day_7d", "flags"]
-    ws_items.append(items_headers)
-    for h in ws_items[1]:
-        h.font = Font(bold=True)
-    for it in items:
-        ws_items.append(
+    _fill_sheet(
+        ws_items,
+        ["item_id", "world", "lowest", "avg_price_7d", "sales_per_day_7d", "flags"],
+        (
             [
                 it.get("item_id"),
                 it.get("world"),
@@ -49,33 +87,29 @@ def build_workbook(
                 it.get("sales_per_day_7d"),
                 ",".join(it.get("flags", [])),
             ]
-        )
-    ws_items.auto_filter.ref = ws_items.dimensions
-    ws_items.freeze_panes = "A2"
-    _auto_fit(ws_items)
+            for it in items
+        ),
+    )
 
     # Recipes sheet
-    ws_recipes.append(["result_item_id", "amount_result", "ingredients_json"])
-    for h in ws_recipes[1]:
-        h.font = Font(bold=True)
-    for r in recipes:
-        ws_recipes.append(
+    _fill_sheet(
+        ws_recipes,
+        ["result_item_id", "amount_result", "ingredients_json"],
+        (
             [
                 r.get("result_item_id"),
                 r.get("amount_result"),
                 r.get("ingredients"),
             ]
-        )
-    ws_recipes.auto_filter.ref = ws_recipes.dimensions
-    ws_recipes.freeze_panes = "A2"
-    _auto_fit(ws_recipes)
+            for r in recipes
+        ),
+    )
 
     # Advice sheet
-    ws_advice.append(["item_id", "name", "roi", "sales_per_day", "score", "flags", "risk"])
-    for h in ws_advice[1]:
-        h.font = Font(bold=True)
-    for a in advice:
-        ws_advice.append(
+    _fill_sheet(
+        ws_advice,
+        ["item_id", "name", "roi", "sales_per_day", "score", "flags", "risk"],
+        (
             [
                 a.get("item_id"),
                 a.get("name"),
@@ -85,14 +119,14 @@ def build_workbook(
                 ",".join(a.get("flags", [])),
                 a.get("risk"),
             ]
-        )
-    ws_advice.auto_filter.ref = ws_advice.dimensions
-    ws_advice.freeze_panes = "A2"
-    _auto_fit(ws_advice)
+            for a in advice
+        ),
+    )
 
-    ts = datetime.utcnow().strftime("%Y-%m-%d %H:%M UTC")
+    ts = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
+    footer_text = f"Exported {ts} - World: {world}"
     for ws in (ws_items, ws_recipes, ws_advice):
         # openpyxl typing for header/footer is loose; ignore for mypy
-        ws.oddFooter.center.text = f"Exported {ts} - World: {world}"  # type: ignore[union-attr]
+        ws.oddFooter.center.text = footer_text  # type: ignore[union-attr]
 
     return wb
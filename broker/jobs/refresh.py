@@ -1,82 +1,90 @@
 from __future__ import annotations
 
-from collections.abc import Iterable
 import asyncio
+from collections.abc import Iterable
+import heapq
+import time
 from typing import Any
 
+import orjson
+
 from ..clients.universalis import get_item_world, get_marketable_items, get_items_world
 from ..config import settings
-from ..db.cache import get_redis, ns, set_json
-from ..clients.xivapi import get_item_name
+from ..db.cache import get_redis, mget_names, ns, set_json, set_json_many
+from ..clients.xivapi import clear_local_caches, get_item_names
 from ..services.metrics import (
-    sales_per_day,
-    units_sold,
-    trimmed_mean_price,
-    avg_price,
+    summarize_history,
     roi as roi_fn,
     net_profit_unit as profit_unit_fn,
     saturation_flag,
     flip_flag,
-    price_cv,
+    scan_listings,
 )
-from ..services.advisor import compute_score
+from ..services.advisor import ScoreWeights, compute_score
+
+# Size of the precomputed /advice/top payload (matches the endpoint's max limit)
+ADVICE_TOP_SIZE = 200
+# Items per pipelined cache flush in refresh_items
+REFRESH_FLUSH = 100
 
 
 async def refresh_items(world: str, items: Iterable[int]) -> int:
-    """Force refresh cache for given items. Returns count of keys updated."""
+    """Force refresh cache for given items. Returns count of keys updated.
+
+    Items are fetched through `get_items_world` (cache MGET, then concurrent
+    Universalis chunks of `settings.UNIVERSALIS_CHUNK` ids paced by the shared
+    rate limiter).
+    """
+    item_ids = list(items)
+    data_list = await get_items_world(item_ids, world)
     count = 0
-    for iid in items:
-        data = await get_item_world(iid, world)
-        # Re-store to ensure fresh TTLs
-        listings_key = ns("u", f"{world}:{iid}:listings")
-        history_key = ns("u", f"{world}:{iid}:history")
-        await set_json(listings_key, data.get("listings", []), ttl=settings.CACHE_TTL_SHORT)
-        await set_json(history_key, data.get("recentHistory", []), ttl=settings.CACHE_TTL_LONG)
-        count += 2
+    writes: list[tuple[str, Any, int | None]] = []
+    prefix = ns("u", f"{world}:")
+    for iid, data in zip(item_ids, data_list):
+        # Re-store to ensure fresh TTLs (pipelined, flushed every REFRESH_FLUSH items)
+        writes.append(
+            (f"{prefix}{iid}:listings", data.get("listings", []), settings.CACHE_TTL_SHORT)
+        )
+        writes.append(
+            (f"{prefix}{iid}:history", data.get("recentHistory", []), settings.CACHE_TTL_LONG)
+        )
+        writes.append(
+            (f"{prefix}{iid}:upload", data.get("lastUploadTime"), settings.CACHE_TTL_SHORT)
+        )
+        count += 3
+        if len(writes) >= 3 * REFRESH_FLUSH:
+            await set_json_many(writes)
+            writes.clear()
+    await set_json_many(writes)
     return count
 
 
-async def build_id_name_catalog(concurrency: int | None = None, batch_size: int = 1000) -> int:
+async def build_id_name_catalog(concurrency: int | None = None, batch_size: int = 500) -> int:
     """Build or refresh the Redis hash catalog of item_id -> name.
 
     - Pulls marketable item IDs from Universalis
-    - Fetches names from XIVAPI with limited concurrency
-    - Stores results into Redis hash key `x:names`
+    - Resolves names in slices of `batch_size` via `get_item_names`: cached names in
+      two Redis round-trips per slice, the rest from XIVAPI (batched, then per item
+      with limited concurrency)
+    - Names fetched upstream are stored into Redis hash key `x:names`
 
-    Returns number of items processed.
+    Returns number of items with a resolved name.
     """
     ids = await get_marketable_items()
     if not ids:
         return 0
-    r = get_redis()
-    sem = asyncio.Semaphore(concurrency or max(1, settings.REQUESTS_RPS // 2))
-
-    async def _one(iid: int) -> tuple[int, str | None]:
-        async with sem:
-            try:
-                name = await get_item_name(iid)
-                return iid, name
-            except Exception:
-                return iid, None
+    conc = concurrency or max(1, settings.REQUESTS_RPS // 2)
 
     processed = 0
-    mapping: dict[str, str] = {}
-    for fut in asyncio.as_completed([_one(i) for i in ids]):
-        iid, name = await fut
-        if name:
-            mapping[str(iid)] = name
-        # Flush in batches to Redis to avoid oversized payloads
-        if len(mapping) >= batch_size:
-            await r.hset("x:names", mapping=mapping)  # type: ignore[arg-type]
-            processed += len(mapping)
-            mapping.clear()
-
-    if mapping:
-        await r.hset("x:names", mapping=mapping)  # type: ignore[arg-type]
-        processed += len(mapping)
-
-    # Also store the raw list of ids for reference
-    # Note: large list; already cached by get_marketable_items()
+    for start in range(0, len(ids), batch_size):
+        chunk = list(ids[start : start + batch_size])
+        try:
+            names = await get_item_names(chunk, concurrency=conc)
+        except Exception:
+            continue
+        processed += sum(1 for name in names if name)
+    # The catalog was rebuilt: let this process re-read it rather than its memo
+    clear_local_caches()
     return processed
 
 
@@ -93,11 +101,10 @@ async def full_scan_advice(
       - HASH adv:{world}:data (item_id -> JSON payload)
       - STRING adv:{world}:count (number of candidates considered)
       - STRING adv:{world}:ts (unix timestamp when computed)
+      - STRING adv:{world}:top (JSON {ts, items} of the top ADVICE_TOP_SIZE, names resolved)
 
     Returns number of items stored.
     """
-    import json, time
-
     ids = await get_marketable_items()
     if not ids:
         return 0
@@ -109,13 +116,17 @@ async def full_scan_advice(
     data_key = ns("adv", f"{world}:data")
     ts_key = ns("adv", f"{world}:ts")
     count_key = ns("adv", f"{world}:count")
+    top_key = ns("adv", f"{world}:top")
 
-    # Start fresh tmp keys
-    await r.delete(score_key_tmp, data_key_tmp)
+    # Anti-scam thresholds, read once instead of per candidate
+    suspect_roi = float(settings.ADVICE_SUSPECT_ROI)
+    min_sales = int(settings.ADVICE_MIN_SALES_SAFE)
+    suspect_cv = float(settings.ADVICE_SUSPECT_CV)
+    suspect_abs = float(settings.ADVICE_SUSPECT_ABS_PROFIT)
+    weights = ScoreWeights.from_settings()
 
-    candidates: list[dict[str, Any]] = []
-
-    async def _process_chunk(chunk: list[int]) -> None:
+    async def _process_chunk(chunk: list[int]) -> list[dict[str, Any]]:
+        candidates: list[dict[str, Any]] = []
         try:
             data_list = await get_items_world(chunk, world)
         except Exception:
@@ -132,14 +143,18 @@ async def full_scan_advice(
                 history = data.get("recentHistory", [])
                 if not (listings or history):
                     continue
-                lowest = min((l["pricePerUnit"] for l in listings), default=None)
-                if lowest is None:
+                if not listings:
                     continue
-                spd = sales_per_day(history, days=7)
-                sold = units_sold(history, days=7)
-                tgt = trimmed_mean_price(history, days=7, trim=0.2) or avg_price(history, days=7)
+                # One pass (NumPy for long histories) instead of five window scans
+                summary = summarize_history(history, days=7, trim=0.2)
+                tgt = summary.target
+                spd, sold, cv = summary.sales_per_day, summary.units_sold, summary.cv
                 if tgt is None:
                     continue
+                # Lowest price and competition (listings at/below target) in one loop
+                lowest, comp = scan_listings(listings, float(tgt))
+                if lowest is None:
+                    continue
                 flags: list[str] = []
                 if saturation_flag(stock_count=len(listings), spd=spd):
                     flags.append("saturo")
@@ -148,19 +163,17 @@ async def full_scan_advice(
                 rroi = roi_fn(net_price=float(tgt), cost_total=float(lowest))
                 p_unit = profit_unit_fn(target_price=float(tgt), lowest_cost=float(lowest))
                 ppd = float(spd) * p_unit
-                comp = sum(1 for l in listings if float(l.get("pricePerUnit", 0)) <= float(tgt))
 
                 # Anti-scam filter
-                cv = price_cv(history, days=7)
                 if (
-                    rroi > settings.ADVICE_SUSPECT_ROI
-                    and (sold < settings.ADVICE_MIN_SALES_SAFE or (cv is not None and cv > settings.ADVICE_SUSPECT_CV))
-                ) or (
-                    p_unit > float(settings.ADVICE_SUSPECT_ABS_PROFIT) and sold < settings.ADVICE_MIN_SALES_SAFE
-                ):
+                    rroi > suspect_roi
+                    and (sold < min_sales or (cv is not None and cv > suspect_cv))
+                ) or (p_unit > suspect_abs and sold < min_sales):
                     continue
 
-                score, risk = compute_score(rroi, float(spd), flags, float(ppd), int(comp))
+                score, risk = compute_score(
+                    rroi, float(spd), flags, float(ppd), int(comp), weights=weights
+                )
                 candidates.append(
                     {
                         "item_id": iid,
@@ -176,33 +189,63 @@ async def full_scan_advice(
                 )
             except Exception:
                 continue
+        return candidates
+
+    # Fan out batches, bounded so the scan stays within the Universalis pacing
+    sem = asyncio.Semaphore(max(1, settings.REQUESTS_RPS // 2))
+
+    async def _bounded(chunk: list[int]) -> list[dict[str, Any]]:
+        async with sem:
+            return await _process_chunk(chunk)
 
-    # Iterate in batches
-    for i in range(0, len(ids), batch_size):
-        await _process_chunk(ids[i : i + batch_size])
+    results = await asyncio.gather(
+        *(_bounded(list(ids[i : i + batch_size])) for i in range(0, len(ids), batch_size))
+    )
+    candidates = [c for chunk_candidates in results for c in chunk_candidates]
 
     # Sort by score and keep top N
-    candidates.sort(key=lambda c: c.get("score", 0.0), reverse=True)
+    def _score(c: dict[str, Any]) -> float:
+        return float(c.get("score", 0.0))
+
     if store_top and len(candidates) > store_top:
-        candidates = candidates[:store_top]
-
-    # Store to Redis (tmp keys, then swap)
-    if candidates:
-        # Build zset payload and hash mapping
-        zmembers: dict[str, float] = {}
-        mapping: dict[str, str] = {}
-        for c in candidates:
-            iid = str(int(c["item_id"]))
-            score_v = float(c.get("score", 0.0))
-            zmembers[iid] = score_v
-            mapping[iid] = json.dumps(c)
-        # ZADD and HSET
-        await r.zadd(score_key_tmp, zmembers)
-        await r.hset(data_key_tmp, mapping=mapping)  # type: ignore[arg-type]
-
-    # Swap keys
-    await r.rename(score_key_tmp, score_key) if await r.exists(score_key_tmp) else None
-    await r.rename(data_key_tmp, data_key) if await r.exists(data_key_tmp) else None
-    await r.set(ts_key, str(int(time.time())))
-    await r.set(count_key, str(len(ids)))
+        candidates = heapq.nlargest(store_top, candidates, key=_score)
+    else:
+        candidates.sort(key=_score, reverse=True)
+
+    # Resolve names for the head of the ranking so /advice/top serves them as-is
+    top = candidates[:ADVICE_TOP_SIZE]
+    if top:
+        try:
+            names = await get_item_names([int(c["item_id"]) for c in top])
+            for c, nm in zip(top, names):
+                c["name"] = nm
+        except Exception:
+            pass
+    # The tail only takes names already in the catalog (HMGET, no upstream calls)
+    tail = candidates[ADVICE_TOP_SIZE:]
+    if tail:
+        try:
+            known = await mget_names([int(c["item_id"]) for c in tail])
+            for c in tail:
+                c["name"] = known.get(int(c["item_id"]))
+        except Exception:
+            pass
+
+    # Store to Redis: fill tmp keys and swap them in one MULTI/EXEC round trip
+    ts = str(int(time.time()))
+    async with r.pipeline(transaction=True) as pipe:
+        pipe.delete(score_key_tmp, data_key_tmp)
+        if candidates:
+            # Members are the item ids (already ints); hash values are stored as the raw
+            # orjson bytes, which readers decode straight off the bytes pool
+            zmembers = {str(c["item_id"]): _score(c) for c in candidates}
+            mapping = {str(c["item_id"]): orjson.dumps(c) for c in candidates}
+            pipe.zadd(score_key_tmp, zmembers)
+            pipe.hset(data_key_tmp, mapping=mapping)  # type: ignore[arg-type]
+            pipe.rename(score_key_tmp, score_key)
+            pipe.rename(data_key_tmp, data_key)
+        pipe.set(ts_key, ts)
+        pipe.set(count_key, str(len(ids)))
+        await pipe.execute()
+    await set_json(top_key, {"ts": ts, "items": top}, ttl=settings.ADVICE_TOP_TTL)
     return len(candidates)
@@ -1,14 +1,16 @@
 from __future__ import annotations
 
+import logging
+import os
 import time
-import uuid
 from collections.abc import Callable
 from contextvars import ContextVar
-from typing import Any, cast
+from typing import Any
 
+import orjson
 import structlog
-from fastapi import Request
-from starlette.responses import Response
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from .config import settings
 
@@ -24,33 +26,32 @@ def set_request_id(request_id: str | None) -> None:
 
 
 def configure_logging() -> None:
+    level = _level_to_numeric(settings.LOG_LEVEL)
     processors: list[Callable[..., Any]] = [
         structlog.processors.add_log_level,
-        structlog.processors.TimeStamper(fmt="iso"),
+        structlog.processors.TimeStamper(fmt="iso", utc=True),
         _add_request_id,
-        structlog.processors.StackInfoRenderer(),
+    ]
+    if level <= 10:
+        # Walks the stack on every call: only worth it when debugging
+        processors.append(structlog.processors.StackInfoRenderer())
+    processors += [
         structlog.processors.format_exc_info,
-        structlog.processors.JSONRenderer(),
+        # orjson renders straight to bytes, written as-is by the bytes logger
+        # (no str round-trip through the stdlib logging machinery)
+        structlog.processors.JSONRenderer(serializer=orjson.dumps),
     ]
 
     structlog.configure(
         processors=processors,
-        wrapper_class=structlog.make_filtering_bound_logger(_level_to_numeric(settings.LOG_LEVEL)),
-        logger_factory=structlog.stdlib.LoggerFactory(),
+        wrapper_class=structlog.make_filtering_bound_logger(level),
+        logger_factory=structlog.BytesLoggerFactory(),
         cache_logger_on_first_use=True,
     )
 
 
 def _level_to_numeric(level: str) -> int:
-    mapping = {
-        "CRITICAL": 50,
-        "ERROR": 40,
-        "WARNING": 30,
-        "INFO": 20,
-        "DEBUG": 10,
-        "NOTSET": 0,
-    }
-    return mapping.get(level.upper(), 20)
+    return logging.getLevelNamesMapping().get(level.upper(), logging.INFO)
 
 
 def _add_request_id(_logger: Any, _method_name: str, event_dict: dict[str, Any]) -> dict[str, Any]:
@@ -60,23 +61,55 @@ def _add_request_id(_logger: Any, _method_name: str, event_dict: dict[str, Any])
     return event_dict
 
 
-async def request_id_middleware(request: Request, call_next: Callable[[Request], Any]) -> Response:
-    rid = request.headers.get("X-Request-ID") or str(uuid.uuid4())
-    set_request_id(rid)
-    start = time.perf_counter()
-    response = cast(Response, await call_next(request))
-    duration_ms = (time.perf_counter() - start) * 1000
-    structlog.get_logger().info(
-        "request",
-        method=request.method,
-        path=request.url.path,
-        status_code=getattr(response, "status_code", 0),
-        duration_ms=round(duration_ms, 2),
-    )
-    # Clear after request
-    set_request_id(None)
-    response.headers["X-Request-ID"] = rid
-    return response
+class RequestIdMiddleware:
+    """Pure ASGI middleware: propagate/assign X-Request-ID and log each request.
+
+    Avoids BaseHTTPMiddleware so no per-request Request object, task or body stream
+    is created; the header is injected by wrapping `send`.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        rid = ""
+        for key, value in scope["headers"]:
+            if key == b"x-request-id":
+                rid = value.decode("latin-1")
+                break
+        if not rid:
+            # 128 random bits as hex: same entropy as uuid4 without building a UUID
+            rid = os.urandom(16).hex()
+        # Kept in a ContextVar (not on the task) so tasks spawned while handling the
+        # request, e.g. gathered upstream fetches, log the same id
+        token = request_id_ctx_var.set(rid)
+        start = time.perf_counter_ns()
+        status_code = 0
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                MutableHeaders(scope=message).append("X-Request-ID", rid)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration_ms = (time.perf_counter_ns() - start) / 1e6
+            structlog.get_logger().info(
+                "request",
+                method=scope["method"],
+                path=scope["path"],
+                status_code=status_code,
+                duration_ms=round(duration_ms, 2),
+            )
+            # Restore the previous value; reset() reuses the token instead of setting anew
+            request_id_ctx_var.reset(token)
 
 
 def get_logger() -> Any:
@@ -1,15 +1,23 @@
 from __future__ import annotations
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
+
+# Raw Universalis records: read-only, extra keys dropped, and constructible by
+# field name as well as by the camelCase alias
+_RECORD_CONFIG = ConfigDict(populate_by_name=True, frozen=True, extra="ignore")
 
 
 class Listing(BaseModel):
+    model_config = _RECORD_CONFIG
+
     price_per_unit: int = Field(..., alias="pricePerUnit", ge=0)
     quantity: int = Field(..., ge=1)
     hq: bool = False
 
 
 class Sale(BaseModel):
+    model_config = _RECORD_CONFIG
+
     price_per_unit: int = Field(..., alias="pricePerUnit", ge=0)
     quantity: int = Field(..., ge=1)
     timestamp: int = Field(..., ge=0)  # Unix epoch seconds
@@ -1,16 +1,54 @@
 from __future__ import annotations
 
+import heapq
 from dataclasses import dataclass
-from typing import Any
+from operator import itemgetter
+from typing import Any, Literal, cast, overload
 
-from ..services.metrics import roi
+import numpy as np
+import numpy.typing as npt
+
+from ..services.metrics import BUYER_TAX, SELLER_TAX, roi
 from ..config import settings
 
-RISK_LOW = settings.ADVICE_RISK_LOW
-RISK_MED = settings.ADVICE_RISK_MED
+# Candidate lists at least this long are ranked on NumPy arrays; below it the
+# per-candidate Python loop is cheaper than building the columns
+NP_MIN_CANDIDATES = 128
+
+
+@dataclass(frozen=True, slots=True)
+class ScoreWeights:
+    """Risk thresholds and scoring weights/norms, read from `settings` once per
+    ranking call so the per-candidate kernel works on plain floats."""
+
+    risk_low: float
+    risk_med: float
+    spd_norm: float
+    ppd_norm: float
+    w_roi: float
+    w_spd: float
+    w_ppd: float
+    pen_saturo: float
+    pen_instabile: float
+    pen_comp: float
+
+    @classmethod
+    def from_settings(cls) -> ScoreWeights:
+        return cls(
+            risk_low=float(settings.ADVICE_RISK_LOW),
+            risk_med=float(settings.ADVICE_RISK_MED),
+            spd_norm=float(settings.ADVICE_SPD_NORM),
+            ppd_norm=float(settings.ADVICE_PPD_NORM),
+            w_roi=float(settings.ADVICE_W_ROI),
+            w_spd=float(settings.ADVICE_W_SPD),
+            w_ppd=float(settings.ADVICE_W_PPD),
+            pen_saturo=float(settings.ADVICE_PENALTY_SATURO),
+            pen_instabile=float(settings.ADVICE_PENALTY_INSTABILE),
+            pen_comp=float(settings.ADVICE_PENALTY_COMP),
+        )
 
 
-@dataclass
+@dataclass(slots=True)
 class AdviceItem:
     item_id: int
     name: str | None
@@ -23,65 +61,231 @@ class AdviceItem:
     risk: str
 
 
+def _clamp01(x: float) -> float:
+    # Same result as max(0.0, min(1.0, x)) (NaN -> 1.0) without two builtin calls
+    return x if 0.0 <= x <= 1.0 else (0.0 if x < 0.0 else 1.0)
+
+
+def _score_core(
+    roi_value: float,
+    sales_per_day: float,
+    profit_per_day: float,
+    saturo: bool,
+    instabile: bool,
+    competition_count: int,
+    w: ScoreWeights,
+) -> float:
+    """Scalar scoring kernel: flags already reduced to booleans, no allocations."""
+    # Normalize ROI to 0..1 over a rough range (-0.5..1.0)
+    norm_roi = _clamp01((roi_value + 0.5) / 1.5)
+    vend = _clamp01(sales_per_day / w.spd_norm)
+    ppd = _clamp01(profit_per_day / w.ppd_norm)
+    penalty = 0.0
+    if saturo:
+        penalty += w.pen_saturo
+    if instabile:
+        penalty += w.pen_instabile
+    # Competition penalty scaled by number of listings below target
+    comp = competition_count if competition_count > 0 else 0
+    penalty += (comp / 10.0 if comp < 10 else 1.0) * w.pen_comp
+    score = norm_roi * w.w_roi + vend * w.w_spd + ppd * w.w_ppd - penalty
+    return score if score > 0.0 else 0.0
+
+
 def compute_score(
     roi_value: float,
     sales_per_day: float,
     flags: list[str],
     profit_per_day: float,
     competition_count: int = 0,
+    weights: ScoreWeights | None = None,
 ) -> tuple[float, str]:
-    # Normalize ROI to 0..1 over a rough range (-0.5..1.0)
-    norm_roi = max(0.0, min(1.0, (roi_value + 0.5) / 1.5))
-    vend = max(0.0, min(1.0, sales_per_day / settings.ADVICE_SPD_NORM))
-    ppd = max(0.0, min(1.0, profit_per_day / settings.ADVICE_PPD_NORM))
-    penalty = 0.0
-    if "saturo" in flags:
-        penalty += settings.ADVICE_PENALTY_SATURO
-    if "instabile" in flags:
-        penalty += settings.ADVICE_PENALTY_INSTABILE
-    # Competition penalty scaled by number of listings below target
-    comp_pen = min(1.0, max(0, competition_count) / 10.0) * settings.ADVICE_PENALTY_COMP
-    penalty += comp_pen
-    score = max(
-        0.0,
-        norm_roi * settings.ADVICE_W_ROI + vend * settings.ADVICE_W_SPD + ppd * settings.ADVICE_W_PPD - penalty,
+    """(score, risk) for one item; pass `weights` to reuse one snapshot across a loop."""
+    w = weights or ScoreWeights.from_settings()
+    score = _score_core(
+        roi_value,
+        sales_per_day,
+        profit_per_day,
+        "saturo" in flags,
+        "instabile" in flags,
+        competition_count,
+        w,
     )
+    return score, _risk(score, w)
+
 
-    risk = "basso"
-    if score < RISK_LOW:
-        risk = "alto"
-    elif score < RISK_MED:
-        risk = "medio"
-    return score, risk
+def _risk(score: float, w: ScoreWeights) -> str:
+    if score < w.risk_low:
+        return "alto"
+    if score < w.risk_med:
+        return "medio"
+    return "basso"
+
+
+@overload
+def rank_items(
+    candidates: list[dict[str, Any]],
+    min_roi: float = ...,
+    min_spd: float = ...,
+    *,
+    structured: Literal[False] = ...,
+    top_k: int | None = ...,
+) -> list[dict[str, Any]]: ...
+
+
+@overload
+def rank_items(
+    candidates: list[dict[str, Any]],
+    min_roi: float = ...,
+    min_spd: float = ...,
+    *,
+    structured: Literal[True],
+    top_k: int | None = ...,
+) -> list[AdviceItem]: ...
 
 
 def rank_items(
     candidates: list[dict[str, Any]],
     min_roi: float = 0.0,
     min_spd: float = 0.0,
-) -> list[AdviceItem]:
-    results: list[AdviceItem] = []
+    *,
+    structured: bool = False,
+    top_k: int | None = None,
+) -> list[dict[str, Any]] | list[AdviceItem]:
+    """Score and sort candidates (best first).
+
+    Candidates are built in-process with numeric fields already typed (item_id and
+    competition as int, prices/rates as float), so values are used as-is rather
+    than re-cast per candidate.
+
+    Returns plain dicts with the AdviceItem fields, ready to serialize; pass
+    `structured=True` to get AdviceItem instances instead. With `top_k` only the
+    best `top_k` are selected (same order as sorting everything and slicing).
+    """
+    w = ScoreWeights.from_settings()
+    if len(candidates) >= NP_MIN_CANDIDATES:
+        results = _rank_np(candidates, min_roi, min_spd, w, top_k)
+        if structured:
+            return [AdviceItem(**d) for d in results]
+        return results
+
+    results = []
     for c in candidates:
         r = roi(c.get("price", 0.0), c.get("cost", 1.0))
-        spd = float(c.get("sales_per_day", 0.0))
+        spd = c.get("sales_per_day", 0.0)
         if r < min_roi or spd < min_spd:
             continue
         flags = list(c.get("flags", []))
-        ppd = float(c.get("profit_per_day", 0.0))
-        comp = int(c.get("competition", 0))
-        score, risk = compute_score(r, spd, flags, ppd, comp)
+        ppd = c.get("profit_per_day", 0.0)
+        comp = c.get("competition", 0)
+        # Flags reduced to the two booleans the kernel needs, probed once each
+        score = _score_core(r, spd, ppd, "saturo" in flags, "instabile" in flags, comp, w)
+        risk = _risk(score, w)
+        results.append(
+            {
+                "item_id": c["item_id"],
+                "name": c.get("name"),
+                "roi": r,
+                "sales_per_day": spd,
+                "profit_per_day": ppd,
+                "profit_unit": c.get("profit_unit", 0.0),
+                "score": score,
+                "flags": flags,
+                "risk": risk,
+            }
+        )
+    if top_k is not None and top_k < len(results):
+        results = heapq.nlargest(top_k, results, key=itemgetter("score"))
+    else:
+        results.sort(key=itemgetter("score"), reverse=True)
+    if structured:
+        return [AdviceItem(**d) for d in results]
+    return results
+
+
+def roi_batch(
+    price: npt.NDArray[np.float64],
+    cost: npt.NDArray[np.float64],
+    buyer_tax: float = BUYER_TAX,
+    seller_tax: float = SELLER_TAX,
+) -> npt.NDArray[np.float64]:
+    """`roi` over arrays (same fees and clamping); 0.0 where cost <= 0."""
+    revenue = price * (1.0 - max(0.0, min(seller_tax, 1.0)))
+    eff = cost * (1.0 + max(0.0, min(buyer_tax, 1.0)))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return cast(npt.NDArray[np.float64], np.where(cost <= 0, 0.0, (revenue - eff) / eff))
+
+
+def score_batch(
+    roi_value: npt.NDArray[np.float64],
+    sales_per_day: npt.NDArray[np.float64],
+    profit_per_day: npt.NDArray[np.float64],
+    competition: npt.NDArray[np.int64],
+    saturo: npt.NDArray[np.bool_],
+    instabile: npt.NDArray[np.bool_],
+    w: ScoreWeights,
+) -> npt.NDArray[np.float64]:
+    """`_score_core` over columnar arrays: one elementwise pass per term, no Python loop."""
+    norm_roi = np.clip((roi_value + 0.5) / 1.5, 0.0, 1.0)
+    vend = np.clip(sales_per_day / w.spd_norm, 0.0, 1.0)
+    ppd_n = np.clip(profit_per_day / w.ppd_norm, 0.0, 1.0)
+    penalty = (
+        saturo * w.pen_saturo
+        + instabile * w.pen_instabile
+        + np.minimum(1.0, np.maximum(competition, 0) / 10.0) * w.pen_comp
+    )
+    score = np.maximum(0.0, norm_roi * w.w_roi + vend * w.w_spd + ppd_n * w.w_ppd - penalty)
+    return cast(npt.NDArray[np.float64], score)
+
+
+def _rank_np(
+    candidates: list[dict[str, Any]],
+    min_roi: float,
+    min_spd: float,
+    w: ScoreWeights,
+    top_k: int | None = None,
+) -> list[dict[str, Any]]:
+    """`rank_items` for large batches: roi/score computed on columnar arrays.
+
+    Same arithmetic as `roi` (default fees) and `compute_score`; dicts are only
+    built for the candidates that pass the filters, already in score order.
+    """
+    n = len(candidates)
+    price = np.fromiter((c.get("price", 0.0) for c in candidates), dtype=np.float64, count=n)
+    cost = np.fromiter((c.get("cost", 1.0) for c in candidates), dtype=np.float64, count=n)
+    spd = np.fromiter((c.get("sales_per_day", 0.0) for c in candidates), dtype=np.float64, count=n)
+    ppd = np.fromiter((c.get("profit_per_day", 0.0) for c in candidates), dtype=np.float64, count=n)
+    comp = np.fromiter((c.get("competition", 0) for c in candidates), dtype=np.int64, count=n)
+    flags = [list(c.get("flags", [])) for c in candidates]
+    saturo = np.fromiter(("saturo" in f for f in flags), dtype=bool, count=n)
+    instabile = np.fromiter(("instabile" in f for f in flags), dtype=bool, count=n)
+
+    r = roi_batch(price, cost)
+    keep = np.flatnonzero((r >= min_roi) & (spd >= min_spd))
+    if not keep.size:
+        return []
+    r, spd, ppd, comp = r[keep], spd[keep], ppd[keep], comp[keep]
+    score = score_batch(r, spd, ppd, comp, saturo[keep], instabile[keep], w)
+    # Stable descending order, matching list.sort(reverse=True) on ties
+    order = np.argsort(-score, kind="stable")
+    if top_k is not None:
+        order = order[:top_k]
+
+    results: list[dict[str, Any]] = []
+    for j in order.tolist():
+        c = candidates[int(keep[j])]
+        sc = float(score[j])
         results.append(
-            AdviceItem(
-                item_id=int(c["item_id"]),
-                name=c.get("name"),
-                roi=r,
-                sales_per_day=spd,
-                profit_per_day=ppd,
-                profit_unit=float(c.get("profit_unit", 0.0)),
-                score=score,
-                flags=flags,
-                risk=risk,
-            )
+            {
+                "item_id": int(c["item_id"]),
+                "name": c.get("name"),
+                "roi": float(r[j]),
+                "sales_per_day": float(spd[j]),
+                "profit_per_day": float(ppd[j]),
+                "profit_unit": float(c.get("profit_unit", 0.0)),
+                "score": sc,
+                "flags": flags[int(keep[j])],
+                "risk": _risk(sc, w),
+            }
         )
-    results.sort(key=lambda x: x.score, reverse=True)
     return results
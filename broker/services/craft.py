@@ -1,13 +1,25 @@
 from __future__ import annotations
 
+import asyncio
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Hashable
 from dataclasses import dataclass
-from typing import Any
+from typing import Any, Generic, TypeVar
 
 from ..clients.universalis import get_item_world
-from ..clients.xivapi import get_recipe
+from ..clients.xivapi import forget_recipe, get_recipe
 from ..models.recipe import Ingredient, Recipe
 
 
+# In-process TTLs (seconds): recipes are static game data, prices follow listings
+RECIPE_TTL = 3600
+PRICE_TTL = 60
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
 @dataclass
 class CraftCost:
     total_cost_nq: float
@@ -15,7 +27,64 @@ class CraftCost:
     breakdown: list[dict[str, Any]]
 
 
+class _TTLCache(Generic[K, V]):
+    """Bounded TTL cache with single-flight fetches: concurrent misses on one key share
+    a single in-flight task instead of each going upstream."""
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[K, tuple[float, V]] = OrderedDict()
+        self._inflight: dict[K, asyncio.Task[V]] = {}
+
+    async def get_or_fetch(self, key: K, fetch: Callable[[], Awaitable[V]]) -> V:
+        entry = self._data.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self._data.move_to_end(key)
+                return entry[1]
+            del self._data[key]
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._inflight[key] = asyncio.ensure_future(fetch())
+            task.add_done_callback(lambda t: self._settle(key, t))
+        # Shielded: a cancelled caller must not cancel the fetch other callers await
+        return await asyncio.shield(task)
+
+    def _settle(self, key: K, task: asyncio.Task[V]) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if task.cancelled() or task.exception() is not None:
+            return
+        self._data[key] = (time.monotonic() + self.ttl, task.result())
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key: K) -> None:
+        self._data.pop(key, None)
+
+
+_RECIPES: _TTLCache[int, Recipe | None] = _TTLCache(10_000, RECIPE_TTL)
+_PRICES: _TTLCache[tuple[int, str], tuple[float, float]] = _TTLCache(10_000, PRICE_TTL)
+
+
+def invalidate_recipe(item_id: int) -> None:
+    # Both in-process layers: the next lookup must not get the old recipe back
+    # from the XIVAPI client's memo
+    _RECIPES.invalidate(item_id)
+    forget_recipe(item_id)
+
+
+def invalidate_price(item_id: int, world: str) -> None:
+    _PRICES.invalidate((item_id, world))
+
+
 async def resolve_recipe(item_id: int) -> Recipe | None:
+    return await _RECIPES.get_or_fetch(item_id, lambda: _fetch_recipe(item_id))
+
+
+async def _fetch_recipe(item_id: int) -> Recipe | None:
     data = await get_recipe(item_id)
     if not data:
         return None
@@ -36,14 +105,26 @@ async def resolve_recipe(item_id: int) -> Recipe | None:
 
 async def estimate_market_price(item_id: int, world: str) -> tuple[float, float]:
     """Return (nq_price, hq_price) estimates using current lowest listings.
-    This is a naive estimator; refine as needed.
+    This is a naive estimator; refine as needed. Cached in-process for PRICE_TTL.
     """
+    return await _PRICES.get_or_fetch((item_id, world), lambda: _fetch_market_price(item_id, world))
+
+
+async def _fetch_market_price(item_id: int, world: str) -> tuple[float, float]:
     data = await get_item_world(item_id, world)
     listings = data.get("listings", [])
     if not listings:
         return (0.0, 0.0)
-    nq = min((entry["pricePerUnit"] for entry in listings if not entry.get("hq")), default=None)
-    hq = min((entry["pricePerUnit"] for entry in listings if entry.get("hq")), default=None)
+    # Both running minimums in one pass over the listings
+    nq: int | None = None
+    hq: int | None = None
+    for entry in listings:
+        p = entry["pricePerUnit"]
+        if entry.get("hq"):
+            if hq is None or p < hq:
+                hq = p
+        elif nq is None or p < nq:
+            nq = p
     # Fallback: if one is None, use the other
     if nq is None and hq is None:
         return (0.0, 0.0)
@@ -59,46 +140,85 @@ async def estimate_market_price(item_id: int, world: str) -> tuple[float, float]
 
 
 async def compute_craft_cost(item_id: int, world: str, depth: int = 3) -> CraftCost:
-    """Resolve multi-tier crafting costs with recursion guard and memoization.
+    """Resolve multi-tier crafting costs with a depth guard, without recursion.
     Currently uses market prices only; vendor prices TODO.
-    """
-    memo: dict[int, CraftCost] = {}
 
-    async def _cost(iid: int, lvl: int) -> CraftCost:
-        if iid in memo:
-            return memo[iid]
+    Every item gets a single cost, decided at its shallowest tier: it is crafted if
+    that tier is within `depth`, bought at market price otherwise. An ingredient
+    shared by several branches therefore costs the same in all of them, even where a
+    deeper occurrence alone would have hit the depth limit (e.g. {1: [2, 3], 2: [3],
+    3: [4]} at depth 2 crafts 3 from 4 under both 1 and 2).
+
+    1. Breadth-first over the recipe tree: each tier's recipes are resolved with one
+       gather, and every item is expanded once, at its shallowest tier.
+    2. Market prices for all leaves (depth exhausted or no recipe) in one gather.
+    3. Post-order aggregation with an explicit stack. An ingredient that is still
+       being aggregated (cyclic recipe data) is costed at its market price.
+    """
+    recipes: dict[int, Recipe] = {}
+    leaves: list[int] = []
+    seen = {item_id}
+    frontier = [item_id]
+    lvl = depth
+    while frontier:
         if lvl <= 0:
-            nq, hq = await estimate_market_price(iid, world)
-            cc = CraftCost(
-                total_cost_nq=nq,
-                total_cost_hq=hq,
-                breakdown=[{"item_id": iid, "qty": 1, "nq": nq, "hq": hq}],
-            )
-            memo[iid] = cc
-            return cc
-
-        recipe = await resolve_recipe(iid)
-        if not recipe or not recipe.ingredients:
-            nq, hq = await estimate_market_price(iid, world)
-            cc = CraftCost(
-                total_cost_nq=nq,
-                total_cost_hq=hq,
-                breakdown=[{"item_id": iid, "qty": 1, "nq": nq, "hq": hq}],
+            leaves.extend(frontier)
+            break
+        resolved = await asyncio.gather(*(resolve_recipe(iid) for iid in frontier))
+        nxt: list[int] = []
+        for iid, recipe in zip(frontier, resolved):
+            if not recipe or not recipe.ingredients:
+                leaves.append(iid)
+                continue
+            recipes[iid] = recipe
+            for ing in recipe.ingredients:
+                if ing.item_id not in seen:
+                    seen.add(ing.item_id)
+                    nxt.append(ing.item_id)
+        frontier = nxt
+        lvl -= 1
+
+    prices = dict(
+        zip(leaves, await asyncio.gather(*(estimate_market_price(iid, world) for iid in leaves)))
+    )
+
+    async def _leaf(iid: int) -> CraftCost:
+        if iid not in prices:
+            prices[iid] = await estimate_market_price(iid, world)
+        nq, hq = prices[iid]
+        return CraftCost(
+            total_cost_nq=nq,
+            total_cost_hq=hq,
+            breakdown=[{"item_id": iid, "qty": 1, "nq": nq, "hq": hq}],
+        )
+
+    costs: dict[int, CraftCost] = {}
+    in_progress: set[int] = set()
+    stack: list[tuple[int, bool]] = [(item_id, False)]
+    while stack:
+        iid, expanded = stack.pop()
+        if iid in costs:
+            continue
+        recipe = recipes.get(iid)
+        if recipe is None:
+            costs[iid] = await _leaf(iid)
+        elif not expanded:
+            in_progress.add(iid)
+            stack.append((iid, True))
+            stack.extend(
+                (ing.item_id, False)
+                for ing in reversed(recipe.ingredients)
+                if ing.item_id not in costs and ing.item_id not in in_progress
             )
-            memo[iid] = cc
-            return cc
-
-        parts: list[dict[str, Any]] = []
-        total_nq = 0.0
-        total_hq = 0.0
-        for ing in recipe.ingredients:
-            sub = await _cost(ing.item_id, lvl - 1)
-            parts.extend(sub.breakdown)
-            total_nq += sub.total_cost_nq * ing.quantity
-            total_hq += sub.total_cost_hq * ing.quantity
-
-        result = CraftCost(total_cost_nq=total_nq, total_cost_hq=total_hq, breakdown=parts)
-        memo[iid] = result
-        return result
-
-    return await _cost(item_id, depth)
+        else:
+            parts: list[dict[str, Any]] = []
+            total_nq = 0.0
+            total_hq = 0.0
+            for ing in recipe.ingredients:
+                sub = costs.get(ing.item_id) or await _leaf(ing.item_id)
+                parts.extend(sub.breakdown)
+                total_nq += sub.total_cost_nq * ing.quantity
+                total_hq += sub.total_cost_hq * ing.quantity
+            costs[iid] = CraftCost(total_cost_nq=total_nq, total_cost_hq=total_hq, breakdown=parts)
+            in_progress.discard(iid)
+    return costs[item_id]
@@ -1,24 +1,86 @@
 from __future__ import annotations
 
+import math
 import statistics
 import time
-from collections.abc import Iterable
+from collections.abc import Iterable, Mapping, Sequence
+from dataclasses import dataclass
+from itertools import chain
+from operator import itemgetter
+from typing import Any, cast
+
+import numpy as np
+import numpy.typing as npt
 
 from ..models.market import Sale
 from ..config import settings
 
+_PPU = itemgetter("pricePerUnit")
+_QTY = itemgetter("quantity")
+_TS = itemgetter("timestamp")
+
+# Histories (and listing lists) at least this long are reduced with NumPy; below
+# it the array setup costs more than the Python loop it replaces.
+NP_MIN_HISTORY = 128
+
+# Default market board fees, shared by the scalar and array ROI paths
+BUYER_TAX = 0.05
+SELLER_TAX = 0.05
+
 
 def _cutoff_ts(days: int) -> int:
     return int(time.time()) - days * 86400
 
 
-def avg_price(history: Iterable[Sale | dict[str, object]], days: int = 7) -> float | None:
+def _np_window(
+    history: Iterable[Sale | dict[str, object]], days: int
+) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]] | None:
+    """Window arrays for long raw histories, None when the Python loop is cheaper."""
+    if (
+        isinstance(history, list)
+        and len(history) >= NP_MIN_HISTORY
+        and isinstance(history[0], dict)
+    ):
+        return _hist_to_np(cast(list[dict[str, Any]], history), days)
+    return None
+
+
+def extract_window(
+    history: Iterable[Sale | dict[str, object]], days: int = 7, *, validate: bool = False
+) -> tuple[list[float], int]:
+    """(per-sale prices, total quantity) inside the window, in a single pass.
+
+    Raw Universalis dicts are read by key rather than validated into `Sale` models
+    (a malformed record raises KeyError); long raw histories go through the NumPy
+    path. Pass `validate=True` to run every dict through `Sale.model_validate`
+    instead. Callers needing several stats over the same window extract once and
+    reduce the lists themselves.
+    """
     cutoff = _cutoff_ts(days)
+    if validate:
+        history = [Sale.model_validate(rec) if isinstance(rec, dict) else rec for rec in history]
+    else:
+        window = _np_window(history, days)
+        if window is not None:
+            return window[0].tolist(), int(window[1].sum())
     prices: list[float] = []
+    qty = 0
     for rec in history:
-        sale = Sale.model_validate(rec) if isinstance(rec, dict) else rec
-        if sale.timestamp >= cutoff:
-            prices.append(float(sale.price_per_unit))
+        if isinstance(rec, dict):
+            if cast(int, rec["timestamp"]) >= cutoff:
+                prices.append(float(cast(int, rec["pricePerUnit"])))
+                qty += cast(int, rec["quantity"])
+        elif rec.timestamp >= cutoff:
+            prices.append(float(rec.price_per_unit))
+            qty += rec.quantity
+    return prices, qty
+
+
+def avg_price(history: Iterable[Sale | dict[str, object]], days: int = 7) -> float | None:
+    window = _np_window(history, days)
+    if window is not None:
+        return float(window[0].mean()) if window[0].size else None
+    prices = extract_window(history, days)[0]
     if not prices:
         return None
     return statistics.mean(prices)
@@ -33,12 +95,10 @@ def trimmed_mean_price(
 
     Discards `trim` fraction on each tail (e.g., 0.2 keeps the central 60%).
     """
-    cutoff = _cutoff_ts(days)
-    prices: list[float] = []
-    for rec in history:
-        sale = Sale.model_validate(rec) if isinstance(rec, dict) else rec
-        if sale.timestamp >= cutoff:
-            prices.append(float(sale.price_per_unit))
+    window = _np_window(history, days)
+    if window is not None:
+        return _trimmed_mean_np(window[0], trim) if window[0].size else None
+    prices = extract_window(history, days)[0]
     if not prices:
         return None
     prices.sort()
@@ -53,13 +113,7 @@ def trimmed_mean_price(
 def prices_in_window(
     history: Iterable[Sale | dict[str, object]], days: int = 7
 ) -> list[float]:
-    cutoff = _cutoff_ts(days)
-    prices: list[float] = []
-    for rec in history:
-        sale = Sale.model_validate(rec) if isinstance(rec, dict) else rec
-        if sale.timestamp >= cutoff:
-            prices.append(float(sale.price_per_unit))
-    return prices
+    return extract_window(history, days)[0]
 
 
 def price_cv(history: Iterable[Sale | dict[str, object]], days: int = 7) -> float | None:
@@ -67,6 +121,13 @@ def price_cv(history: Iterable[Sale | dict[str, object]], days: int = 7) -> floa
 
     Returns None if insufficient data (n < 2) or mean is zero.
     """
+    window = _np_window(history, days)
+    if window is not None:
+        arr = window[0]
+        if arr.size < 2:
+            return None
+        np_mean = float(arr.mean())
+        return float(arr.std(ddof=1)) / np_mean if np_mean != 0 else None
     ps = prices_in_window(history, days=days)
     if len(ps) < 2:
         return None
@@ -90,13 +151,11 @@ def quantile_price(
     Uses per-sale prices (unweighted). For robustness and speed we avoid weighting by
     quantities; adjust if needed.
     """
-    cutoff = _cutoff_ts(days)
-    prices: list[float] = []
     q = max(0.0, min(1.0, q))
-    for rec in history:
-        sale = Sale.model_validate(rec) if isinstance(rec, dict) else rec
-        if sale.timestamp >= cutoff:
-            prices.append(float(sale.price_per_unit))
+    window = _np_window(history, days)
+    if window is not None:
+        return _quantile_np(window[0], q) if window[0].size else None
+    prices = extract_window(history, days)[0]
     if not prices:
         return None
     prices.sort()
@@ -109,30 +168,203 @@ def median_price(history: Iterable[Sale | dict[str, object]], days: int = 7) ->
 
 
 def sales_per_day(history: Iterable[Sale | dict[str, object]], days: int = 7) -> float:
-    cutoff = _cutoff_ts(days)
-    qty = 0
-    for rec in history:
-        sale = Sale.model_validate(rec) if isinstance(rec, dict) else rec
-        if sale.timestamp >= cutoff:
-            qty += int(sale.quantity)
+    window = _np_window(history, days)
+    if window is not None:
+        return float(window[1].sum()) / float(days)
+    qty = extract_window(history, days)[1]
     return qty / float(days)
 
 
 def units_sold(history: Iterable[Sale | dict[str, object]], days: int = 7) -> int:
-    cutoff = _cutoff_ts(days)
-    qty = 0
-    for rec in history:
-        sale = Sale.model_validate(rec) if isinstance(rec, dict) else rec
-        if sale.timestamp >= cutoff:
-            qty += int(sale.quantity)
+    window = _np_window(history, days)
+    if window is not None:
+        return int(window[1].sum())
+    qty = extract_window(history, days)[1]
     return qty
 
 
+@dataclass(frozen=True, slots=True)
+class HistorySummary:
+    """Window metrics derived from one pass over a sales history."""
+
+    sales_per_day: float
+    units_sold: int
+    target: float | None
+    cv: float | None
+    avg: float | None
+
+
+def summarize_history(
+    history: Iterable[Sale | dict[str, object]],
+    days: int = 7,
+    target: str = "avg",
+    q: float | None = None,
+    trim: float = 0.2,
+) -> HistorySummary:
+    """Compute spd, units sold, target price, price CV and mean price in a single scan.
+
+    Equivalent to calling `sales_per_day`, `units_sold`, `price_cv`, `avg_price` and
+    the target function (`quantile_price` when `q` is set, `median_price` for
+    target="median", else `trimmed_mean_price` falling back to `avg_price`) but
+    reads the window once (raw dicts by key, without `Sale` validation; see
+    `extract_window`) and shares one sorted price series between them. Long raw
+    histories (>= NP_MIN_HISTORY dicts) are converted to NumPy arrays once and
+    reduced in C.
+    """
+    window = _np_window(history, days)
+    if window is not None:
+        return _summarize_np(window[0], window[1], days, target, q, trim)
+
+    prices, qty = extract_window(history, days)
+    n = len(prices)
+    tgt: float | None = None
+    cv: float | None = None
+    mean: float | None = None
+    if n:
+        mean = math.fsum(prices) / n
+        if n >= 2 and mean != 0:
+            cv = statistics.stdev(prices, mean) / mean
+        prices.sort()
+        if q is not None or target == "median":
+            qq = 0.5 if q is None else max(0.0, min(1.0, q))
+            tgt = prices[int(round((n - 1) * qq))]
+        else:
+            k = int(n * max(0.0, min(0.45, trim)))
+            core = prices[k : n - k] if n - k > k else prices
+            tgt = (math.fsum(core) / len(core)) or mean
+    return HistorySummary(
+        sales_per_day=qty / float(days), units_sold=qty, target=tgt, cv=cv, avg=mean
+    )
+
+
+def history_arrays(
+    history: Sequence[dict[str, Any]],
+) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+    """(timestamps, prices, quantities) column arrays from raw Universalis sale dicts.
+
+    Each column is filled with `np.fromiter` straight from the dicts, skipping the
+    intermediate list of tuples a 2-D `np.array` would build.
+    """
+    n = len(history)
+    ts = np.fromiter(map(_TS, history), dtype=np.int64, count=n)
+    price = np.fromiter(map(_PPU, history), dtype=np.float64, count=n)
+    qty = np.fromiter(map(_QTY, history), dtype=np.float64, count=n)
+    return ts, price, qty
+
+
+def _hist_to_np(
+    history: list[dict[str, Any]], days: int
+) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+    """Window-filtered (prices, quantities) arrays from raw Universalis sale dicts."""
+    ts, price, qty = history_arrays(history)
+    mask = ts >= _cutoff_ts(days)
+    return price[mask], qty[mask]
+
+
+def _summarize_np(
+    prices: npt.NDArray[np.float64],
+    qty: npt.NDArray[np.float64],
+    days: int,
+    target: str,
+    q: float | None,
+    trim: float,
+) -> HistorySummary:
+    sold = int(qty.sum())
+    n = int(prices.size)
+    tgt: float | None = None
+    cv: float | None = None
+    mean: float | None = None
+    if n:
+        mean = float(prices.mean())
+        if n >= 2 and mean != 0:
+            cv = float(prices.std(ddof=1)) / mean
+        if q is not None or target == "median":
+            tgt = _quantile_np(prices, 0.5 if q is None else max(0.0, min(1.0, q)))
+        else:
+            tgt = _trimmed_mean_np(prices, trim) or mean
+    return HistorySummary(
+        sales_per_day=sold / float(days), units_sold=sold, target=tgt, cv=cv, avg=mean
+    )
+
+
+def _quantile_np(prices: npt.NDArray[np.float64], q: float) -> float:
+    """Order statistic at round((n-1)*q): O(n) selection instead of a full sort."""
+    idx = int(round((prices.size - 1) * q))
+    return float(np.partition(prices, idx)[idx])
+
+
+def _trimmed_mean_np(prices: npt.NDArray[np.float64], trim: float) -> float:
+    """Mean of the central slice once `trim` of each tail is dropped (two partitions, no sort)."""
+    n = int(prices.size)
+    k = int(n * max(0.0, min(0.45, trim)))
+    if k == 0:
+        return float(prices.mean())
+    core = np.partition(prices, (k, n - k - 1))[k : n - k]
+    return float(core.mean())
+
+
+def window_stats_batch(
+    histories: Sequence[list[dict[str, Any]]], days: int = 7
+) -> list[tuple[float | None, float]]:
+    """(avg_price, sales_per_day) for each raw history, reduced in one NumPy pass.
+
+    All histories are flattened into a single array tagged with their index and
+    summed per index with `bincount`, instead of one Python loop per item.
+    """
+    lens = [len(h) for h in histories]
+    if not sum(lens):
+        return [(None, 0.0)] * len(histories)
+    # The flattened list only holds references; the columns come from `np.fromiter`
+    ts, price, qty = history_arrays(list(chain.from_iterable(histories)))
+    seg = np.repeat(np.arange(len(histories)), lens)
+    mask = ts >= _cutoff_ts(days)
+    seg = seg[mask]
+    n = len(histories)
+    counts = np.bincount(seg, minlength=n)
+    price_sum = np.bincount(seg, weights=price[mask], minlength=n)
+    qty_sum = np.bincount(seg, weights=qty[mask], minlength=n)
+    return [
+        (float(price_sum[i] / counts[i]) if counts[i] else None, float(qty_sum[i]) / days)
+        for i in range(n)
+    ]
+
+
+def lowest_price(listings: list[dict[str, Any]]) -> int | None:
+    """Lowest pricePerUnit among listings (C-level min with an itemgetter key)."""
+    return _PPU(min(listings, key=_PPU)) if listings else None  # type: ignore[no-any-return]
+
+
+def listing_prices(listings: list[dict[str, Any]]) -> npt.NDArray[np.int64]:
+    """pricePerUnit column of raw listings as an int64 array (itemgetter-mapped, no Python loop)."""
+    return np.fromiter(map(_PPU, listings), dtype=np.int64, count=len(listings))
+
+
+def scan_listings(
+    listings: Iterable[Mapping[str, Any]], target: float
+) -> tuple[int | None, int]:
+    """Return (lowest pricePerUnit, count of listings priced at/below `target`) in one loop.
+
+    Long raw listing lists (>= NP_MIN_HISTORY) are reduced on a NumPy price array.
+    """
+    if isinstance(listings, list) and len(listings) >= NP_MIN_HISTORY:
+        prices = listing_prices(cast(list[dict[str, Any]], listings))
+        return int(prices.min()), int(np.count_nonzero(prices <= target))
+    lowest: int | None = None
+    comp = 0
+    for listing in listings:
+        p = listing["pricePerUnit"]
+        if lowest is None or p < lowest:
+            lowest = p
+        if p <= target:
+            comp += 1
+    return lowest, comp
+
+
 def roi(
     net_price: float,
     cost_total: float,
-    buyer_tax: float = 0.05,
-    seller_tax: float = 0.05,
+    buyer_tax: float = BUYER_TAX,
+    seller_tax: float = SELLER_TAX,
 ) -> float:
     if cost_total <= 0:
         return 0.0
@@ -144,8 +376,8 @@ def roi(
 def net_profit_unit(
     target_price: float,
     lowest_cost: float,
-    buyer_tax: float = 0.05,
-    seller_tax: float = 0.05,
+    buyer_tax: float = BUYER_TAX,
+    seller_tax: float = SELLER_TAX,
 ) -> float:
     """Absolute profit per unit after fees (gil)."""
     revenue = target_price * (1.0 - max(0.0, min(seller_tax, 1.0)))
@@ -0,0 +1,22 @@
+"""
+Runner asyncio condiviso dagli script: usa uvloop quando e installato.
+
+uvloop arriva con uvicorn[standard]; dove manca (Windows) resta il loop asyncio.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Coroutine
+from typing import Any, TypeVar
+
+T = TypeVar("T")
+
+
+def run_async(coro: Coroutine[Any, Any, T]) -> T:
+    """Esegue `coro` fino al termine e ne restituisce il risultato"""
+    try:
+        import uvloop
+    except ImportError:
+        return asyncio.run(coro)
+    return uvloop.run(coro)
@@ -9,42 +9,8 @@ from broker.clients.xivapi import get_item_name
 from broker.db.cache import get_redis
 import httpx
 
-
-async def garland_item_name(item_id: int) -> str | None:
-    endpoints = [
-        f"https://www.garlandtools.org/api/get.php?type=item&id={item_id}&lang=en",
-        f"https://www.garlandtools.org/db/doc/item/en/3/{item_id}.json",
-        f"https://www.garlandtools.org/db/doc/item/en/2/{item_id}.json",
-    ]
-    async with httpx.AsyncClient(timeout=10) as client:
-        for url in endpoints:
-            try:
-                r = await client.get(url)
-                if r.status_code != 200:
-                    continue
-                data = r.json()
-                name = None
-                if isinstance(data, dict):
-                    if isinstance(data.get("item"), dict):
-                        d = data["item"]
-                        name = (
-                            d.get("name")
-                            or d.get("n")
-                            or d.get("en")
-                            or d.get("Name")
-                        )
-                    else:
-                        name = (
-                            data.get("name")
-                            or data.get("n")
-                            or data.get("en")
-                            or data.get("Name")
-                        )
-                if isinstance(name, str) and name.strip():
-                    return name
-            except Exception:
-                continue
-    return None
+from aio_run import run_async
+from garland import garland_item_name
 
 
 async def build(limit: int, concurrency: int, batch_size: int, use_garland: bool) -> int:
@@ -55,40 +21,80 @@ async def build(limit: int, concurrency: int, batch_size: int, use_garland: bool
     ids = ids[: limit if limit > 0 else len(ids)]
     r = get_redis()
     sem = asyncio.Semaphore(max(1, concurrency))
+    batch_size = max(1, batch_size)
+    # Producers (lookups) hand resolved names to a single writer that groups them into
+    # batch_size HSETs, so fetches keep running while Redis writes are in flight
+    queue: asyncio.Queue[tuple[int, str] | None] = asyncio.Queue(maxsize=2 * batch_size)
+    # One pooled client for every Garland fallback: handshakes are reused across items
+    garland = (
+        httpx.AsyncClient(
+            timeout=10,
+            http2=True,
+            limits=httpx.Limits(
+                max_connections=max(1, concurrency), max_keepalive_connections=max(1, concurrency)
+            ),
+        )
+        if use_garland
+        else None
+    )
 
-    async def one(iid: int) -> tuple[int, str | None]:
+    async def one(iid: int) -> None:
         async with sem:
+            name = None
             try:
+                name = await get_item_name(iid)
+            except Exception:
                 name = None
+            if name is None and garland is not None:
                 try:
-                    name = await get_item_name(iid)
+                    name = await garland_item_name(iid, garland)
                 except Exception:
                     name = None
-                if name is None and use_garland:
-                    try:
-                        name = await garland_item_name(iid)
-                    except Exception:
-                        name = None
-                return iid, name
-            except Exception:
-                return iid, None
-
-    processed = 0
-    mapping: dict[str, str] = {}
-    tasks = [asyncio.create_task(one(i)) for i in ids]
-    for fut in asyncio.as_completed(tasks):
-        iid, name = await fut
         if name:
-            mapping[str(iid)] = name
-        if len(mapping) >= batch_size:
-            await r.hset("x:names", mapping=mapping)  # type: ignore[arg-type]
-            processed += len(mapping)
-            mapping.clear()
+            await queue.put((iid, name))
+
+    async def writer() -> int:
+        written = 0
+        mapping: dict[str, str] = {}
+        done = False
+        while not done:
+            item = await queue.get()
+            # Drain whatever else is already queued, up to one batch
+            while item is not None:
+                mapping[str(item[0])] = item[1]
+                if len(mapping) >= batch_size or queue.empty():
+                    break
+                item = queue.get_nowait()
+            done = item is None
+            if mapping and (done or len(mapping) >= batch_size):
+                async with r.pipeline(transaction=False) as pipe:
+                    pipe.hset("x:names", mapping=mapping)  # type: ignore[arg-type]
+                    await pipe.execute()
+                written += len(mapping)
+                mapping.clear()
+        return written
 
-    if mapping:
-        await r.hset("x:names", mapping=mapping)  # type: ignore[arg-type]
-        processed += len(mapping)
-    return processed
+    writer_task = asyncio.create_task(writer())
+    lookups = asyncio.gather(*(one(i) for i in ids))
+    watched: set[asyncio.Future[Any]] = {lookups, writer_task}
+    try:
+        await asyncio.wait(watched, return_when=asyncio.FIRST_COMPLETED)
+        if writer_task.done():
+            # The writer only stops early on a Redis error: the lookups would block on
+            # the full queue, so cancel them (finally) and re-raise it
+            return writer_task.result()
+        lookups.result()
+        # Never block on the sentinel: the writer may still die while the queue is full
+        stop = asyncio.create_task(queue.put(None))
+        await asyncio.wait({stop, writer_task}, return_when=asyncio.FIRST_COMPLETED)
+        stop.cancel()
+        return await writer_task
+    finally:
+        lookups.cancel()
+        writer_task.cancel()
+        await asyncio.gather(lookups, writer_task, return_exceptions=True)
+        if garland is not None:
+            await garland.aclose()
 
 
 def main() -> None:
@@ -99,7 +105,7 @@ def main() -> None:
     ap.add_argument("--use-garland", action="store_true", help="Fallback to GarlandTools for missing names")
     args = ap.parse_args()
 
-    total = asyncio.run(build(args.limit, args.concurrency, args.batch_size, args.use_garland))
+    total = run_async(build(args.limit, args.concurrency, args.batch_size, args.use_garland))
     print(f"Inserted names: {total}")
 
 
@@ -6,12 +6,19 @@ Raccoglie: ID, Nome, Prezzo piu basso, Prezzo medio, Vendite giornaliere, Flags
 
 import asyncio
 import csv
-import json
-from datetime import datetime, timedelta, timezone
+import random
+import sqlite3
+import time
 from typing import Any, Dict, List
 
 import httpx
+import numpy as np
+import orjson
 from tqdm import tqdm
+from tqdm.asyncio import tqdm as tqdm_asyncio
+
+from aio_run import run_async
+from name_memo import NameMemo
 
 # Configurazione
 UNIVERSALIS_BASE = "https://universalis.app/api"
@@ -19,202 +26,461 @@ XIVAPI_BASE = "https://xivapi.com"
 import os
 WORLD = os.environ.get("FFXIV_WORLD", "Phoenix")  # Cambia questo per altri server
 OUTPUT_FILE = "data/ffxiv_market_dataset.csv"
-BATCH_SIZE = 50  # Processa item in batch per evitare rate limiting
+STAGING_FILE = os.environ.get("FFXIV_STAGING_DB", "data/collect_staging.sqlite3")
+STAGING_MAX_AGE = 6 * 3600  # Oltre questa eta i dati in staging si riscaricano
+BATCH_SIZE = 50  # Item per batch (avanzamento della progress bar)
+NAMES_BATCH = 100  # ID per richiesta XIVAPI /item?ids=
+WINDOW_SECONDS = 7 * 86400  # Finestra per media e vendite/giorno
+KEEPALIVE_EXPIRY = 60  # Secondi di vita delle connessioni HTTP/2 inattive
+# Soglie dei flag
+SATURATED_LISTINGS = 10  # "saturo": piu annunci di cosi...
+SATURATED_SPD = 2.0  # ...e meno vendite/giorno di cosi
+FLIP_FACTOR = 0.8  # "flip": prezzo piu basso sotto l'80% della media
+UNDER_PCT = -20.0  # "sottovalutato": %diff sotto questa soglia
+OVER_PCT = 20.0  # "sopravvalutato": %diff sopra questa soglia
+WRITE_BUFFER = 1 << 20  # Buffer di scrittura del CSV
+MAX_CONCURRENCY = 32  # Richieste HTTP in volo contemporaneamente
+RATE_LIMIT_RPS = float(os.environ.get("FFXIV_RPS", "20"))  # Richieste/secondo per host
+RETRY_MAX = 5  # Tentativi per richiesta su 429/5xx
+RETRY_STATUS = frozenset({429, 500, 502, 503, 504})
+
+
+class RateLimiter:
+    """Token bucket: fino a `refill_rate` richieste/s con burst di `capacity`.
+
+    `observe()` legge gli header X-RateLimit-* / Retry-After della risposta: se il
+    server segnala quota esaurita il bucket va "in debito" e le richieste successive
+    attendono invece di ricevere 429.
+    """
+
+    def __init__(self, refill_rate: float, capacity: float | None = None) -> None:
+        self.refill_rate = refill_rate
+        self.capacity = capacity if capacity is not None else refill_rate
+        self.tokens = self.capacity
+        self._last = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._last) * self.refill_rate)
+        self._last = now
+
+    async def acquire(self) -> None:
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.refill_rate)
+
+    def observe(self, response: httpx.Response) -> None:
+        retry_after = response.headers.get("retry-after")
+        if response.status_code in RETRY_STATUS and retry_after and retry_after.isdigit():
+            self._refill()
+            self.tokens = min(self.tokens, -int(retry_after) * self.refill_rate)
+        elif response.headers.get("x-ratelimit-remaining") == "0":
+            self._refill()
+            self.tokens = min(self.tokens, 0.0)
+
+
+_SEM = asyncio.Semaphore(MAX_CONCURRENCY)
+_UNIVERSALIS_LIMITER = RateLimiter(RATE_LIMIT_RPS)
+_XIVAPI_LIMITER = RateLimiter(RATE_LIMIT_RPS)
+NAMES = NameMemo()
+
+
+def _make_client() -> httpx.AsyncClient:
+    """Client condiviso: riusa connessioni TLS/HTTP2 tra tutte le richieste.
+    Il transport ritenta da solo gli errori di connessione."""
+    transport = httpx.AsyncHTTPTransport(
+        retries=3,
+        http2=True,
+        limits=httpx.Limits(
+            max_connections=100, max_keepalive_connections=64, keepalive_expiry=KEEPALIVE_EXPIRY
+        ),
+    )
+    return httpx.AsyncClient(transport=transport, timeout=10)
+
+
+async def _limited_get(
+    client: httpx.AsyncClient, limiter: RateLimiter, url: str
+) -> httpx.Response:
+    """GET con concorrenza limitata e ritmo regolato dal token bucket dell'host"""
+    async with _SEM:
+        await limiter.acquire()
+        response = await client.get(url)
+    limiter.observe(response)
+    return response
+
+
+async def _get_with_retry(
+    client: httpx.AsyncClient, limiter: RateLimiter, url: str
+) -> httpx.Response:
+    """GET + raise_for_status, ritentato su 429/5xx con backoff esponenziale e jitter.
+    Con Retry-After l'attesa la impone gia il rate limiter (vedi `observe`)."""
+    for attempt in range(RETRY_MAX - 1):
+        response = await _limited_get(client, limiter, url)
+        if response.status_code not in RETRY_STATUS:
+            response.raise_for_status()
+            return response
+        if "retry-after" not in response.headers:
+            await asyncio.sleep(min(30.0, 0.5 * 2**attempt) + random.random() * 0.25)
+    # Ultimo tentativo: l'errore arriva al chiamante
+    response = await _limited_get(client, limiter, url)
+    response.raise_for_status()
+    return response
+
+
+class StagingStore:
+    """Staging su SQLite (WAL) dei dati grezzi, scritto batch per batch.
+
+    Se un'esecuzione si interrompe, la successiva ricarica gli item gia scaricati
+    (se non piu vecchi di STAGING_MAX_AGE) e riparte solo da quelli mancanti. Gli
+    item in errore non vengono salvati, cosi al riavvio si ritentano.
+    """
+
+    def __init__(self, path: str, world: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.world = world
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS raw (
+                world TEXT NOT NULL,
+                item_id INTEGER NOT NULL,
+                fetched_at INTEGER NOT NULL,
+                listing_prices BLOB NOT NULL,
+                sale_ts BLOB NOT NULL,
+                sale_prices BLOB NOT NULL,
+                PRIMARY KEY (world, item_id)
+            ) WITHOUT ROWID
+            """
+        )
+
+    def load(self) -> List[Dict[str, Any]]:
+        cursor = self._conn.execute(
+            "SELECT item_id, listing_prices, sale_ts, sale_prices FROM raw"
+            " WHERE world = ? AND fetched_at >= ?",
+            (self.world, int(time.time()) - STAGING_MAX_AGE),
+        )
+        return [
+            {
+                "item_id": item_id,
+                "listing_prices": np.frombuffer(listing_prices, np.float64),
+                "sale_ts": np.frombuffer(sale_ts, np.int64),
+                "sale_prices": np.frombuffer(sale_prices, np.float64),
+            }
+            for item_id, listing_prices, sale_ts, sale_prices in cursor
+        ]
+
+    def add(self, raw: List[Dict[str, Any]]) -> None:
+        now = int(time.time())
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO raw VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        self.world,
+                        r["item_id"],
+                        now,
+                        r["listing_prices"].tobytes(),
+                        r["sale_ts"].tobytes(),
+                        r["sale_prices"].tobytes(),
+                    )
+                    for r in raw
+                    if not r.get("error")
+                ],
+            )
+
+    def clear(self) -> None:
+        with self._conn:
+            self._conn.execute("DELETE FROM raw WHERE world = ?", (self.world,))
 
+    def close(self) -> None:
+        self._conn.close()
 
-async def get_marketable_items() -> List[int]:
+
+async def get_marketable_items(client: httpx.AsyncClient) -> List[int]:
     """Ottiene la lista completa degli item tradeable da Universalis"""
-    async with httpx.AsyncClient() as client:
-        response = await client.get(f"{UNIVERSALIS_BASE}/marketable")
-        response.raise_for_status()
-        return response.json()
+    response = await client.get(f"{UNIVERSALIS_BASE}/marketable")
+    response.raise_for_status()
+    return orjson.loads(response.content)
 
 
-async def get_item_name(item_id: int) -> str:
-    """Ottiene il nome dell'item da XIVAPI"""
+async def get_item_name(client: httpx.AsyncClient, item_id: int) -> str:
+    """Ottiene il nome dell'item (memo su disco, poi XIVAPI)"""
+    cached = NAMES.get(item_id)
+    if cached is not None:
+        return cached
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{XIVAPI_BASE}/item/{item_id}")
-            response.raise_for_status()
-            data = response.json()
-            return data.get("Name", f"Item_{item_id}")
+        response = await _get_with_retry(client, _XIVAPI_LIMITER, f"{XIVAPI_BASE}/item/{item_id}")
+        data = orjson.loads(response.content)
+        name = data.get("Name")
+        if not name:
+            return f"Item_{item_id}"
+        NAMES.put(item_id, name)
+        return name
     except Exception:
         return f"Item_{item_id}"
 
 
-async def get_market_data(item_id: int, world: str) -> Dict[str, Any]:
-    """Ottiene i dati di mercato per un item specifico"""
+async def get_names_bulk(client: httpx.AsyncClient, item_ids: List[int]) -> Dict[int, str]:
+    """Risolve molti nomi insieme: memo su disco, poi XIVAPI a blocchi di NAMES_BATCH
+    ID per richiesta; solo cio che resta ancora scoperto passa da `get_item_name`."""
+    names: Dict[int, str] = {}
+    misses: List[int] = []
+    for item_id in dict.fromkeys(item_ids):
+        cached = NAMES.get(item_id)
+        if cached is not None:
+            names[item_id] = cached
+        else:
+            misses.append(item_id)
+
+    async def _fetch_chunk(chunk: List[int]) -> None:
+        ids = ",".join(map(str, chunk))
+        url = f"{XIVAPI_BASE}/item?ids={ids}&columns=ID,Name&language=en&limit={len(chunk)}"
+        try:
+            response = await _get_with_retry(client, _XIVAPI_LIMITER, url)
+        except httpx.HTTPError:
+            return
+        for row in orjson.loads(response.content).get("Results") or []:
+            item_id, name = row.get("ID"), row.get("Name")
+            if isinstance(item_id, int) and name:
+                names[item_id] = name
+                NAMES.put(item_id, name)
+
+    await asyncio.gather(
+        *(_fetch_chunk(misses[i : i + NAMES_BATCH]) for i in range(0, len(misses), NAMES_BATCH))
+    )
+    leftovers = [item_id for item_id in misses if item_id not in names]
+    fetched = await tqdm_asyncio.gather(
+        *(get_item_name(client, item_id) for item_id in leftovers), desc="Nomi mancanti"
+    )
+    names.update(zip(leftovers, fetched))
+    return names
+
+
+async def get_market_data(client: httpx.AsyncClient, item_id: int, world: str) -> Dict[str, Any]:
+    """Scarica listings/storico di un item e ne tiene solo le colonne numeriche
+    (array compatti: le metriche si calcolano dopo, tutte insieme, in `compute_metrics`)"""
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{UNIVERSALIS_BASE}/v2/{world}/{item_id}")
-            response.raise_for_status()
-            data = response.json()
-
-            listings = data.get("listings", [])
-            history = data.get("recentHistory", [])
-
-            # Calcola metriche
-            lowest_price = min((listing["pricePerUnit"] for listing in listings), default=None)
-
-            # Prezzo medio degli ultimi 7 giorni (filtra per timestamp)
-            seven_days_ago = int((datetime.now(timezone.utc) - timedelta(days=7)).timestamp())
-            recent_sales = [
-                sale for sale in history if int(sale.get("timestamp", 0)) >= seven_days_ago
-            ]
-            avg_price = (
-                sum(sale["pricePerUnit"] for sale in recent_sales) / len(recent_sales)
-                if recent_sales
-                else None
-            )
+        response = await _get_with_retry(
+            client, _UNIVERSALIS_LIMITER, f"{UNIVERSALIS_BASE}/v2/{world}/{item_id}"
+        )
+        data = orjson.loads(response.content)
 
-            # Vendite giornaliere (ultimi 7 giorni)
-            sales_per_day = len(recent_sales) / 7.0 if recent_sales else 0.0
-
-            # Calcola %diff (variazione percentuale rispetto alla media)
-            price_diff_percent = None
-            if lowest_price is not None and avg_price is not None and avg_price > 0:
-                price_diff_percent = round(((lowest_price - avg_price) / avg_price) * 100, 2)
-
-            # Flags
-            flags = []
-            if len(listings) > 10 and sales_per_day < 2:
-                flags.append("saturo")
-            if (
-                lowest_price is not None
-                and avg_price is not None
-                and lowest_price < avg_price * 0.8
-            ):
-                flags.append("flip")
-            if price_diff_percent is not None and price_diff_percent < -20:
-                flags.append("sottovalutato")
-            if price_diff_percent is not None and price_diff_percent > 20:
-                flags.append("sopravvalutato")
-
-            return {
-                "item_id": item_id,
-                "lowest_price": lowest_price,
-                "avg_price_7d": round(avg_price, 2) if avg_price is not None else None,
-                "price_diff_percent": price_diff_percent,
-                "sales_per_day_7d": round(sales_per_day, 2),
-                "flags": ",".join(flags) if flags else "",
-                "listings_count": len(listings),
-                "history_count": len(history),
-            }
-    except Exception as e:
-        print(f"Errore per item {item_id}: {e}")
+        listings = data.get("listings", [])
+        history = data.get("recentHistory", [])
         return {
             "item_id": item_id,
-            "lowest_price": None,
-            "avg_price_7d": None,
-            "sales_per_day_7d": 0.0,
-            "flags": "error",
-            "listings_count": 0,
-            "history_count": 0,
+            "listing_prices": np.fromiter(
+                (listing["pricePerUnit"] for listing in listings), np.float64, len(listings)
+            ),
+            "sale_ts": np.fromiter(
+                (int(sale.get("timestamp", 0)) for sale in history), np.int64, len(history)
+            ),
+            "sale_prices": np.fromiter(
+                (sale["pricePerUnit"] for sale in history), np.float64, len(history)
+            ),
         }
+    except Exception as e:
+        print(f"Errore per item {item_id}: {e}")
+        return {"item_id": item_id, "error": True}
+
+
+def _error_row(item_id: int) -> Dict[str, Any]:
+    return {
+        "item_id": item_id,
+        "lowest_price": None,
+        "avg_price_7d": None,
+        "price_diff_percent": None,
+        "sales_per_day_7d": 0.0,
+        "flags": "error",
+        "listings_count": 0,
+        "history_count": 0,
+    }
+
+
+def compute_metrics(raw: List[Dict[str, Any]], since: int | None = None) -> List[Dict[str, Any]]:
+    """Calcola le metriche di tutti gli item in un solo passaggio vettoriale.
+
+    Listings e storico vengono concatenati in array piatti con l'indice dell'item
+    accanto; minimo, somma e conteggio per item escono da ufunc.at/bincount e i
+    flag da maschere booleane, senza loop Python per vendita.
+    """
+    ok = [r for r in raw if not r.get("error")]
+    n = len(ok)
+    if not n:
+        return [_error_row(r["item_id"]) for r in raw]
+
+    n_listings = np.fromiter((len(r["listing_prices"]) for r in ok), np.int64, n)
+    n_history = np.fromiter((len(r["sale_ts"]) for r in ok), np.int64, n)
+    empty = np.empty(0)
+
+    # Prezzo piu basso per item
+    lowest = np.full(n, np.inf)
+    np.minimum.at(
+        lowest,
+        np.repeat(np.arange(n), n_listings),
+        np.concatenate([r["listing_prices"] for r in ok] or [empty]),
+    )
+    has_listings = n_listings > 0
+
+    # Prezzo medio e vendite/giorno sugli ultimi 7 giorni (filtro per timestamp)
+    seven_days_ago = since if since is not None else int(time.time()) - WINDOW_SECONDS
+    sale_item = np.repeat(np.arange(n), n_history)
+    sale_ts = np.concatenate([r["sale_ts"] for r in ok] or [empty])
+    sale_prices = np.concatenate([r["sale_prices"] for r in ok] or [empty])
+    recent = sale_ts >= seven_days_ago
+    recent_count = np.bincount(sale_item[recent], minlength=n)
+    recent_sum = np.bincount(sale_item[recent], weights=sale_prices[recent], minlength=n)
+    has_avg = recent_count > 0
+    avg = np.divide(recent_sum, recent_count, out=np.full(n, np.nan), where=has_avg)
+    sales_per_day = recent_count / 7.0
+
+    # %diff rispetto alla media
+    has_diff = has_listings & has_avg & (avg > 0)
+    diff = np.divide((lowest - avg) * 100, avg, out=np.full(n, np.nan), where=has_diff)
+
+    # Flags (i NaN rendono False ogni confronto)
+    with np.errstate(invalid="ignore"):
+        flag_masks = (
+            ("saturo", (n_listings > SATURATED_LISTINGS) & (sales_per_day < SATURATED_SPD)),
+            ("flip", has_listings & has_avg & (lowest < avg * FLIP_FACTOR)),
+            ("sottovalutato", has_diff & (np.round(diff, 2) < UNDER_PCT)),
+            ("sopravvalutato", has_diff & (np.round(diff, 2) > OVER_PCT)),
+        )
 
+    rows: List[Dict[str, Any]] = []
+    i = 0
+    for r in raw:
+        if r.get("error"):
+            rows.append(_error_row(r["item_id"]))
+            continue
+        rows.append(
+            {
+                "item_id": r["item_id"],
+                "lowest_price": int(lowest[i]) if has_listings[i] else None,
+                "avg_price_7d": round(float(avg[i]), 2) if has_avg[i] else None,
+                "price_diff_percent": round(float(diff[i]), 2) if has_diff[i] else None,
+                "sales_per_day_7d": round(float(sales_per_day[i]), 2),
+                "flags": ",".join(name for name, mask in flag_masks if mask[i]),
+                "listings_count": int(n_listings[i]),
+                "history_count": int(n_history[i]),
+            }
+        )
+        i += 1
+    return rows
 
-async def process_batch(item_ids: List[int], world: str) -> List[Dict[str, Any]]:
-    """Processa un batch di item in parallelo"""
-    tasks = []
-    for item_id in item_ids:
-        task = get_market_data(item_id, world)
-        tasks.append(task)
 
-    results = await asyncio.gather(*tasks, return_exceptions=True)
+async def process_batch(
+    client: httpx.AsyncClient, item_ids: List[int], world: str
+) -> List[Dict[str, Any]]:
+    """Scarica un batch di item in parallelo (dati grezzi, vedi `compute_metrics`)"""
+    results = await asyncio.gather(
+        *(get_market_data(client, item_id, world) for item_id in item_ids),
+        return_exceptions=True,
+    )
+    return [result for result in results if isinstance(result, dict)]
 
-    # Filtra risultati validi
-    valid_results = []
-    for i, result in enumerate(results):
-        if isinstance(result, dict):
-            result["item_id"] = item_ids[i]
-            valid_results.append(result)
 
-    return valid_results
+# Colonne del CSV (intestazione Excel) e chiave del risultato che le alimenta
+CSV_COLUMNS = (
+    ("ID_Item", "item_id"),
+    ("Nome_Item", "item_name"),
+    ("Prezzo_Piu_Basso", "lowest_price"),
+    ("Prezzo_Medio_7g", "avg_price_7d"),
+    ("Diff_Percentuale", "price_diff_percent"),
+    ("Vendite_Giornaliere", "sales_per_day_7d"),
+    ("Flags", "flags"),
+    ("Numero_Annunci", "listings_count"),
+    ("Numero_Vendite", "history_count"),
+)
+CSV_HEADER = tuple(header for header, _ in CSV_COLUMNS)
+ROW_KEYS = tuple(key for _, key in CSV_COLUMNS)
+
+
+def to_excel_row(result: Dict[str, Any]) -> tuple[Any, ...]:
+    """Riga CSV posizionale (ordine di CSV_HEADER); i None diventano celle vuote"""
+    values = tuple(map(result.get, ROW_KEYS))
+    if None in values:
+        return tuple("" if v is None else v for v in values)
+    return values
 
 
 async def main():
     """Funzione principale"""
-    print("?? Inizio raccolta dataset FFXIV Market...")
-
-    # 1. Ottieni lista item tradeable
-    print("?? Ottenendo lista item tradeable...")
-    marketable_items = await get_marketable_items()
-    print(f"? Trovati {len(marketable_items)} item tradeable")
-
-    # 2. Processa in batch per evitare rate limiting
-    all_results = []
-
-    for i in tqdm(range(0, len(marketable_items), BATCH_SIZE), desc="Processando item"):
-        batch = marketable_items[i : i + BATCH_SIZE]
-        batch_results = await process_batch(batch, WORLD)
-        all_results.extend(batch_results)
-
-        # Pausa tra batch per rispettare rate limits
-        await asyncio.sleep(1)
-
-    # 3. Ottieni nomi degli item
-    print("??? Ottenendo nomi degli item...")
-    for result in tqdm(all_results, desc="Aggiungendo nomi"):
-        item_name = await get_item_name(result["item_id"])
-        result["item_name"] = item_name
-        await asyncio.sleep(0.1)  # Rate limiting per XIVAPI
-
-    # 4. Salva dataset con formato Excel-compatibile
-    print("?? Salvando dataset...")
-    fieldnames = [
-        "ID_Item",
-        "Nome_Item",
-        "Prezzo_Piu_Basso",
-        "Prezzo_Medio_7g",
-        "Diff_Percentuale",
-        "Vendite_Giornaliere",
-        "Flags",
-        "Numero_Annunci",
-        "Numero_Vendite",
-    ]
-
-    # Mappa i dati per Excel
-    excel_data = []
-    for result in all_results:
-        excel_data.append(
-            {
-                "ID_Item": result["item_id"],
-                "Nome_Item": result["item_name"],
-                "Prezzo_Piu_Basso": result["lowest_price"]
-                if result["lowest_price"] is not None
-                else "",
-                "Prezzo_Medio_7g": result["avg_price_7d"]
-                if result["avg_price_7d"] is not None
-                else "",
-                "Diff_Percentuale": result["price_diff_percent"]
-                if result["price_diff_percent"] is not None
-                else "",
-                "Vendite_Giornaliere": result["sales_per_day_7d"],
-                "Flags": result["flags"],
-                "Numero_Annunci": result["listings_count"],
-                "Numero_Vendite": result["history_count"],
-            }
+    async with _make_client() as client:
+        print("?? Inizio raccolta dataset FFXIV Market...")
+
+        # 1. Ottieni lista item tradeable
+        print("?? Ottenendo lista item tradeable...")
+        marketable_items = await get_marketable_items(client)
+        print(f"? Trovati {len(marketable_items)} item tradeable")
+
+        # 2. Nomi degli item in background (memo, poi richieste XIVAPI a blocchi):
+        # XIVAPI e Universalis hanno rate limiter separati, quindi le due fasi si
+        # sovrappongono invece di sommarsi
+        names_task = asyncio.create_task(get_names_bulk(client, marketable_items))
+
+        # 3. Processa in batch (il ritmo lo regola il rate limiter, non pause fisse);
+        # ogni batch finisce nello staging, da cui si riprende dopo un'interruzione
+        staging = StagingStore(STAGING_FILE, WORLD)
+        raw_results = staging.load()
+        done = {r["item_id"] for r in raw_results}
+        todo = [item_id for item_id in marketable_items if item_id not in done]
+        if done:
+            print(f"?? Ripresa: {len(done)} item gia in staging, {len(todo)} da scaricare")
+
+        for i in tqdm(range(0, len(todo), BATCH_SIZE), desc="Processando item"):
+            batch = todo[i : i + BATCH_SIZE]
+            batch_results = await process_batch(client, batch, WORLD)
+            staging.add(batch_results)
+            raw_results.extend(batch_results)
+
+        # Ordine originale della lista tradeable
+        position = {item_id: idx for idx, item_id in enumerate(marketable_items)}
+        raw_results = [r for r in raw_results if r["item_id"] in position]
+        raw_results.sort(key=lambda r: position[r["item_id"]])
+        # Calcolo metriche su un thread: NumPy rilascia il GIL nei kernel, quindi il
+        # loop continua a servire le richieste dei nomi ancora in corso
+        all_results = await asyncio.to_thread(compute_metrics, raw_results)
+
+        print("??? Ottenendo nomi degli item...")
+        names = await names_task
+        for result in all_results:
+            result["item_name"] = names[result["item_id"]]
+        NAMES.save()
+
+        # 4. Salva dataset con formato Excel-compatibile
+        print("?? Salvando dataset...")
+
+        # Salva con encoding UTF-8 BOM per Excel: righe mappate al volo (nessuna
+        # copia intera del dataset) dentro un buffer da 1 MiB
+        with open(
+            OUTPUT_FILE, "w", newline="", encoding="utf-8-sig", buffering=WRITE_BUFFER
+        ) as csvfile:
+            writer = csv.writer(csvfile, delimiter=";")
+            writer.writerow(CSV_HEADER)
+            writer.writerows(map(to_excel_row, all_results))
+
+        print(f"? Dataset salvato in {OUTPUT_FILE}")
+        # Dataset completo: lo staging non serve piu
+        staging.clear()
+        staging.close()
+        print(f"?? Totale item processati: {len(all_results)}")
+
+        # Statistiche rapide
+        with_data = [r for r in all_results if r["lowest_price"] is not None]
+        print(f"?? Item con dati di mercato: {len(with_data)}")
+        print(
+            f"?? Item con opportunita flip: {len([r for r in with_data if 'flip' in r['flags']])}"
+        )
+        print(
+            f"?? Item con mercato saturo: {len([r for r in with_data if 'saturo' in r['flags']])}"
         )
-
-    # Salva con encoding UTF-8 BOM per Excel
-    with open(OUTPUT_FILE, "w", newline="", encoding="utf-8-sig") as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames, delimiter=";")
-        writer.writeheader()
-        writer.writerows(excel_data)
-
-    print(f"? Dataset salvato in {OUTPUT_FILE}")
-    print(f"?? Totale item processati: {len(all_results)}")
-
-    # Statistiche rapide
-    with_data = [r for r in all_results if r["lowest_price"] is not None]
-    print(f"?? Item con dati di mercato: {len(with_data)}")
-    print(
-        f"?? Item con opportunita flip: {len([r for r in with_data if 'flip' in r['flags']])}"
-    )
-    print(
-        f"?? Item con mercato saturo: {len([r for r in with_data if 'saturo' in r['flags']])}"
-    )
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run_async(main())
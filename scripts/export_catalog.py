@@ -1,46 +1,92 @@
 from __future__ import annotations
 
 import argparse
-import asyncio
 import csv
-import json
+from collections.abc import AsyncIterator
 from pathlib import Path
-from typing import Any
+
+import orjson
 
 from broker.db.cache import get_redis
 
+from aio_run import run_async
+
+HSCAN_COUNT = 10_000
+
 
-async def fetch_all() -> dict[str, str]:
+async def iter_names(count: int = HSCAN_COUNT) -> AsyncIterator[tuple[str, str]]:
+    """Stream the id->name catalog with HSCAN instead of one HGETALL reply.
+
+    HSCAN can return a field twice if the hash is rehashed mid-scan, so ids already
+    yielded are skipped.
+    """
     r = get_redis()
-    # Use HGETALL for a consistent snapshot instead of iterative HSCAN
-    data = await r.hgetall("x:names")
-    return {str(k): str(v) for k, v in data.items()}
+    seen: set[str] = set()
+    async for k, v in r.hscan_iter("x:names", count=count):
+        if k in seen:
+            continue
+        seen.add(k)
+        yield k, v
+
+
+async def write_json(path: str) -> int:
+    # Same layout as orjson OPT_INDENT_2 on the whole dict, framed by hand so
+    # entries are written as they arrive
+    n = 0
+    with open(path, "wb") as f:
+        f.write(b"{")
+        async for k, v in iter_names():
+            f.write(b",\n  " if n else b"\n  ")
+            f.write(orjson.dumps(k) + b": " + orjson.dumps(v))
+            n += 1
+        f.write(b"\n}" if n else b"}")
+    return n
+
+
+async def write_ndjson(path: str) -> int:
+    n = 0
+    with open(path, "wb") as f:
+        async for k, v in iter_names():
+            f.write(orjson.dumps({"item_id": int(k), "name": v}) + b"\n")
+            n += 1
+    return n
+
+
+async def write_csv(path: str) -> int:
+    n = 0
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["item_id", "name"])
+        async for k, v in iter_names():
+            w.writerow([k, v])
+            n += 1
+    return n
 
 
 async def main() -> None:
     ap = argparse.ArgumentParser(description="Export id->name catalog from Redis")
-    ap.add_argument("--format", choices=["json", "csv"], default="json")
+    ap.add_argument("--format", choices=["json", "ndjson", "csv"], default="json")
     ap.add_argument("--out", default="data/catalog_names_en.json")
     args = ap.parse_args()
 
-    data = await fetch_all()
     Path(args.out).parent.mkdir(parents=True, exist_ok=True)
 
     if args.format == "json":
-        with open(args.out, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        print(f"Wrote JSON: {args.out} ({len(data)} entries)")
+        n = await write_json(args.out)
+        print(f"Wrote JSON: {args.out} ({n} entries)")
+    elif args.format == "ndjson":
+        p = args.out
+        if not p.lower().endswith(".ndjson"):
+            p += ".ndjson"
+        n = await write_ndjson(p)
+        print(f"Wrote NDJSON: {p} ({n} entries)")
     else:
         p = args.out
         if not p.lower().endswith(".csv"):
             p += ".csv"
-        with open(p, "w", encoding="utf-8", newline="") as f:
-            w = csv.writer(f)
-            w.writerow(["item_id", "name"])
-            for k, v in data.items():
-                w.writerow([k, v])
-        print(f"Wrote CSV: {p} ({len(data)} entries)")
+        n = await write_csv(p)
+        print(f"Wrote CSV: {p} ({n} entries)")
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run_async(main())
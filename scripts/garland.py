@@ -0,0 +1,56 @@
+"""
+Lookup dei nomi item su GarlandTools, condiviso dagli script catalogo.
+
+Fallback per gli ID che XIVAPI non risolve (build_catalog, list_missing_names).
+"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Any
+
+import httpx
+import orjson
+
+
+def _garland_name(data: Any) -> str | None:
+    name = None
+    if isinstance(data, dict):
+        d = data["item"] if isinstance(data.get("item"), dict) else data
+        name = d.get("name") or d.get("n") or d.get("en") or d.get("Name")
+    if isinstance(name, str) and name.strip():
+        return name
+    return None
+
+
+async def _garland_try(client: httpx.AsyncClient, url: str) -> str | None:
+    try:
+        r = await client.get(url)
+        if r.status_code != 200:
+            return None
+        return _garland_name(orjson.loads(r.content))
+    except Exception:
+        return None
+
+
+async def garland_item_name(item_id: int, client: httpx.AsyncClient | None = None) -> str | None:
+    """Probe the Garland endpoints concurrently; the first non-empty name wins and
+    the slower probes are cancelled."""
+    if client is None:
+        async with httpx.AsyncClient(timeout=10) as own:
+            return await garland_item_name(item_id, own)
+    endpoints = [
+        f"https://www.garlandtools.org/api/get.php?type=item&id={item_id}&lang=en",
+        f"https://www.garlandtools.org/db/doc/item/en/3/{item_id}.json",
+        f"https://www.garlandtools.org/db/doc/item/en/2/{item_id}.json",
+    ]
+    tasks = [asyncio.create_task(_garland_try(client, url)) for url in endpoints]
+    try:
+        for fut in asyncio.as_completed(tasks):
+            name = await fut
+            if name:
+                return name
+        return None
+    finally:
+        for t in tasks:
+            t.cancel()
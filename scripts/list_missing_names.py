@@ -2,49 +2,21 @@ from __future__ import annotations
 
 import argparse
 import asyncio
-from typing import Any
 
-from broker.db.cache import get_redis, ns, get_json
-from broker.clients.xivapi import get_item_name
+from broker.clients.universalis import cached_marketable_ids
+from broker.db.cache import get_redis
+from broker.clients.xivapi import get_item_names
 import httpx
 
+from aio_run import run_async
+from garland import garland_item_name
 
-async def garland_item_name(item_id: int) -> str | None:
-    endpoints = [
-        f"https://www.garlandtools.org/api/get.php?type=item&id={item_id}&lang=en",
-        f"https://www.garlandtools.org/db/doc/item/en/3/{item_id}.json",
-        f"https://www.garlandtools.org/db/doc/item/en/2/{item_id}.json",
-    ]
-    async with httpx.AsyncClient(timeout=10) as client:
-        for url in endpoints:
-            try:
-                r = await client.get(url)
-                if r.status_code != 200:
-                    continue
-                data = r.json()
-                name = None
-                if isinstance(data, dict):
-                    if isinstance(data.get("item"), dict):
-                        d = data["item"]
-                        name = (
-                            d.get("name") or d.get("n") or d.get("en") or d.get("Name")
-                        )
-                    else:
-                        name = (
-                            data.get("name") or data.get("n") or data.get("en") or data.get("Name")
-                        )
-                if isinstance(name, str) and name.strip():
-                    return name
-            except Exception:
-                continue
-    return None
+FILL_CONCURRENCY = 16
 
 
 async def list_missing(limit: int, try_fill: bool, use_garland: bool) -> list[int]:
     # Load universe of marketable IDs
-    ids_any: Any = await get_json(ns("u", "marketable"))
-    ids = [int(x) for x in (ids_any or [])]
-    ids_set = set(ids)
+    ids_set = set(await cached_marketable_ids() or ())
     # Load keys already named
     r = get_redis()
     named_keys = await r.hkeys("x:names")
@@ -52,25 +24,30 @@ async def list_missing(limit: int, try_fill: bool, use_garland: bool) -> list[in
     missing = sorted(ids_set - named)
 
     if try_fill and missing:
-        # Try to fill a small batch to heal gaps
+        # Try to fill a small batch to heal gaps: one bulk XIVAPI resolution, then
+        # Garland for what is still unnamed, in parallel; one HSET for everything
         tgt = missing[: min(limit, 200)]
-        for iid in tgt:
-            name = None
-            try:
-                name = await get_item_name(iid)
-            except Exception:
-                name = None
-            if name is None and use_garland:
-                try:
-                    name = await garland_item_name(iid)
-                except Exception:
-                    name = None
-            if name:
-                await r.hset("x:names", str(iid), name)
-        # Recompute
-        named_keys = await r.hkeys("x:names")
-        named = {int(k) for k in named_keys}
-        missing = sorted(ids_set - named)
+        try:
+            names = await get_item_names(tgt, concurrency=FILL_CONCURRENCY)
+        except Exception:
+            names = [None] * len(tgt)
+        found = {iid: name for iid, name in zip(tgt, names) if name}
+        if use_garland:
+            sem = asyncio.Semaphore(FILL_CONCURRENCY)
+            async with httpx.AsyncClient(timeout=10, http2=True) as client:
+
+                async def _garland(iid: int) -> tuple[int, str | None]:
+                    async with sem:
+                        try:
+                            return iid, await garland_item_name(iid, client)
+                        except Exception:
+                            return iid, None
+
+                pairs = await asyncio.gather(*(_garland(i) for i in tgt if i not in found))
+            found.update((iid, name) for iid, name in pairs if name)
+        if found:
+            await r.hset("x:names", mapping={str(k): v for k, v in found.items()})
+        missing = [iid for iid in missing if iid not in found]
 
     return missing
 
@@ -82,7 +59,7 @@ def main() -> None:
     ap.add_argument("--use-garland", action="store_true", help="Use GarlandTools fallback for missing names")
     args = ap.parse_args()
 
-    missing = asyncio.run(list_missing(args.limit, args.fill, args.use_garland))
+    missing = run_async(list_missing(args.limit, args.fill, args.use_garland))
     print(f"Missing count: {len(missing)}")
     print("Sample:", missing[: args.limit])
 
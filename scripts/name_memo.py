@@ -0,0 +1,48 @@
+"""
+Memo id -> nome item condiviso dagli script dataset, persistito su disco.
+
+Usa lo stesso file JSON prodotto da export_catalog.py, cosi dopo il primo giro
+le lookup su XIVAPI diventano letture da dizionario.
+"""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+import orjson
+
+NAMES_FILE = os.environ.get("FFXIV_NAMES_FILE", "data/catalog_names_en.json")
+
+
+class NameMemo:
+    """Dizionario id -> nome caricato all'avvio; `save()` riscrive solo se ci sono novita"""
+
+    def __init__(self, path: str = NAMES_FILE) -> None:
+        self.path = Path(path)
+        try:
+            with open(self.path, "rb") as f:
+                self._names: dict[str, str] = orjson.loads(f.read())
+        except (OSError, orjson.JSONDecodeError):
+            self._names = {}
+        self._dirty = False
+
+    def get(self, item_id: int) -> str | None:
+        return self._names.get(str(item_id))
+
+    def put(self, item_id: int, name: str) -> None:
+        key = str(item_id)
+        if self._names.get(key) != name:
+            self._names[key] = name
+            self._dirty = True
+
+    def save(self) -> None:
+        if not self._dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(orjson.dumps(self._names, option=orjson.OPT_INDENT_2))
+        # Replace atomico: un'interruzione non lascia il catalogo troncato
+        os.replace(tmp, self.path)
+        self._dirty = False
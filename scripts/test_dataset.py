@@ -5,12 +5,16 @@ Script di test per validare la raccolta dataset con un subset limitato
 
 import asyncio
 import csv
-from datetime import datetime, timedelta, timezone
-from typing import List
+import time
+from typing import Any, Dict, List
 
 import httpx
+import orjson
 import os
 
+from aio_run import run_async
+from name_memo import NameMemo
+
 # Configurazione test
 UNIVERSALIS_BASE = "https://universalis.app/api"
 XIVAPI_BASE = "https://xivapi.com"
@@ -18,81 +22,99 @@ XIVAPI_BASE = "https://xivapi.com"
 WORLD = os.environ.get("FFXIV_WORLD", "Phoenix")
 # TEST_ITEMS sarà popolato dinamicamente dalla lista tradeable
 OUTPUT_FILE = "data/test_dataset.csv"
+MAX_CONCURRENCY = 8  # Item processati in parallelo
+WINDOW_SECONDS = 7 * 86400  # Finestra per media e vendite/giorno
+KEEPALIVE_EXPIRY = 60  # Secondi di vita delle connessioni HTTP/2 inattive
+# Soglie dei flag
+SATURATED_LISTINGS = 10  # "saturo": piu annunci di cosi...
+SATURATED_SPD = 2.0  # ...e meno vendite/giorno di cosi
+FLIP_FACTOR = 0.8  # "flip": prezzo piu basso sotto l'80% della media
+UNDER_PCT = -20.0  # "sottovalutato": %diff sotto questa soglia
+OVER_PCT = 20.0  # "sopravvalutato": %diff sopra questa soglia
+NAMES = NameMemo()
+
 
+def _make_client() -> httpx.AsyncClient:
+    """Client condiviso: riusa connessioni TLS/HTTP2 tra tutte le richieste"""
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=100, max_keepalive_connections=64, keepalive_expiry=KEEPALIVE_EXPIRY
+        ),
+        http2=True,
+        timeout=10,
+    )
 
-async def get_item_name(item_id: int) -> str:
-    """Ottiene il nome dell'item da XIVAPI"""
+
+async def get_item_name(client: httpx.AsyncClient, item_id: int) -> str:
+    """Ottiene il nome dell'item (memo su disco, poi XIVAPI)"""
+    cached = NAMES.get(item_id)
+    if cached is not None:
+        return cached
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{XIVAPI_BASE}/item/{item_id}")
-            response.raise_for_status()
-            data = response.json()
-            name = data.get("Name", "")
-            if not name or name.strip() == "":
-                return f"Item_{item_id}_NoName"
-            return name
+        response = await client.get(f"{XIVAPI_BASE}/item/{item_id}")
+        response.raise_for_status()
+        data = orjson.loads(response.content)
+        name = data.get("Name", "")
+        if not name or name.strip() == "":
+            return f"Item_{item_id}_NoName"
+        NAMES.put(item_id, name)
+        return name
     except Exception:
         return f"Item_{item_id}_NotFound"
 
 
-async def get_market_data(item_id: int, world: str) -> dict:
-    """Ottiene i dati di mercato per un item specifico"""
+async def get_market_data(
+    client: httpx.AsyncClient, item_id: int, world: str, seven_days_ago: int
+) -> dict:
+    """Ottiene i dati di mercato per un item specifico (vendite da `seven_days_ago` in poi)"""
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{UNIVERSALIS_BASE}/v2/{world}/{item_id}")
-            response.raise_for_status()
-            data = response.json()
-            
-            listings = data.get("listings", [])
-            history = data.get("recentHistory", [])
-            
-            # Calcola metriche
-            lowest_price = min((listing["pricePerUnit"] for listing in listings), default=None)
+        response = await client.get(f"{UNIVERSALIS_BASE}/v2/{world}/{item_id}")
+        response.raise_for_status()
+        data = orjson.loads(response.content)
             
-            # Prezzo medio degli ultimi 7 giorni (filtra per timestamp)
-            seven_days_ago = int((datetime.now(timezone.utc) - timedelta(days=7)).timestamp())
-            recent_sales = [
-                sale for sale in history if int(sale.get("timestamp", 0)) >= seven_days_ago
-            ]
-            avg_price = (
-                sum(sale["pricePerUnit"] for sale in recent_sales) / len(recent_sales)
-                if recent_sales
-                else None
-            )
+        listings = data.get("listings", [])
+        history = data.get("recentHistory", [])
             
-            # Vendite giornaliere (ultimi 7 giorni)
-            sales_per_day = len(recent_sales) / 7.0 if recent_sales else 0.0
+        # Calcola metriche
+        lowest_price = min((listing["pricePerUnit"] for listing in listings), default=None)
             
-            # Calcola %diff (variazione percentuale rispetto alla media)
-            price_diff_percent = None
-            if lowest_price is not None and avg_price is not None and avg_price > 0:
-                price_diff_percent = round(((lowest_price - avg_price) / avg_price) * 100, 2)
+        # Prezzo medio e vendite degli ultimi 7 giorni: un solo passaggio sullo storico
+        recent_total = 0
+        recent_count = 0
+        for sale in history:
+            if int(sale.get("timestamp", 0)) >= seven_days_ago:
+                recent_total += sale["pricePerUnit"]
+                recent_count += 1
+        avg_price = recent_total / recent_count if recent_count else None
+
+        # Vendite giornaliere (ultimi 7 giorni)
+        sales_per_day = recent_count / 7.0
             
-            # Flags
-            flags = []
-            if len(listings) > 10 and sales_per_day < 2:
-                flags.append("saturo")
-            if (
-                lowest_price is not None
-                and avg_price is not None
-                and lowest_price < avg_price * 0.8
-            ):
+        # Flags e %diff (variazione percentuale rispetto alla media)
+        flags = []
+        if len(listings) > SATURATED_LISTINGS and sales_per_day < SATURATED_SPD:
+            flags.append("saturo")
+        price_diff_percent = None
+        if lowest_price is not None and avg_price is not None:
+            if lowest_price < avg_price * FLIP_FACTOR:
                 flags.append("flip")
-            if price_diff_percent is not None and price_diff_percent < -20:
-                flags.append("sottovalutato")
-            if price_diff_percent is not None and price_diff_percent > 20:
-                flags.append("sopravvalutato")
+            if avg_price > 0:
+                price_diff_percent = round(((lowest_price - avg_price) / avg_price) * 100, 2)
+                if price_diff_percent < UNDER_PCT:
+                    flags.append("sottovalutato")
+                elif price_diff_percent > OVER_PCT:
+                    flags.append("sopravvalutato")
             
-            return {
-                "item_id": item_id,
-                "lowest_price": lowest_price,
-                "avg_price_7d": round(avg_price, 2) if avg_price is not None else None,
-                "price_diff_percent": price_diff_percent,
-                "sales_per_day_7d": round(sales_per_day, 2),
-                "flags": ",".join(flags) if flags else "",
-                "listings_count": len(listings),
-                "history_count": len(history)
-            }
+        return {
+            "item_id": item_id,
+            "lowest_price": lowest_price,
+            "avg_price_7d": round(avg_price, 2) if avg_price is not None else None,
+            "price_diff_percent": price_diff_percent,
+            "sales_per_day_7d": round(sales_per_day, 2),
+            "flags": ",".join(flags) if flags else "",
+            "listings_count": len(listings),
+            "history_count": len(history)
+        }
     except Exception as e:
         print(f"❌ Errore per item {item_id}: {e}")
         return {
@@ -106,81 +128,85 @@ async def get_market_data(item_id: int, world: str) -> dict:
         }
 
 
-async def get_marketable_items() -> List[int]:
+async def get_marketable_items(client: httpx.AsyncClient) -> List[int]:
     """Ottiene la lista degli item tradeable da Universalis"""
-    async with httpx.AsyncClient() as client:
-        response = await client.get(f"{UNIVERSALIS_BASE}/marketable")
-        response.raise_for_status()
-        return response.json()
+    response = await client.get(f"{UNIVERSALIS_BASE}/marketable")
+    response.raise_for_status()
+    return orjson.loads(response.content)
+
+
+# Colonne del CSV (intestazione Excel) e chiave del risultato che le alimenta
+CSV_COLUMNS = (
+    ("ID_Item", "item_id"),
+    ("Nome_Item", "item_name"),
+    ("Prezzo_Piu_Basso", "lowest_price"),
+    ("Prezzo_Medio_7g", "avg_price_7d"),
+    ("Diff_Percentuale", "price_diff_percent"),
+    ("Vendite_Giornaliere", "sales_per_day_7d"),
+    ("Flags", "flags"),
+    ("Numero_Annunci", "listings_count"),
+    ("Numero_Vendite", "history_count"),
+)
+CSV_HEADER = tuple(header for header, _ in CSV_COLUMNS)
+ROW_KEYS = tuple(key for _, key in CSV_COLUMNS)
+
+
+def to_excel_row(result: Dict[str, Any]) -> tuple[Any, ...]:
+    """Riga CSV posizionale (ordine di CSV_HEADER); i None diventano celle vuote"""
+    values = tuple(map(result.get, ROW_KEYS))
+    if None in values:
+        return tuple("" if v is None else v for v in values)
+    return values
 
 
 async def main():
     """Test con subset limitato di item realmente tradeable"""
-    print("🧪 Test raccolta dataset FFXIV Market...")
-    
-    # Ottieni lista item tradeable
-    print("📋 Ottenendo lista item tradeable...")
-    marketable_items = await get_marketable_items()
-    print(f"✅ Trovati {len(marketable_items)} item tradeable")
-    
-    # Seleziona un subset per il test
-    test_items = marketable_items[:8]  # Primi 8 item tradeable
-    print(f"📋 Testando {len(test_items)} item: {test_items}")
-    
-    results = []
-    
-    for item_id in test_items:
-        print(f"🔄 Processando item {item_id}...")
-        
-        # Ottieni dati di mercato
-        market_data = await get_market_data(item_id, WORLD)
-        
-        # Ottieni nome item
-        item_name = await get_item_name(item_id)
-        market_data["item_name"] = item_name
-        
-        results.append(market_data)
-        
-        # Pausa tra richieste
-        await asyncio.sleep(0.5)
-        
-        print(f"✅ Item {item_id} ({item_name}): {market_data['lowest_price']} gil, flags: {market_data['flags']}")
-    
-    # Salva risultati con formato Excel-compatibile
-    fieldnames = [
-        "ID_Item", "Nome_Item", "Prezzo_Piu_Basso", "Prezzo_Medio_7g", "Diff_Percentuale",
-        "Vendite_Giornaliere", "Flags", "Numero_Annunci", "Numero_Vendite"
-    ]
-    
-    # Mappa i dati per Excel
-    excel_data = []
-    for result in results:
-        excel_data.append({
-            "ID_Item": result["item_id"],
-            "Nome_Item": result["item_name"],
-            "Prezzo_Piu_Basso": result["lowest_price"] if result["lowest_price"] is not None else "",
-            "Prezzo_Medio_7g": result["avg_price_7d"] if result["avg_price_7d"] is not None else "",
-            "Diff_Percentuale": result["price_diff_percent"] if result["price_diff_percent"] is not None else "",
-            "Vendite_Giornaliere": result["sales_per_day_7d"],
-            "Flags": result["flags"],
-            "Numero_Annunci": result["listings_count"],
-            "Numero_Vendite": result["history_count"]
-        })
-    
-    # Salva con encoding UTF-8 BOM per Excel
-    with open(OUTPUT_FILE, 'w', newline='', encoding='utf-8-sig') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames, delimiter=';')
-        writer.writeheader()
-        writer.writerows(excel_data)
-    
-    print(f"\n✅ Test completato! Risultati salvati in {OUTPUT_FILE}")
-    
-    # Statistiche
-    with_data = [r for r in results if r["lowest_price"] is not None]
-    print(f"📊 Item con dati: {len(with_data)}/{len(results)}")
-    print(f"💰 Item con flip: {len([r for r in with_data if 'flip' in r['flags']])}")
-    print(f"⚠️ Item saturi: {len([r for r in with_data if 'saturo' in r['flags']])}")
+    async with _make_client() as client:
+        print("🧪 Test raccolta dataset FFXIV Market...")
+
+        # Ottieni lista item tradeable
+        print("📋 Ottenendo lista item tradeable...")
+        marketable_items = await get_marketable_items(client)
+        print(f"✅ Trovati {len(marketable_items)} item tradeable")
+
+        # Seleziona un subset per il test
+        test_items = marketable_items[:8]  # Primi 8 item tradeable
+        print(f"📋 Testando {len(test_items)} item: {test_items}")
+
+        # Inizio finestra calcolato una volta per tutta l'esecuzione
+        seven_days_ago = int(time.time()) - WINDOW_SECONDS
+        sem = asyncio.Semaphore(MAX_CONCURRENCY)
+
+        async def process_item(item_id: int) -> Dict[str, Any]:
+            async with sem:
+                print(f"🔄 Processando item {item_id}...")
+                # Dati di mercato e nome in parallelo (host diversi)
+                market_data, item_name = await asyncio.gather(
+                    get_market_data(client, item_id, WORLD, seven_days_ago),
+                    get_item_name(client, item_id),
+                )
+            market_data["item_name"] = item_name
+            print(f"✅ Item {item_id} ({item_name}): {market_data['lowest_price']} gil, flags: {market_data['flags']}")
+            return market_data
+
+        results = await asyncio.gather(*(process_item(item_id) for item_id in test_items))
+
+        NAMES.save()
+
+        # Salva risultati con formato Excel-compatibile (UTF-8 BOM)
+        with open(OUTPUT_FILE, 'w', newline='', encoding='utf-8-sig') as csvfile:
+            writer = csv.writer(csvfile, delimiter=';')
+            writer.writerow(CSV_HEADER)
+            writer.writerows(map(to_excel_row, results))
+
+        print(f"\n✅ Test completato! Risultati salvati in {OUTPUT_FILE}")
+
+        # Statistiche
+        with_data = [r for r in results if r["lowest_price"] is not None]
+        print(f"📊 Item con dati: {len(with_data)}/{len(results)}")
+        print(f"💰 Item con flip: {len([r for r in with_data if 'flip' in r['flags']])}")
+        print(f"⚠️ Item saturi: {len([r for r in with_data if 'saturo' in r['flags']])}")
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run_async(main())
@@ -1,8 +1,9 @@
 from __future__ import annotations
 
 import os
-from collections.abc import Iterator
+from collections.abc import Callable, Iterator
 
+import httpx
 import pytest
 from broker.api.main import create_app
 from fastapi.testclient import TestClient
@@ -15,8 +16,31 @@ def _env() -> Iterator[None]:
     yield
 
 
-@pytest.fixture()
+@pytest.fixture(scope="module")
 def client() -> Iterator[TestClient]:
+    # One app (and lifespan) per test module: route dependencies are patched per test
+    # with the function-scoped `monkeypatch`, which the shared app picks up at call time
     app = create_app()
     with TestClient(app) as c:
         yield c
+
+
+MockHandler = Callable[[httpx.Request], httpx.Response]
+
+
+@pytest.fixture()
+def universalis_client(
+    monkeypatch: pytest.MonkeyPatch,
+) -> Callable[[MockHandler], httpx.AsyncClient]:
+    """Install a real AsyncClient backed by httpx.MockTransport as the shared
+    Universalis client; requests are routed to `handler` (paths relative to the API root)."""
+    from broker.clients import universalis as u
+
+    def _install(handler: MockHandler) -> httpx.AsyncClient:
+        client = httpx.AsyncClient(
+            base_url="https://universalis.test", transport=httpx.MockTransport(handler)
+        )
+        monkeypatch.setattr(u, "_CLIENT", client)
+        return client
+
+    return _install
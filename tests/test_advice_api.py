@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import pytest
 from fastapi.testclient import TestClient
 
 STATUS_OK = 200
@@ -11,3 +12,80 @@ def test_healthz(client: TestClient) -> None:
     data = r.json()
     assert data["status"] == "ok"
     assert "version" in data
+
+
+def test_request_id_header(client: TestClient) -> None:
+    r = client.get("/healthz", headers={"X-Request-ID": "abc123"})
+    assert r.headers["X-Request-ID"] == "abc123"
+    r = client.get("/healthz")
+    assert r.headers.get("X-Request-ID")
+
+
+def test_cors_only_for_allowed_origin(client: TestClient) -> None:
+    r = client.get("/healthz")
+    assert "access-control-allow-origin" not in r.headers
+    r = client.get("/healthz", headers={"Origin": "http://localhost:8000"})
+    assert r.headers["access-control-allow-origin"] == "http://localhost:8000"
+    r = client.get("/healthz", headers={"Origin": "http://evil.example"})
+    assert "access-control-allow-origin" not in r.headers
+
+
+def test_static_assets_cached(client: TestClient) -> None:
+    page = client.get("/dashboard/")
+    assert "/static/css/main.css?v=" in page.text
+    r = client.get("/static/css/main.css")
+    assert r.status_code == STATUS_OK
+    assert "immutable" in r.headers["Cache-Control"]
+    r2 = client.get("/static/css/main.css", headers={"If-None-Match": r.headers["ETag"]})
+    assert r2.status_code == 304
+    assert client.get("/static/missing.css").status_code == 404
+
+
+def test_advice_returns_429_when_concurrency_cap_reached(
+    client: TestClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    from broker.api import limiter
+
+    async def _full(keys: list[str], args: list[object]) -> int:
+        return 0
+
+    class _FullRedis:
+        def register_script(self, script: str) -> object:
+            return _full
+
+    monkeypatch.setattr(limiter, "get_redis", lambda: _FullRedis())
+    r = client.get("/advice", params={"world": "Phoenix"})
+    assert r.status_code == 429
+    assert r.headers.get("retry-after") == "1"
+    # The export calls the advice computation directly: it shares the same cap
+    r = client.get("/export/excel/advice", params={"world": "Phoenix"})
+    assert r.status_code == 429
+
+
+def test_export_excel_reuses_cached_workbook(
+    client: TestClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    from broker.api.routes import export
+
+    store: dict[str, bytes] = {}
+    calls = {"advice": 0}
+
+    async def _get_bytes(key: str) -> bytes | None:
+        return store.get(key)
+
+    async def _set_bytes(key: str, value: bytes, ttl: int | None = None) -> None:
+        store[key] = value
+
+    async def _advice(**kwargs: object) -> dict[str, object]:
+        calls["advice"] += 1
+        return {"items": [{"item_id": 1, "name": "Foo", "roi": 0.2, "flags": []}]}
+
+    monkeypatch.setattr(export, "get_bytes", _get_bytes)
+    monkeypatch.setattr(export, "set_bytes", _set_bytes)
+    monkeypatch.setattr(export, "advice_endpoint", _advice)
+
+    first = client.get("/export/excel/advice", params={"world": "Phoenix"})
+    second = client.get("/export/excel/advice", params={"world": "Phoenix"})
+    assert first.status_code == 200 and first.content[:2] == b"PK"
+    assert second.content == first.content
+    assert calls["advice"] == 1
@@ -44,11 +44,11 @@ async def test_advice_uses_batched_market(client: TestClient, monkeypatch: pytes
                 )
         return out
 
-    async def _get_name(iid: int) -> str:
-        return f"Item {iid}"
+    async def _get_names(ids: list[int], concurrency: int = 10) -> list[str | None]:
+        return [f"Item {iid}" for iid in ids]
 
     monkeypatch.setattr(adv, "get_items_world", _get_items_world)
-    monkeypatch.setattr(adv, "get_item_name", _get_name)
+    monkeypatch.setattr(adv, "get_item_names", _get_names)
 
     r = client.get("/advice", params={"world": "Phoenix", "limit": 2, "max_candidates": 10})
     assert r.status_code == 200
@@ -57,3 +57,63 @@ async def test_advice_uses_batched_market(client: TestClient, monkeypatch: pytes
     assert len(data["items"]) == 2
     # Ensure batched path used
     assert used["calls"] >= 1
+
+
+def test_advice_top_from_packed_payload(client: TestClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    from broker.api.routes import advice as adv
+
+    payload = {
+        "ts": "1700000000",
+        "items": [{"item_id": i, "name": f"Item {i}", "score": 1.0 / i} for i in range(1, 6)],
+    }
+
+    async def _get_json(key: str) -> Any:
+        assert key == "adv:Phoenix:top"
+        return payload
+
+    monkeypatch.setattr(adv, "get_json", _get_json)
+
+    r = client.get("/advice/top", params={"world": "Phoenix", "limit": 3})
+    assert r.status_code == 200
+    data = r.json()
+    assert data["count"] == 3
+    assert [it["item_id"] for it in data["items"]] == [1, 2, 3]
+    assert data["ts"] == "1700000000"
+
+
+def test_advice_top_etag(client: TestClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    from broker.api.routes import advice as adv
+
+    async def _get_json(key: str) -> Any:
+        return {"ts": "1700000000", "items": [{"item_id": 1, "name": "Foo"}]}
+
+    monkeypatch.setattr(adv, "get_json", _get_json)
+
+    r = client.get("/advice/top", params={"world": "Phoenix"})
+    assert r.status_code == 200
+    etag = r.headers["ETag"]
+    assert "max-age" in r.headers["Cache-Control"]
+    r2 = client.get("/advice/top", params={"world": "Phoenix"}, headers={"If-None-Match": etag})
+    assert r2.status_code == 304
+    assert r2.content == b""
+
+
+def test_cached_metrics_bundle_expires_on_age() -> None:
+    from broker.api.routes import advice as adv
+    import orjson
+
+    now = int(time.time())
+    ttl = adv.settings.CACHE_TTL_SHORT
+    raw = orjson.dumps([42, now - 10, 100, 1.5, 3, 120.0, 0.1, 2])
+    assert adv._cached_bundle(raw, 42, now) == [100, 1.5, 3, 120.0, 0.1, 2]
+    # New upload, or same upload but computed longer than the TTL ago
+    assert adv._cached_bundle(raw, 43, now) is None
+    assert adv._cached_bundle(raw, 42, now + ttl) is None
+    # Entries written before computed_at was stored are recomputed
+    assert adv._cached_bundle(orjson.dumps([42, 100, 1.5]), 42, now) is None
+    assert adv._cached_bundle(orjson.dumps([42, None, 1.5]), 42, now) is None
+    assert adv._cached_bundle(None, 42, now) is None
+    # Corrupt or non-list entries are misses, not errors
+    assert adv._cached_bundle(b"\x00not json", 42, now) is None
+    assert adv._cached_bundle(orjson.dumps({"a": 1}), 42, now) is None
+    assert adv._cached_bundle(orjson.dumps(42), 42, now) is None
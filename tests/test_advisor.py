@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+from typing import Any
+
+import pytest
+
+from broker.services import advisor
+from broker.services.advisor import AdviceItem, rank_items
+
+
+def _cand(iid: int, price: float, cost: float, spd: float) -> dict[str, Any]:
+    return {
+        "item_id": iid,
+        "name": f"Item {iid}",
+        "price": price,
+        "cost": cost,
+        "sales_per_day": spd,
+        "flags": [],
+        "profit_unit": price - cost,
+        "profit_per_day": (price - cost) * spd,
+        "competition": 0,
+    }
+
+
+def test_rank_items_returns_sorted_dicts() -> None:
+    cands = [_cand(1, 110, 100, 1), _cand(2, 300, 100, 5), _cand(3, 90, 100, 1)]
+    ranked = rank_items(cands, min_roi=0.0)
+    assert [r["item_id"] for r in ranked] == [2]  # ROI after fees filters 1 and 3
+    assert set(ranked[0]) == set(AdviceItem.__dataclass_fields__)
+
+    ranked_all = rank_items(cands, min_roi=-1.0)
+    scores = [r["score"] for r in ranked_all]
+    assert scores == sorted(scores, reverse=True)
+
+    structured = rank_items(cands, min_roi=-1.0, structured=True)
+    assert all(isinstance(r, AdviceItem) for r in structured)
+    assert [r.item_id for r in structured] == [r["item_id"] for r in ranked_all]
+
+
+def test_rank_items_numpy_path_matches_python(monkeypatch: pytest.MonkeyPatch) -> None:
+    cands = [_cand(i, 100 + (i * 37) % 250, 80 + (i * 11) % 90, (i % 7) / 2) for i in range(300)]
+    for i, c in enumerate(cands):
+        c["competition"] = i % 13
+        c["flags"] = ["saturo"] if i % 5 == 0 else ["instabile"] if i % 7 == 0 else []
+    cands[3]["cost"] = 0
+
+    vectorized = rank_items(cands, min_roi=-0.2, min_spd=0.5)
+    monkeypatch.setattr(advisor, "NP_MIN_CANDIDATES", len(cands) + 1)
+    assert vectorized == rank_items(cands, min_roi=-0.2, min_spd=0.5)
+
+
+def test_rank_items_top_k_matches_sorted_prefix() -> None:
+    small = [_cand(i, 100 + (i * 37) % 250, 100, 1 + i % 4) for i in range(40)]
+    large = [_cand(i, 100 + (i * 37) % 250, 100, 1 + i % 4) for i in range(300)]
+    for cands in (small, large):
+        full = rank_items(cands, min_roi=-1.0)
+        assert rank_items(cands, min_roi=-1.0, top_k=7) == full[:7]
+        assert rank_items(cands, min_roi=-1.0, top_k=1000) == full
+
+
+def test_score_reads_current_settings(monkeypatch: pytest.MonkeyPatch) -> None:
+    base, _ = advisor.compute_score(0.5, 2.0, [], 500.0)
+    monkeypatch.setattr(advisor.settings, "ADVICE_W_ROI", advisor.settings.ADVICE_W_ROI + 1.0)
+    # No reload step: the next call sees the patched weight
+    assert advisor.compute_score(0.5, 2.0, [], 500.0)[0] > base
+    # An explicit snapshot pins the weights it was taken with
+    pinned = advisor.ScoreWeights.from_settings()
+    monkeypatch.setattr(advisor.settings, "ADVICE_W_ROI", 0.0)
+    assert advisor.compute_score(0.5, 2.0, [], 500.0, weights=pinned)[0] > base
+
+
+def test_roi_batch_matches_scalar_roi() -> None:
+    import numpy as np
+
+    from broker.services.metrics import roi
+
+    price = np.array([120.0, 80.0, 50.0])
+    cost = np.array([100.0, 100.0, 0.0])
+    expected = [roi(float(p), float(c)) for p, c in zip(price, cost)]
+    assert advisor.roi_batch(price, cost).tolist() == pytest.approx(expected)
+    taxed = [roi(float(p), float(c), 0.1, 0.02) for p, c in zip(price, cost)]
+    assert advisor.roi_batch(price, cost, 0.1, 0.02).tolist() == pytest.approx(taxed)
@@ -1,54 +1,33 @@
 from __future__ import annotations
 
-import asyncio
+from collections.abc import Callable
 from typing import Any
 
+import httpx
+import orjson
 import pytest
 
 from broker.clients import universalis as u
 
 
-class _FakeResponse:
-    def __init__(self, payload: dict[str, Any], status_code: int = 200) -> None:
-        self._payload = payload
-        self.status_code = status_code
-
-    def raise_for_status(self) -> None:  # mimic httpx.Response
-        if self.status_code >= 400:
-            raise RuntimeError(f"HTTP {self.status_code}")
-
-    def json(self) -> dict[str, Any]:
-        return self._payload
-
-
-class _FakeClient:
-    def __init__(self, on_get: Any) -> None:
-        self._on_get = on_get
-        self.calls = 0
-
-    async def __aenter__(self) -> "_FakeClient":
-        return self
-
-    async def __aexit__(self, exc_type, exc, tb) -> None:  # noqa: D401
-        return None
-
-    async def get(self, url: str) -> _FakeResponse:
-        self.calls += 1
-        return await self._on_get(url)
-
-
 @pytest.mark.asyncio
-async def test_get_items_world_alignment_and_cache(monkeypatch: pytest.MonkeyPatch) -> None:
+async def test_get_items_world_alignment_and_cache(
+    monkeypatch: pytest.MonkeyPatch, universalis_client: Callable[..., httpx.AsyncClient]
+) -> None:
     # Capture cache set calls
     set_calls: list[tuple[str, Any, int | None]] = []
 
-    async def _set_json(key: str, value: Any, ttl: int | None = None) -> None:  # type: ignore[override]
-        set_calls.append((key, value, ttl))
+    flushes: list[int] = []
 
-    monkeypatch.setattr(u, "set_json", _set_json)
+    async def _set_json_many(items: list[tuple[str, Any, int | None]]) -> None:
+        flushes.append(len(items))
+        set_calls.extend(items)
+
+    monkeypatch.setattr(u, "set_json_many", _set_json_many)
 
     # Fake multi endpoint handler
-    async def _on_get(url: str) -> _FakeResponse:
+    def _on_get(request: httpx.Request) -> httpx.Response:
+        url = request.url.path
         assert "/v2/" in url and "/Phoenix/" in url
         ids_csv = url.rsplit("/", 1)[-1]
         ids = [int(s) for s in ids_csv.split(",")]
@@ -69,10 +48,9 @@ async def test_get_items_world_alignment_and_cache(monkeypatch: pytest.MonkeyPat
                     ],
                 }
             )
-        return _FakeResponse({"items": items})
+        return httpx.Response(200, json={"items": items})
 
-    fake = _FakeClient(_on_get)
-    monkeypatch.setattr(u, "_client", lambda: fake)
+    universalis_client(_on_get)
 
     ids = [1, 2, 3, 4, 5]
     res = await u.get_items_world(ids, "Phoenix")
@@ -83,19 +61,60 @@ async def test_get_items_world_alignment_and_cache(monkeypatch: pytest.MonkeyPat
         assert data.get("listings") and data.get("recentHistory")
         # Alignment: first listing price follows input order (iid*10)
         assert data["listings"][0]["pricePerUnit"] == iid * 10
+        assert data["item_id"] == iid
 
-    # Cache set_json called twice per item (listings + history)
-    assert len(set_calls) == len(ids) * 2
+    # Three cache entries per item (listings + history + upload), flushed in one pipeline
+    assert len(set_calls) == len(ids) * 3
+    assert flushes == [len(ids) * 3]
     keys = [k for k, _, _ in set_calls]
     assert u.ns("u", f"Phoenix:{ids[0]}:listings") in keys
     assert u.ns("u", f"Phoenix:{ids[0]}:history") in keys
 
 
 @pytest.mark.asyncio
-async def test_get_items_world_chunking(monkeypatch: pytest.MonkeyPatch) -> None:
+async def test_get_item_world_flushes_cache_once(
+    monkeypatch: pytest.MonkeyPatch, universalis_client: Callable[..., httpx.AsyncClient]
+) -> None:
+    flushes: list[list[tuple[str, Any, int | None]]] = []
+
+    async def _get_json_many(keys: list[str]) -> list[Any]:
+        return [None] * len(keys)
+
+    async def _set_json_many(items: list[tuple[str, Any, int | None]]) -> None:
+        flushes.append(items)
+
+    monkeypatch.setattr(u, "get_json_many", _get_json_many)
+    monkeypatch.setattr(u, "set_json_many", _set_json_many)
+
+    def _on_get(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json={"listings": [{"pricePerUnit": 5}], "recentHistory": []})
+
+    universalis_client(_on_get)
+
+    res = await u.get_item_world(7, "Phoenix")
+
+    assert res["listings"] == [{"pricePerUnit": 5}]
+    assert len(flushes) == 1
+    assert [k for k, _, _ in flushes[0]] == [
+        u.ns("u", "Phoenix:7:listings"),
+        u.ns("u", "Phoenix:7:history"),
+        u.ns("u", "Phoenix:7:upload"),
+    ]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(("chunk", "expected"), [(100, 3), (50, 5), (25, 9)])
+async def test_get_items_world_chunking(
+    monkeypatch: pytest.MonkeyPatch,
+    universalis_client: Callable[..., httpx.AsyncClient],
+    chunk: int,
+    expected: int,
+) -> None:
+    monkeypatch.setattr(u.settings, "UNIVERSALIS_CHUNK", chunk)
     calls: list[str] = []
 
-    async def _on_get(url: str) -> _FakeResponse:
+    def _on_get(request: httpx.Request) -> httpx.Response:
+        url = request.url.path
         calls.append(url)
         ids_csv = url.rsplit("/", 1)[-1]
         ids = [int(s) for s in ids_csv.split(",")]
@@ -103,41 +122,172 @@ async def test_get_items_world_chunking(monkeypatch: pytest.MonkeyPatch) -> None
         items = [
             {"itemID": iid, "listings": [], "recentHistory": []} for iid in ids
         ]
-        return _FakeResponse({"items": items})
+        return httpx.Response(200, json={"items": items})
 
-    fake = _FakeClient(_on_get)
-    monkeypatch.setattr(u, "_client", lambda: fake)
+    universalis_client(_on_get)
 
-    # Request more than 100 IDs to force multiple chunks
-    ids = list(range(1, 205 + 1))  # 205 -> 3 requests (100,100,5)
+    # 205 IDs -> ceil(205 / chunk) batched GETs (100 -> 100,100,5)
+    ids = list(range(1, 205 + 1))
     res = await u.get_items_world(ids, "Phoenix")
 
     assert len(res) == len(ids)
-    # Expect 3 batched GETs
-    assert len(calls) == 3
+    assert len(calls) == expected
+    assert max(len(c.rsplit("/", 1)[-1].split(",")) for c in calls) == chunk
 
 
 @pytest.mark.asyncio
-async def test_get_items_world_parses_items_mapping(monkeypatch: pytest.MonkeyPatch) -> None:
+async def test_get_items_world_parses_items_mapping(
+    universalis_client: Callable[..., httpx.AsyncClient],
+) -> None:
     # Simulate Universalis response shape with items as a mapping {"id": {...}}
     calls: list[str] = []
 
-    async def _on_get(url: str) -> _FakeResponse:
+    def _on_get(request: httpx.Request) -> httpx.Response:
+        url = request.url.path
         calls.append(url)
-        return _FakeResponse(
-            {
+        return httpx.Response(
+            200,
+            json={
                 "itemIDs": [10, 20],
                 "items": {
                     "10": {"listings": [{"pricePerUnit": 100, "quantity": 1, "hq": False}], "recentHistory": []},
                     "20": {"listings": [{"pricePerUnit": 200, "quantity": 1, "hq": False}], "recentHistory": []},
                 },
-            }
+            },
         )
 
-    fake = _FakeClient(_on_get)
-    monkeypatch.setattr(u, "_client", lambda: fake)
+    universalis_client(_on_get)
 
     res = await u.get_items_world([10, 20], "Phoenix")
     assert len(res) == 2
     assert res[0]["listings"][0]["pricePerUnit"] == 100
     assert res[1]["listings"][0]["pricePerUnit"] == 200
+
+
+@pytest.mark.asyncio
+async def test_marketable_ids_packed_cache(monkeypatch: pytest.MonkeyPatch) -> None:
+    store: dict[str, Any] = {"u:marketable": [5, 1675, 40000]}
+
+    async def _get_bytes(key: str) -> bytes | None:
+        return store.get(key)
+
+    async def _set_bytes(key: str, value: bytes, ttl: int | None = None) -> None:
+        store[key] = value
+
+    async def _get_json(key: str) -> Any | None:
+        return store.get(key)
+
+    async def _index(ids: Any) -> None:
+        store["x:ids:lex"] = sorted(str(i) for i in ids)
+
+    monkeypatch.setattr(u, "get_bytes", _get_bytes)
+    monkeypatch.setattr(u, "set_bytes", _set_bytes)
+    monkeypatch.setattr(u, "get_json", _get_json)
+    monkeypatch.setattr(u, "index_ids_lex", _index)
+
+    # First read backfills the packed blob from the JSON list
+    ids = await u.get_marketable_items()
+    assert list(ids) == [5, 1675, 40000]
+    assert store["u:marketable:bin"] == (5).to_bytes(4, "little") + (1675).to_bytes(
+        4, "little"
+    ) + (40000).to_bytes(4, "little")
+
+    # Second read is served from the blob alone
+    del store["u:marketable"]
+    assert list(await u.cached_marketable_ids() or []) == [5, 1675, 40000]
+
+
+@pytest.mark.asyncio
+async def test_get_items_world_serves_cache_hits_with_one_mget(
+    monkeypatch: pytest.MonkeyPatch, universalis_client: Callable[..., httpx.AsyncClient]
+) -> None:
+    cached = {
+        "u:Phoenix:1:listings": [{"pricePerUnit": 11, "quantity": 1, "hq": False}],
+        "u:Phoenix:1:history": [],
+        "u:Phoenix:1:upload": 5,
+        # item 2: listings only -> treated as a miss
+        "u:Phoenix:2:listings": [],
+    }
+    mgets: list[list[str]] = []
+
+    async def _get_json_many(keys: list[str]) -> list[Any]:
+        mgets.append(keys)
+        return [cached.get(k) for k in keys]
+
+    async def _set_json_many(items: list[tuple[str, Any, int | None]]) -> None:
+        return None
+
+    monkeypatch.setattr(u, "get_json_many", _get_json_many)
+    monkeypatch.setattr(u, "set_json_many", _set_json_many)
+
+    calls: list[str] = []
+
+    def _on_get(request: httpx.Request) -> httpx.Response:
+        url = request.url.path
+        calls.append(url)
+        ids = [int(s) for s in url.rsplit("/", 1)[-1].split(",")]
+        items = [
+            {"itemID": i, "listings": [], "recentHistory": [], "lastUploadTime": 7} for i in ids
+        ]
+        return httpx.Response(200, json={"items": items})
+
+    universalis_client(_on_get)
+
+    res = await u.get_items_world([1, 2, 3], "Phoenix")
+
+    assert len(mgets) == 1 and len(mgets[0]) == 9
+    assert calls == ["/v2/Phoenix/2,3"]
+    assert res[0]["listings"][0]["pricePerUnit"] == 11
+    # Cache hits carry the upload version too, so advice can reuse its metric bundles
+    assert res[0]["lastUploadTime"] == 5
+    assert res[1]["lastUploadTime"] == 7 and res[2]["lastUploadTime"] == 7
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_allows_burst_then_paces(monkeypatch: pytest.MonkeyPatch) -> None:
+    sleeps: list[float] = []
+
+    async def _sleep(delay: float) -> None:
+        sleeps.append(delay)
+
+    monkeypatch.setattr(u.asyncio, "sleep", _sleep)
+    limiter = u._RateLimiter(4)
+    for _ in range(6):
+        await limiter.wait()
+
+    # First 4 go straight through; the next ones wait roughly 1/rate each
+    assert len(sleeps) == 2
+    assert 0.2 < sleeps[0] <= 0.25 and sleeps[1] > sleeps[0]
+
+
+@pytest.mark.asyncio
+async def test_get_with_retry_backs_off_then_succeeds(monkeypatch: pytest.MonkeyPatch) -> None:
+    sleeps: list[float] = []
+
+    async def _sleep(delay: float) -> None:
+        sleeps.append(delay)
+
+    monkeypatch.setattr(u.asyncio, "sleep", _sleep)
+    monkeypatch.setattr(u.settings, "RETRY_MAX", 3)
+    # Fresh pacer: earlier tests may have used up the shared one's burst
+    monkeypatch.setattr(u, "_limiter", u._RateLimiter(100))
+
+    calls: list[str] = []
+
+    def _on_get(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        if len(calls) < 3:
+            raise httpx.ReadTimeout("slow", request=request)
+        return httpx.Response(200, json={"ok": True})
+
+    client = httpx.AsyncClient(
+        base_url="https://universalis.test", transport=httpx.MockTransport(_on_get)
+    )
+    resp = await u._get_with_retry(client, "/x")
+    assert orjson.loads(resp.content) == {"ok": True}
+    assert sleeps == [0.2, 0.4]
+
+    calls.clear()
+    monkeypatch.setattr(u.settings, "RETRY_MAX", 2)
+    with pytest.raises(httpx.ReadTimeout):
+        await u._get_with_retry(client, "/x")
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+from typing import Any
+
+import pytest
+
+from broker.clients import xivapi as x
+
+
+class _FakeRedis:
+    def __init__(self, names: dict[str, str]) -> None:
+        self.names = names
+
+    async def hset(self, key: str, mapping: dict[str, str]) -> int:
+        self.names.update(mapping)
+        return len(mapping)
+
+
+@pytest.fixture(autouse=True)
+def _clear_memo() -> Any:
+    x.clear_local_caches()
+    yield
+    x.clear_local_caches()
+
+
+@pytest.mark.asyncio
+async def test_get_item_names_batches_catalog_misses(monkeypatch: pytest.MonkeyPatch) -> None:
+    fake = _FakeRedis({"1": "Known"})
+    monkeypatch.setattr(x, "get_redis", lambda: fake)
+
+    async def _mget_names(ids: list[int]) -> dict[int, str | None]:
+        return {i: fake.names.get(str(i)) for i in ids}
+
+    monkeypatch.setattr(x, "mget_names", _mget_names)
+
+    batches: list[list[int]] = []
+
+    async def _batch(ids: list[int]) -> dict[int, str]:
+        batches.append(ids)
+        return {2: "Two"}
+
+    singles: list[int] = []
+
+    async def _single(iid: int) -> Any:
+        singles.append(iid)
+        return None
+
+    monkeypatch.setattr(x, "_fetch_names_batch", _batch)
+    monkeypatch.setattr(x, "get_item_name", _single)
+
+    names = await x.get_item_names([1, 2, 3, 3])
+
+    assert names == ["Known", "Two", None, None]
+    assert batches == [[2, 3]]
+    # Only the item the batch could not resolve falls back to a single lookup, once
+    assert singles == [3]
+    assert fake.names["2"] == "Two"
+
+
+@pytest.mark.asyncio
+async def test_get_item_names_keeps_batch_when_cache_write_fails(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    class _DownRedis:
+        async def hset(self, key: str, mapping: dict[str, str]) -> int:
+            raise ConnectionError("redis down")
+
+    async def _mget_names(ids: list[int]) -> dict[int, str | None]:
+        return {}
+
+    async def _batch(ids: list[int]) -> dict[int, str]:
+        return {1: "One"}
+
+    monkeypatch.setattr(x, "get_redis", lambda: _DownRedis())
+    monkeypatch.setattr(x, "mget_names", _mget_names)
+    monkeypatch.setattr(x, "_fetch_names_batch", _batch)
+
+    assert await x.get_item_names([1]) == ["One"]
+
+
+@pytest.mark.asyncio
+async def test_get_item_name_memoizes_resolved_names(monkeypatch: pytest.MonkeyPatch) -> None:
+    calls: list[int] = []
+
+    async def _lookup(iid: int) -> str | None:
+        calls.append(iid)
+        return "Name" if iid == 1 else None
+
+    monkeypatch.setattr(x, "_get_item_name", _lookup)
+
+    assert await x.get_item_name(1) == "Name"
+    assert await x.get_item_name(1) == "Name"
+    assert await x.get_item_name(2) is None
+    assert await x.get_item_name(2) is None
+    # Hits are served in-process; misses are never memoized
+    assert calls == [1, 2, 2]
+
+    x.clear_local_caches()
+    await x.get_item_name(1)
+    assert calls == [1, 2, 2, 1]
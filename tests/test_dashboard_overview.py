@@ -57,3 +57,19 @@ async def test_dashboard_overview_batched(client: TestClient, monkeypatch: pytes
     one = data["items"][0]
     assert "lowest" in one and "avg_price_7d" in one and "sales_per_day_7d" in one
 
+
+
+def test_static_world_lists_revalidate(client: TestClient) -> None:
+    r = client.get("/dashboard/data/worlds")
+    assert r.status_code == 200
+    worlds = r.json()["worlds"]
+    assert worlds == sorted(set(worlds)) and "Phoenix" in worlds
+    etag = r.headers["etag"]
+
+    again = client.get("/dashboard/data/worlds", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+
+    # A different query is a different representation
+    dc = client.get("/dashboard/data/worlds", params={"data_center": "Light"})
+    assert dc.headers["etag"] != etag
+    assert client.get("/dashboard/data/data-centers").json()["data_centers"][0] == "Light"
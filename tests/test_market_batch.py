@@ -15,8 +15,10 @@ async def test_market_items_batch(client: TestClient, monkeypatch: pytest.Monkey
         for iid in ids:
             out.append(
                 {
+                    "item_id": iid,
                     "listings": [{"pricePerUnit": iid * 10, "quantity": 1, "hq": False}],
                     "recentHistory": [],
+                    "lastUploadTime": 5,
                 }
             )
         return out
@@ -30,4 +32,13 @@ async def test_market_items_batch(client: TestClient, monkeypatch: pytest.Monkey
     items = data["items"]
     assert [it["item_id"] for it in items] == [1, 2, 3]
     assert items[0]["listings"][0]["pricePerUnit"] == 10
+    assert set(items[0]) == {"item_id", "listings", "recentHistory"}
 
+
+
+def test_market_items_batch_rejects_oversized(client: TestClient) -> None:
+    from broker.api.routes import market as m
+
+    ids = ",".join(str(i) for i in range(1, m.ITEMS_MAX_BATCH + 2))
+    r = client.get("/market/items", params={"world": "Phoenix", "ids": ids})
+    assert r.status_code == 400
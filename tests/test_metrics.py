@@ -2,7 +2,26 @@ from __future__ import annotations
 
 import time
 
-from broker.services.metrics import avg_price, sales_per_day
+import numpy as np
+import pytest
+
+from broker.models.market import Sale
+from broker.services.metrics import (
+    avg_price,
+    history_arrays,
+    extract_window,
+    listing_prices,
+    lowest_price,
+    median_price,
+    price_cv,
+    quantile_price,
+    sales_per_day,
+    scan_listings,
+    summarize_history,
+    trimmed_mean_price,
+    units_sold,
+    window_stats_batch,
+)
 
 AVG_LOW = 149.0
 AVG_HIGH = 151.0
@@ -36,3 +55,128 @@ def test_sales_per_day_7d() -> None:
     spd = sales_per_day(history, days=7)
     # (1 + 2) / 7
     assert SPD_LOW < spd < SPD_HIGH
+
+
+def test_summarize_history_matches_individual_metrics() -> None:
+    history = [
+        _mk_sale(100, 1, days_ago=1),
+        _mk_sale(200, 2, days_ago=2),
+        _mk_sale(150, 3, days_ago=3),
+        _mk_sale(900, 1, days_ago=4),
+        _mk_sale(300, 1, days_ago=8),  # outside window
+    ]
+    s = summarize_history(history, days=7)
+    assert s.units_sold == units_sold(history, days=7)
+    assert abs(s.sales_per_day - sales_per_day(history, days=7)) < 1e-9
+    assert s.target is not None and s.cv is not None
+    assert abs(s.target - (trimmed_mean_price(history, days=7) or 0.0)) < 1e-9
+    assert abs(s.cv - (price_cv(history, days=7) or 0.0)) < 1e-9
+    assert summarize_history(history, target="median").target == median_price(history)
+    assert summarize_history(history, q=0.9).target == quantile_price(history, q=0.9)
+    assert summarize_history([], days=7).target is None
+
+
+def test_scan_listings() -> None:
+    listings = [{"pricePerUnit": p, "quantity": 1} for p in (500, 120, 300)]
+    assert scan_listings(listings, 300.0) == (120, 2)
+    assert scan_listings([], 300.0) == (None, 0)
+    assert lowest_price(listings) == 120
+    assert lowest_price([]) is None
+
+
+def test_summarize_history_numpy_path_matches_python() -> None:
+    history = [_mk_sale(100 + (i * 37) % 400, 1 + i % 3, days_ago=i % 10) for i in range(300)]
+    py = summarize_history([Sale.model_validate(h) for h in history], days=7)
+    vec = summarize_history(history, days=7)
+    assert vec.units_sold == py.units_sold
+    assert py.target is not None and vec.target is not None
+    assert abs(vec.target - py.target) < 1e-6
+    assert py.cv is not None and vec.cv is not None
+    assert abs(vec.cv - py.cv) < 1e-9
+    assert (
+        summarize_history(history, q=0.25).target
+        == summarize_history([Sale.model_validate(h) for h in history], q=0.25).target
+    )
+
+
+def test_window_stats_batch_matches_per_history() -> None:
+    long = [_mk_sale(100 + (i * 37) % 400, 1 + i % 3, days_ago=i % 10) for i in range(200)]
+    short = [_mk_sale(150, 2, days_ago=1), _mk_sale(999, 1, days_ago=30)]
+    stats = window_stats_batch([long, [], short], days=7)
+    assert stats[1] == (None, 0.0)
+    for hist, (a7, spd) in zip([long, short], [stats[0], stats[2]]):
+        models = [Sale.model_validate(h) for h in hist]
+        expected = avg_price(models, days=7)
+        assert a7 is not None and expected is not None
+        assert abs(a7 - expected) < 1e-6
+        assert abs(spd - sales_per_day(models, days=7)) < 1e-9
+    # Long dict histories take the vectorized path in the single-item helpers too
+    assert units_sold(long) == units_sold([Sale.model_validate(h) for h in long])
+
+
+def test_scan_listings_numpy_path_matches_python() -> None:
+    listings = [
+        {"pricePerUnit": 500 + (i * 53) % 900, "quantity": 1, "hq": False} for i in range(300)
+    ]
+    lowest, comp = scan_listings(listings, 800)
+    assert lowest == lowest_price(listings) == int(listing_prices(listings).min())
+    assert comp == sum(1 for l in listings if l["pricePerUnit"] <= 800)
+    # Same answer through the Python loop (generator input skips the array path)
+    assert scan_listings(iter(listings), 800) == (lowest, comp)
+
+
+def test_extract_window_single_pass_matches_models() -> None:
+    history = [
+        _mk_sale(100, 1, days_ago=1),
+        _mk_sale(200, 3, days_ago=2),
+        _mk_sale(300, 1, days_ago=8),
+    ]
+    prices, qty = extract_window(history, days=7)
+    assert prices == [100.0, 200.0] and qty == 4
+    assert extract_window([Sale.model_validate(h) for h in history], days=7) == (prices, qty)
+
+
+def test_extract_window_strict_mode_validates() -> None:
+    bad = [{"pricePerUnit": -5, "quantity": 1, "timestamp": int(time.time())}]
+    assert extract_window(bad, days=7) == ([-5.0], 1)
+    with pytest.raises(ValueError):
+        extract_window(bad, days=7, validate=True)
+
+
+def test_window_stats_numpy_path_matches_python() -> None:
+    history = [_mk_sale(100 + (i * 53) % 700, 1, days_ago=i % 9) for i in range(400)]
+    models = [Sale.model_validate(h) for h in history]
+    for q in (0.0, 0.25, 0.5, 1.0):
+        assert quantile_price(history, q=q) == quantile_price(models, q=q)
+    assert median_price(history) == median_price(models)
+    tm, tm_py = trimmed_mean_price(history, trim=0.2), trimmed_mean_price(models, trim=0.2)
+    assert tm is not None and tm_py is not None and abs(tm - tm_py) < 1e-6
+    cv, cv_py = price_cv(history), price_cv(models)
+    assert cv is not None and cv_py is not None and abs(cv - cv_py) < 1e-9
+
+
+def test_median_price_numpy_path_keeps_order_statistic() -> None:
+    # Even-length window: the median is an actual sale price (round((n-1)/2)),
+    # not the average of the two middle values np.median would return
+    history = [_mk_sale(100 * (i + 1), 1, days_ago=1) for i in range(200)]
+    assert median_price(history) == 10100.0
+    assert median_price([Sale.model_validate(h) for h in history]) == 10100.0
+
+
+def test_summarize_history_avg_matches_avg_price() -> None:
+    for n in (5, 300):
+        history = [_mk_sale(100 + (i * 41) % 500, 1 + i % 4, days_ago=i % 10) for i in range(n)]
+        s = summarize_history(history, days=7)
+        assert s.units_sold == units_sold(history, days=7)
+        assert s.sales_per_day == sales_per_day(history, days=7)
+        avg = avg_price(history, days=7)
+        assert s.avg is not None and avg is not None and abs(s.avg - avg) < 1e-6
+    assert summarize_history([], days=7).avg is None
+
+
+def test_history_arrays_columns() -> None:
+    history = [_mk_sale(100, 1, days_ago=1), _mk_sale(250, 3, days_ago=8)]
+    ts, price, qty = history_arrays(history)
+    assert ts.dtype == np.int64 and ts.tolist() == [h["timestamp"] for h in history]
+    assert price.tolist() == [100.0, 250.0] and qty.tolist() == [1.0, 3.0]
+    assert all(col.size == 0 for col in history_arrays([]))
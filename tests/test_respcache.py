@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+from typing import Any
+
+import pytest
+
+from broker.api import respcache as rc
+
+
+@pytest.mark.asyncio
+async def test_cached_json_hit_and_stale_fallback(monkeypatch: pytest.MonkeyPatch) -> None:
+    store: dict[str, bytes] = {}
+
+    async def _get_bytes(key: str) -> bytes | None:
+        return store.get(key)
+
+    monkeypatch.setattr(rc, "get_bytes", _get_bytes)
+    key = rc._key("t", ("Phoenix", 1))
+
+    store[key] = b'{"v":1}'
+    calls = {"n": 0}
+
+    async def _build() -> Any:
+        calls["n"] += 1
+        raise RuntimeError("upstream down")
+
+    hit = await rc.cached_json("t", ("Phoenix", 1), 10, _build)
+    assert hit.body == b'{"v":1}' and hit.headers["x-cache"] == "hit"
+    assert calls["n"] == 0
+
+    # Fresh copy expired: a failing rebuild falls back to the stale copy
+    del store[key]
+    store[f"{key}:stale"] = b'{"v":0}'
+    stale = await rc.cached_json("t", ("Phoenix", 1), 10, _build)
+    assert stale.body == b'{"v":0}' and stale.headers["x-cache"] == "stale"
+
+    # No stale copy either: the error propagates
+    store.clear()
+    with pytest.raises(RuntimeError):
+        await rc.cached_json("t", ("Phoenix", 1), 10, _build)